@@ -1,22 +1,34 @@
 import warnings
+from functools import lru_cache
 warnings.filterwarnings('ignore')
 from crewai import Agent, Task, Crew, Process
-from langchain_openai import AzureChatOpenAI
 from custom_tools import WebSearchTool, StudyMaterialSearchTool, CalculatorTool, DateSearchTool
-from llm_models import llm, llm_stream
+from llm_models import get_llm
+from lazy import singleton
+from crew_pool import CrewPool
 from langchain_core.tools import tool
 from configs import config
+from metrics import span
+import request_context
 import os
 os.environ['CREWAI_DISABLE_TELEMETRY'] = 'true'
 os.environ['OTEL_SDK_DISABLED'] = 'true'
 
-financial_tutor_agent  = Agent(
-    role="Smart AI Tutor for SEBI Certification Exams",
-    goal="Explain SEBI regulations, financial concepts, and securities market topics in simple," 
-         "beginner-friendly language using the user's preferred Indian language." 
-         "Provide accurate, exam-focused answers that help novice learners understand complex financial topics for their SEBI certification exam preparation.",
+@singleton
+def get_shared_tools():
+    """Tool instances used by every crew of both pools, they keep no per-run state"""
+    return [StudyMaterialSearchTool(), CalculatorTool(), DateSearchTool(), WebSearchTool()]
+
+
+def build_ai_tutor_crew():
+    """A new doubt resolution crew for ai_tutor_pool, with the shared tools and LLM client"""
+    financial_tutor_agent  = Agent(
+        role="Smart AI Tutor for SEBI Certification Exams",
+        goal="Explain SEBI regulations, financial concepts, and securities market topics in simple," 
+             "beginner-friendly language using the user's preferred Indian language." 
+             "Provide accurate, exam-focused answers that help novice learners understand complex financial topics for their SEBI certification exam preparation.",
     
-    backstory="""You are an experienced financial educator who has helped thousands of students pass SEBI certification exams. You specialize in breaking down complex financial regulations and market concepts into simple, easy-to-understand explanations. 
+        backstory="""You are an experienced financial educator who has helped thousands of students pass SEBI certification exams. You specialize in breaking down complex financial regulations and market concepts into simple, easy-to-understand explanations. 
 
 Your expertise covers:
 - SEBI regulations and investor protection mechanisms
@@ -31,15 +43,15 @@ You have a unique ability to:
 - Provide practical context that connects theoretical knowledge to real-world applications.
 
 Your teaching style is patient, encouraging, and focused on building confidence in learners.""",
-    verbose=True,
-    allow_delegation=False,
-    tools = [StudyMaterialSearchTool(), CalculatorTool(), DateSearchTool(), WebSearchTool()], 
-    max_iter=2,
-    llm=llm
-)
+        verbose=True,
+        allow_delegation=False,
+        tools = get_shared_tools(),
+        max_iter=2,
+        llm=get_llm()
+    )
 
-doubt_resolution_task = Task(
-    description="""Take the user's query about SEBI exam topics and provide a comprehensive, beginner-friendly explanation in their preferred language.
+    doubt_resolution_task = Task(
+        description="""Take the user's query about SEBI exam topics and provide a comprehensive, beginner-friendly explanation in their preferred language.
 
 Process:
 1. Analyze the user's question to identify the specific financial concept or regulation being asked about. it can be about Exam process or syllabus as well
@@ -57,7 +69,7 @@ Exam Overview: {exam_overview}
 User Query: {user_query}
 User Language: {user_language}""",
     
-    expected_output="""Your Response will be sent back to the Orchestrator Agent for generating the Final Reposne. \
+        expected_output="""Your Response will be sent back to the Orchestrator Agent for generating the Final Reposne. \
     You will provide a clear, pointwise answer that includes:
 
 1. **Direct Answer**: an accuracte and concise answer to the user's specific question
@@ -76,15 +88,15 @@ User Language: {user_language}""",
 
 Ensure to include all relevant information/statistics (if applicable) in your points.
 Write only as per these points and nothing else.""",
-    agent=financial_tutor_agent,
-)
+        agent=financial_tutor_agent,
+    )
 
+    return Crew(
+        agents=[financial_tutor_agent],
+        tasks=[doubt_resolution_task],
+        verbose=True
+    )
 
-ai_tutor_crew = Crew(
-    agents=[financial_tutor_agent],
-    tasks=[doubt_resolution_task],
-    verbose=True
-)
 
 exam_details_dict = {"mf_foundation": 
                         {"exam_name": "NISM-Series-V-B: Mutual Fund Foundation Certification",
@@ -97,6 +109,13 @@ exam_details_dict = {"mf_foundation":
                         "file_path": r"/home/radiant_ranger_gcphackathon/sebi_vidyalaya/data/Investment Adviser (Level 1).txt"},
                     }
 
+@lru_cache(maxsize=None)
+def read_exam_overview(exam_name):
+    """The exam overview text, read once per process (serve.py loads it before forking)"""
+    with open(exam_details_dict[exam_name]['file_path'], "r") as file:
+        return file.read()
+
+
 @tool
 def ai_tutor_tool(user_query: str):
     """
@@ -110,23 +129,18 @@ def ai_tutor_tool(user_query: str):
     Returns:
         The infromation required to Answer the question in Text format.
     """
-    config.kb_results = {}
-    if not config.exam_name:
-        config.exam_name = "invest_advisor"
-    if not config.user_language:
-        config.user_language = 'English'
-    if not config.chroma_collection_name:
-        config.chroma_collection_name = config.exam_name
+    # the exam and language of the request this call serves, see request_context
+    request_context.record_sources([])
+    exam_name = request_context.exam_name.get() or "invest_advisor"
+    user_language = request_context.user_language.get() or 'English'
     
-    exam_type = exam_details_dict[config.exam_name]
-    exam_overview = ""
-
-    with open(exam_type['file_path'], "r") as file:
-        exam_overview = file.read()
+    exam_type = exam_details_dict[exam_name]
+    exam_overview = read_exam_overview(exam_name)
     
-    result = ai_tutor_crew.kickoff(inputs={"user_query": user_query,
-                                        "exam_name": exam_type["exam_name"], "exam_overview": exam_overview,
-                                        "user_language": config.user_language})
+    with span("ai_tutor_crew"):
+        result = ai_tutor_pool.kickoff(inputs={"user_query": user_query,
+                                            "exam_name": exam_type["exam_name"], "exam_overview": exam_overview,
+                                            "user_language": user_language})
 
     return result
 
@@ -142,13 +156,15 @@ def ai_tutor_tool(user_query: str):
 # print(result)
 
 
-exam_guide_agent = Agent(
-    role="Smart AI Tutor for SEBI Certification Exam Questions",
-    goal="Explain SEBI certification exam questions by analyzing why the correct option is right and why other options are wrong, "
-         "using simple, beginner-friendly language in the user's preferred Indian language. "
-         "Provide accurate, exam-focused explanations that help novice learners understand complex financial topics and MCQ reasoning for their SEBI certification exam preparation.",
+def build_exam_guide_crew():
+    """A new crew that explains mock exam questions, for exam_guide_pool"""
+    exam_guide_agent = Agent(
+        role="Smart AI Tutor for SEBI Certification Exam Questions",
+        goal="Explain SEBI certification exam questions by analyzing why the correct option is right and why other options are wrong, "
+             "using simple, beginner-friendly language in the user's preferred Indian language. "
+             "Provide accurate, exam-focused explanations that help novice learners understand complex financial topics and MCQ reasoning for their SEBI certification exam preparation.",
     
-    backstory="""You are an experienced financial educator who has helped thousands of students pass SEBI certification exams. You specialize in breaking down complex financial regulations and market concepts into simple, easy-to-understand explanations, particularly for MCQ-based questions.
+        backstory="""You are an experienced financial educator who has helped thousands of students pass SEBI certification exams. You specialize in breaking down complex financial regulations and market concepts into simple, easy-to-understand explanations, particularly for MCQ-based questions.
 
 Your expertise covers:
 - SEBI regulations and investor protection mechanisms
@@ -166,15 +182,15 @@ You have a unique ability to:
 - Break down complex regulatory concepts into simple, digestible explanations
 
 Your teaching style is patient, encouraging, and focused on building confidence in learners through clear MCQ analysis.""",
-    verbose=True,
-    allow_delegation=False,
-    tools = [StudyMaterialSearchTool(), CalculatorTool(), DateSearchTool(), WebSearchTool()],
-    max_iter=2,
-    llm=llm
-)
-
-answer_explanation_task = Task(
-    description="""Take the user's SEBI certification exam question with MCQ options and provide a comprehensive, beginner-friendly explanation in their preferred language.
+        verbose=True,
+        allow_delegation=False,
+        tools = get_shared_tools(),
+        max_iter=2,
+        llm=get_llm()
+    )
+
+    answer_explanation_task = Task(
+        description="""Take the user's SEBI certification exam question with MCQ options and provide a comprehensive, beginner-friendly explanation in their preferred language.
 Process:
 1. Analyze the exam question to identify the specific financial concept or SEBI regulation being tested
 2. Clearly identify which option is correct and provide detailed reasoning with regulatory references
@@ -190,7 +206,7 @@ THe Question Deatils are as below,
 
 User Language: {user_language}""",
     
-    expected_output="""You will provide a clear, detailed answer that includes:
+        expected_output="""You will provide a clear, detailed answer that includes:
 
 1. **Direct Answer**: Clearly state which option is correct and provide an accurate, concise explanation of why it's the right choice with relevant SEBI regulation references.
 
@@ -211,11 +227,17 @@ User Language: {user_language}""",
 Ensure to include all relevant information/statistics (if applicable) in your answer
 Write only as per these points and nothing else. But don't just write in a pointwise manner, write in a free flowing easy to read manner.
 Do not include any introductory statements about what you are going to say, just write the answer.""",
-    agent=exam_guide_agent,
-)
-
-exam_guide_crew = Crew(
-    agents=[exam_guide_agent],
-    tasks=[answer_explanation_task],
-    verbose=True
-)
\ No newline at end of file
+        agent=exam_guide_agent,
+    )
+
+    return Crew(
+        agents=[exam_guide_agent],
+        tasks=[answer_explanation_task],
+        verbose=True
+    )
+
+
+# Each in-flight kickoff leases a crew of its own, see crew_pool.CrewPool
+ai_tutor_pool = CrewPool("ai_tutor", build_ai_tutor_crew, config.CREW_POOL_SIZE, config.CREW_POOL_TIMEOUT_SECONDS)
+exam_guide_pool = CrewPool("exam_guide", build_exam_guide_crew, config.CREW_POOL_SIZE,
+                           config.CREW_POOL_TIMEOUT_SECONDS)
@@ -1,15 +1,28 @@
 import os
 import logging
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from configs import config
+from upload_limit import UploadLimitMiddleware
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 
+@asynccontextmanager
+async def lifespan(app):
+    """Warm up in the background once the server accepts requests, /readyz reports when it is done"""
+    if config.WARMUP_ON_STARTUP:
+        routes.warmup.start()
+    yield
+
 # Create the app
-app = FastAPI(title="SEBI Vidyalaya", version="1.0.0")
+app = FastAPI(title="SEBI Vidyalaya", version="1.0.0", lifespan=lifespan)
+
+# Reject oversized audio uploads while they stream in, before they are buffered
+app.add_middleware(UploadLimitMiddleware, limits={"/transcribe": config.TRANSCRIBE_MAX_UPLOAD_BYTES})
 
 # Configure static files first
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -31,7 +44,7 @@ templates.env.globals["url_for"] = url_for
 templates.env.globals["get_flashed_messages"] = get_flashed_messages
 
 # Configure upload settings  
-MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max file size
+MAX_CONTENT_LENGTH = config.TRANSCRIBE_MAX_UPLOAD_BYTES  # 5MB max file size
 UPLOAD_FOLDER = 'uploads'
 
 # Ensure upload directory exists
@@ -0,0 +1,117 @@
+"""
+Evaluation time of typical agent-generated calculator expressions.
+
+Each expression is evaluated --repeat times by:
+  - legacy: the previous calculator body, which rebuilt its function dictionary on every call and
+    chose between eval and numexpr.evaluate by substring matching
+  - cold: the expression engine with its compile cache cleared before every call (parse,
+    validate and compile each time)
+  - cached: the expression engine as the calculator tool uses it
+
+and we report the median microseconds per call. Results of all three are checked to agree.
+
+Usage:
+    python benchmarks/calculator_benchmark.py [--repeat 2000]
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numexpr
+import numpy as np
+from scipy import stats
+
+from expression_engine import compile_expression, evaluate
+
+EXPRESSIONS = [
+    "2 + 3 * 4",
+    "(150000 - 120000) / 120000 * 100",
+    "100000 * (1 + 0.12) ** 5",
+    "sqrt(16) + log10(1000)",
+    "(1 + 0.12 / 12) ** 12 - 1",
+    "mean([12.5, 8.2, 15.1, 10.4, 9.8])",
+    "std([12.5, 8.2, 15.1, 10.4, 9.8])",
+    "mean([1, 2, 3]) + std([4, 5, 6])",
+    "max([7.2, 6.8, 8.1]) - min([7.2, 6.8, 8.1])",
+    "5000 * (((1 + 0.01) ** 120 - 1) / 0.01) * (1 + 0.01)",
+]
+
+
+def legacy_calculator(expression):
+    """The calculator body before the expression engine"""
+    def mean(data_list):
+        return np.mean(data_list)
+
+    def median(data_list):
+        return np.median(data_list)
+
+    def mode(data_list):
+        mode_result = stats.mode(data_list, keepdims=True)
+        return float(mode_result.mode[0])
+
+    def std(data_list):
+        return np.std(data_list)
+
+    def var(data_list):
+        return np.var(data_list)
+
+    def min_val(data_list):
+        return np.min(data_list)
+
+    def max_val(data_list):
+        return np.max(data_list)
+
+    local_dict = {"pi": math.pi, "e": math.e, "mean": mean, "median": median, "mode": mode, "std": std,
+                  "var": var, "min": min_val, "max": max_val, "sqrt": np.sqrt, "sin": np.sin, "cos": np.cos,
+                  "tan": np.tan, "log": np.log, "log10": np.log10, "exp": np.exp, "abs": np.abs}
+    expression_clean = expression.strip()
+    if any(func in expression_clean for func in ['mean', 'median', 'mode', 'std', 'var', 'min', 'max']):
+        result = eval(expression_clean, {"__builtins__": {}}, local_dict)
+    else:
+        result = numexpr.evaluate(expression_clean, local_dict=local_dict)
+    return str(result)
+
+
+def cold(expression):
+    compile_expression.cache_clear()
+    return evaluate(expression)
+
+
+def time_calls(function, expression, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(expression)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'expression':<55} {'legacy us':>9} {'cold us':>8} {'cached us':>9} {'speedup':>8}")
+    totals = {"legacy": 0.0, "cold": 0.0, "cached": 0.0}
+    for expression in EXPRESSIONS:
+        expected = float(legacy_calculator(expression))
+        assert math.isclose(float(evaluate(expression)), expected, rel_tol=1e-9), expression
+        timings = {"legacy": time_calls(legacy_calculator, expression, args.repeat),
+                   "cold": time_calls(cold, expression, args.repeat),
+                   "cached": time_calls(evaluate, expression, args.repeat)}
+        for name, value in timings.items():
+            totals[name] += value
+        print(f"{expression[:55]:<55} {timings['legacy']:>9.1f} {timings['cold']:>8.1f} {timings['cached']:>9.1f} "
+              f"{timings['legacy'] / timings['cached']:>7.1f}x")
+    print(f"{'total':<55} {totals['legacy']:>9.1f} {totals['cold']:>8.1f} {totals['cached']:>9.1f} "
+          f"{totals['legacy'] / totals['cached']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
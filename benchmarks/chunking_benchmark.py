@@ -0,0 +1,90 @@
+"""
+Compare page-level and chunk-level indexing of the study materials.
+
+Each sample question is used as a query against both indexes. Retrieved chunks are merged
+back into page citations the same way display_results does, then we report:
+  - answer recall: share of the correct option's terms found in the retrieved context
+  - page hit rate: share of queries whose top-k citations include the best page for the answer
+  - prompt size: estimated tokens of retrieved context handed to the LLM
+
+Usage:
+    python benchmarks/chunking_benchmark.py [--scorer embedding|lexical] [--top-k 5]
+
+The embedding scorer calls the embeddings endpoint for every chunk once and caches the
+vectors in benchmarks/.cache; the lexical scorer (BM25) runs fully offline.
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_index import build_records
+from chunking import merge_chunks
+from context_packer import _lexical_scores, estimate_tokens, tokenize
+from corpus import EXAM_DOCUMENTS, load_questions
+from benchmarks.common import EmbeddingCache
+
+
+def rank(records, query, scorer, cache):
+    if scorer == "lexical":
+        for record in records:
+            if "tokens" not in record:
+                record["tokens"] = tokenize(record["document"])
+        scores = _lexical_scores(tokenize(query), [record["tokens"] for record in records])
+    else:
+        import numpy as np
+        matrix = np.asarray(cache.embed([record["document"] for record in records]), dtype=np.float32)
+        query_vector = np.asarray(cache.embed([query])[0], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        scores = (matrix @ (query_vector / (np.linalg.norm(query_vector) + 1e-12))).tolist()
+    return sorted(range(len(records)), key=lambda i: scores[i], reverse=True)
+
+
+def cite(records, ranked, top_k):
+    """Group the top-k records into page citations like display_results"""
+    pages = {}
+    for index in ranked[:top_k]:
+        metadata = records[index]["metadata"]
+        pages.setdefault((metadata["file_name"], metadata["page_number"]), []).append({
+            "page_content": records[index]["document"], "start": metadata["start"], "end": metadata["end"]})
+    return {key: merge_chunks(chunks) for key, chunks in pages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scorer", choices=["embedding", "lexical"], default="embedding")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    cache = EmbeddingCache()
+
+    print(f"{'exam':<20} {'granularity':<11} {'records':>7} {'answer recall':>13} {'page hits':>9} {'prompt tokens':>13}")
+    for exam_name in EXAM_DOCUMENTS:
+        questions = load_questions(exam_name)
+        page_records = build_records(exam_name, "page")
+        for granularity in ("page", "chunk"):
+            records = page_records if granularity == "page" else build_records(exam_name, "chunk")
+            recalls, hits, tokens = [], [], []
+            for question in questions:
+                answer = question["options"].get(question["correct_option"], "")
+                answer_terms = set(tokenize(answer))
+                # the page that best matches question + answer stands in for the labelled relevant page
+                best_page = rank(page_records, f"{question['question']} {answer}", "lexical", cache)[0]
+                best_key = (page_records[best_page]["metadata"]["file_name"],
+                            page_records[best_page]["metadata"]["page_number"])
+
+                citations = cite(records, rank(records, question["question"], args.scorer, cache), args.top_k)
+                context_terms = set()
+                for text in citations.values():
+                    context_terms.update(tokenize(text))
+                recalls.append(len(answer_terms & context_terms) / len(answer_terms) if answer_terms else 1.0)
+                hits.append(best_key in citations)
+                tokens.append(sum(estimate_tokens(text) for text in citations.values()))
+            print(f"{exam_name:<20} {granularity:<11} {len(records):>7} {statistics.mean(recalls):>13.2%} "
+                  f"{statistics.mean(hits):>9.2%} {statistics.mean(tokens):>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Helpers shared by the benchmark scripts"""
+import hashlib
+import json
+import os
+
+CACHE_PATH = os.path.join("benchmarks", ".cache", "embeddings.json")
+
+
+class EmbeddingCache:
+    """Embeds texts through the embeddings endpoint once and keeps the vectors on disk"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.vectors = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.vectors = json.load(file)
+
+    def embed(self, texts):
+        from embeddings import get_embeddings_batch
+        keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        missing = [(key, text) for key, text in zip(keys, texts) if key not in self.vectors]
+        if missing:
+            # cache full size vectors, reduced sizes are derived by truncation
+            vectors = get_embeddings_batch([text for _, text in missing], dimensions=768)
+            self.vectors.update({key: vector for (key, _), vector in zip(missing, vectors)})
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as file:
+                json.dump(self.vectors, file)
+        return [self.vectors[key] for key in keys]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
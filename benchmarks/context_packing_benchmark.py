@@ -0,0 +1,69 @@
+"""
+Measure how much prompt text the context packer removes from knowledge base tool
+results, and how much of the correct answer's wording survives packing.
+
+Each sample question is used as the query. The 5 pages that best match the question
+lexically stand in for the vector search hits that display_results would return.
+
+Usage:
+    python benchmarks/context_packing_benchmark.py [--budget 1500]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_packer import _lexical_scores, estimate_tokens, pack_documents, tokenize
+from corpus import EXAM_DOCUMENTS, load_exam_pages, load_questions
+
+
+def answer_coverage(answer, documents):
+    answer_tokens = set(tokenize(answer))
+    if not answer_tokens:
+        return 1.0
+    context_tokens = set()
+    for document in documents:
+        context_tokens.update(tokenize(document["page_content"]))
+    return len(answer_tokens & context_tokens) / len(answer_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'exam':<20} {'queries':>7} {'tokens before':>14} {'tokens after':>13} "
+          f"{'coverage before':>16} {'coverage after':>15} {'pack ms':>8}")
+    for exam_name in EXAM_DOCUMENTS:
+        pages = load_exam_pages(exam_name)
+        page_tokens = [tokenize(page["page_content"]) for page in pages]
+        before, after, coverage_before, coverage_after, pack_ms = [], [], [], [], []
+        for question in load_questions(exam_name):
+            query = question["question"]
+            scores = _lexical_scores(tokenize(query), page_tokens)
+            top = sorted(range(len(pages)), key=lambda i: scores[i], reverse=True)[:args.top_k]
+            hits = [{"page_content": pages[i]["page_content"], "document_name": pages[i]["document_name"],
+                     "page_number": pages[i]["page_number"]} for i in top]
+
+            start = time.perf_counter()
+            packed = pack_documents(query, hits, args.budget, document_scores=[scores[i] for i in top])
+            pack_ms.append((time.perf_counter() - start) * 1000)
+
+            answer = question["options"].get(question["correct_option"], "")
+            before.append(sum(estimate_tokens(hit["page_content"]) for hit in hits))
+            after.append(sum(estimate_tokens(doc["page_content"]) for doc in packed))
+            coverage_before.append(answer_coverage(answer, hits))
+            coverage_after.append(answer_coverage(answer, packed))
+
+        print(f"{exam_name:<20} {len(before):>7} {statistics.mean(before):>14.0f} {statistics.mean(after):>13.0f} "
+              f"{statistics.mean(coverage_before):>16.2%} {statistics.mean(coverage_after):>15.2%} "
+              f"{statistics.mean(pack_ms):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Cold start time and resident memory of reading study material pages from the JSON page
+files versus the memory-mapped corpus_store artifacts.
+
+Each variant runs in a fresh interpreter: it opens every document and then reads random
+pages by page number. Memory is reported from /proc/self/status, split into private
+(RssAnon) and file-backed (RssFile) pages; file-backed pages are shared by all workers.
+
+Usage:
+    python corpus_store.py                                # build the artifacts first
+    python benchmarks/corpus_store_benchmark.py [--reads 200]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, random, sys, time
+sys.path.insert(0, ".")
+import corpus, corpus_store
+start = time.perf_counter()
+variant, reads = sys.argv[1], int(sys.argv[2])
+names = sorted(corpus.page_files())
+if variant == "json":
+    documents = {name: {page["page_number"]: page for page in corpus.load_pages(corpus.page_files()[name])}
+                 for name in names}
+    read = lambda name, page_number: documents[name][page_number]["page_content"]
+    page_numbers = {name: list(documents[name]) for name in names}
+else:
+    documents = {name: corpus_store.open_document(name) for name in names}
+    read = lambda name, page_number: documents[name].page_text(page_number)
+    page_numbers = {name: documents[name].page_numbers for name in names}
+loaded = time.perf_counter()
+random.seed(0)
+for _ in range(reads):
+    name = random.choice(names)
+    read(name, random.choice(page_numbers[name]))
+done = time.perf_counter()
+status = dict(line.split(":", 1) for line in open("/proc/self/status") if line.startswith("Rss"))
+print(json.dumps({"load_ms": (loaded - start) * 1000, "read_us": (done - loaded) * 1e6 / reads,
+                  "rss_anon_kib": int(status["RssAnon"].split()[0]), "rss_file_kib": int(status["RssFile"].split()[0])}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'variant':<10} {'load ms':>8} {'read us':>8} {'private KiB':>11} {'shared KiB':>10}")
+    for variant in ("json", "artifact"):
+        output = subprocess.run([sys.executable, "-c", CHILD, variant, str(args.reads)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{variant:<10} {result['load_ms']:>8.1f} {result['read_us']:>8.1f} "
+              f"{result['rss_anon_kib']:>11} {result['rss_file_kib']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Local stand-ins for the external services, so the app can be load tested without spending quota.
+
+One FastAPI app serves:
+  - Azure OpenAI chat completions (any path ending in /chat/completions): streamed or not, with
+    --ttft and --token-rate, a tool call answer for --tool-call-rate of the first passes, JSON
+    questions for the mock exam prompt and "Final Answer:" replies for the crew agents
+  - Vertex AI embeddings (any path ending in :predict): deterministic unit vectors of 768 (or
+    outputDimensionality) dimensions, answering 429 for --embedding-429-rate of the requests
+  - Serper (/search) and the web pages it links to (/pages/<n>)
+  - Google OAuth (/token) for the generated service account, the Translation API v3 and the
+    Speech-to-Text REST recognize call
+
+Usage:
+    python benchmarks/fake_services.py [--port 8900] [--ttft 0.4] [--token-rate 60]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+
+FAKE_CREDENTIALS_PATH = os.path.join("benchmarks", ".cache", "fake_service_account.json")
+
+ANSWER_WORDS = ("A systematic investment plan invests a fixed amount at regular intervals, which averages the "
+                "purchase cost over market cycles. SEBI requires mutual funds to disclose the expense ratio, "
+                "and investors should read the scheme information document before investing.").split()
+
+QUESTION = {
+    "question": "Which document should an investor read before investing in a mutual fund scheme?",
+    "options": [{"a": "Annual report of the AMC"}, {"b": "Scheme Information Document"},
+                {"c": "Broker contract note"}, {"d": "Demat statement"}],
+    "correct_option": "b",
+    "topic_name": "Mutual fund documents",
+    "difficulty": "easy",
+}
+
+TOOL_ARGUMENTS = {
+    "calculator": {"expression": "sip_fv(5000, [0.08, 0.10, 0.12], 10)"},
+    "get_web_search_result": {"query": "SEBI mutual fund expense ratio circular"},
+    "ai_tutor_tool": {"user_query": "What is a systematic investment plan?"},
+}
+
+
+def write_fake_credentials(path, token_uri):
+    """Service account file with a freshly generated key whose tokens come from the fake /token"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"type": "service_account", "project_id": "load-test", "private_key_id": "fake",
+                   "private_key": pem, "client_email": "load-test@load-test.iam.gserviceaccount.com",
+                   "client_id": "0", "token_uri": token_uri}, file)
+    return path
+
+
+def create_app(args):
+    app = FastAPI()
+    rng = random.Random(args.seed)
+    stats = {"chat": 0, "tool_calls": 0, "embeddings": 0, "embedding_429": 0, "search": 0, "pages": 0,
+             "translate": 0, "speech": 0, "token": 0}
+
+    def completion_chunk(model, delta, finish_reason=None):
+        return {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    def plan_reply(body):
+        """Decide what the fake model answers: ('tool', name, arguments) or ('text', content)"""
+        messages = body.get("messages", [])
+        text = json.dumps(messages)
+        tools = [tool["function"]["name"] for tool in body.get("tools", []) if tool.get("type") == "function"]
+        answered_tool = any(message.get("role") == "tool" for message in messages)
+        if "Examiner" in text:
+            return "text", json.dumps(QUESTION)
+        if tools and not answered_tool and rng.random() < args.tool_call_rate:
+            name = rng.choice([tool for tool in tools if tool in TOOL_ARGUMENTS] or tools)
+            return "tool", name, TOOL_ARGUMENTS.get(name, {})
+        answer = " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(args.answer_tokens))
+        if "Final Answer" in text:
+            # crew agents follow the ReAct format
+            answer = f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        return "text", answer
+
+    @app.post("/{path:path}/chat/completions")
+    async def chat_completions(path: str, request: Request):
+        body = await request.json()
+        model = body.get("model") or path.rsplit("/", 1)[-1]
+        reply = plan_reply(body)
+        stats["chat"] += 1
+        if reply[0] == "tool":
+            stats["tool_calls"] += 1
+        tokens = [] if reply[0] == "tool" else [word + " " for word in reply[1].split(" ")]
+        usage = {"prompt_tokens": len(json.dumps(body)) // 4, "completion_tokens": max(1, len(tokens)),
+                 "total_tokens": len(json.dumps(body)) // 4 + max(1, len(tokens))}
+
+        if not body.get("stream"):
+            await asyncio.sleep(args.ttft + len(tokens) / args.token_rate)
+            message = {"role": "assistant", "content": "".join(tokens).strip() or None}
+            if reply[0] == "tool":
+                message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                                          "function": {"name": reply[1], "arguments": json.dumps(reply[2])}}]
+            return {"id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": message,
+                                 "finish_reason": "tool_calls" if reply[0] == "tool" else "stop"}],
+                    "usage": usage}
+
+        async def stream():
+            await asyncio.sleep(args.ttft)
+            yield f"data: {json.dumps(completion_chunk(model, {'role': 'assistant', 'content': ''}))}\n\n"
+            if reply[0] == "tool":
+                call = {"index": 0, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                        "function": {"name": reply[1], "arguments": json.dumps(reply[2])}}
+                yield f"data: {json.dumps(completion_chunk(model, {'tool_calls': [call]}))}\n\n"
+                finish_reason = "tool_calls"
+            else:
+                for token in tokens:
+                    yield f"data: {json.dumps(completion_chunk(model, {'content': token}))}\n\n"
+                    await asyncio.sleep(1 / args.token_rate)
+                finish_reason = "stop"
+            yield f"data: {json.dumps(completion_chunk(model, {}, finish_reason))}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final = completion_chunk(model, {})
+                final["choices"], final["usage"] = [], usage
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/{path:path}:predict")
+    async def predict(path: str, request: Request):
+        body = await request.json()
+        stats["embeddings"] += 1
+        await asyncio.sleep(args.embedding_latency)
+        if rng.random() < args.embedding_429_rate:
+            stats["embedding_429"] += 1
+            return JSONResponse({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, status_code=429)
+        dimensions = (body.get("parameters") or {}).get("outputDimensionality", 768)
+        predictions = []
+        for instance in body.get("instances", []):
+            seed = int.from_bytes(hashlib.sha1(instance.get("content", "").encode()).digest()[:4], "little")
+            vector = np.random.default_rng(seed).standard_normal(dimensions)
+            predictions.append({"embeddings": {"values": (vector / np.linalg.norm(vector)).tolist()}})
+        return {"predictions": predictions}
+
+    @app.post("/token")
+    async def token():
+        stats["token"] += 1
+        return {"access_token": f"fake-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        stats["search"] += 1
+        await asyncio.sleep(args.search_latency)
+        base = str(request.base_url).rstrip("/")
+        return {"organic": [{"title": f"{body.get('q', '')} result {i}", "link": f"{base}/pages/{i}"}
+                            for i in range(args.search_results)]}
+
+    @app.get("/pages/{page}", response_class=HTMLResponse)
+    async def page(page: int):
+        stats["pages"] += 1
+        await asyncio.sleep(args.page_latency)
+        paragraphs = "".join(f"<p>{' '.join(ANSWER_WORDS)}</p>" for _ in range(12))
+        return (f"<html><head><title>Page {page}</title></head><body><nav>Home | About</nav>"
+                f"<article><h1>Investor education {page}</h1>{paragraphs}</article><footer>(c)</footer></body></html>")
+
+    @app.post("/v3/projects/{project}:translateText")
+    async def translate(project: str, request: Request):
+        body = await request.json()
+        stats["translate"] += 1
+        await asyncio.sleep(args.translation_latency)
+        target = body.get("targetLanguageCode", "")
+        return {"translations": [{"translatedText": f"[{target}] {text}"} for text in body.get("contents", [])]}
+
+    @app.post("/v1/speech:recognize")
+    async def recognize(request: Request):
+        await request.body()
+        stats["speech"] += 1
+        await asyncio.sleep(args.speech_latency)
+        return {"results": [{"alternatives": [{"transcript": "what is a systematic investment plan",
+                                               "confidence": 0.92}]}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ttft", type=float, default=0.4, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=60, help="streamed tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--tool-call-rate", type=float, default=0.5,
+                        help="share of first passes answered with a tool call")
+    parser.add_argument("--embedding-latency", type=float, default=0.08)
+    parser.add_argument("--embedding-429-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--search-results", type=int, default=3)
+    parser.add_argument("--page-latency", type=float, default=0.15)
+    parser.add_argument("--translation-latency", type=float, default=0.1)
+    parser.add_argument("--speech-latency", type=float, default=0.5)
+    return parser
+
+
+def main():
+    import uvicorn
+
+    args = build_parser().parse_args()
+    uvicorn.run(create_app(args), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the streaming main-content extractor against the previous
+BeautifulSoup get_text() + clean_text() path on saved HTML fixtures.
+
+Usage:
+    python benchmarks/html_extraction_benchmark.py [--repeat 20] [--max-chars 5000]
+    python benchmarks/html_extraction_benchmark.py --save https://example.com/page ...
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extractor import extract_main_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'html')
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+except ImportError:
+    def count_tokens(text):
+        # rough approximation: words and punctuation marks
+        return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def clean_text(text):
+    """Previous cleanup used by get_web_search_result"""
+    text = re.sub(r'\n\s*\n+', '\n', text)
+    text = re.sub(r' +', ' ', text)
+    lines = [line.strip() for line in text.split('\n')]
+    cleaned_lines = [line for line in lines if line]
+    return '\n'.join(cleaned_lines)
+
+
+def baseline_extract(html, max_chars):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return clean_text(soup.get_text())[:max_chars]
+
+
+def streaming_extract(html, max_chars):
+    return extract_main_text(html, max_chars=max_chars)
+
+
+def measure(func, html, max_chars, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        text = func(html, max_chars)
+    elapsed_ms = (time.process_time() - start) * 1000 / repeat
+    return elapsed_ms, text
+
+
+def save_fixtures(urls):
+    import requests
+    for url in urls:
+        response = requests.get(url, timeout=10)
+        name = re.sub(r'[^A-Za-z0-9]+', '_', url.split('://', 1)[-1]).strip('_')[:80] + '.html'
+        with open(os.path.join(FIXTURES_DIR, name), 'wb') as file:
+            file.write(response.content)
+        print(f"saved {url} -> {name} ({len(response.content)} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-chars', type=int, default=5000)
+    parser.add_argument('--save', nargs='+', metavar='URL', help="download pages into the fixture corpus")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save)
+        return
+
+    try:
+        import bs4  # noqa: F401
+        has_baseline = True
+    except ImportError:
+        print("beautifulsoup4 not installed, only the streaming extractor is measured")
+        has_baseline = False
+
+    header = f"{'fixture':<32} {'bytes':>8} {'old ms':>8} {'new ms':>8} {'old tok':>8} {'new tok':>8}"
+    print(header)
+    print('-' * len(header))
+    totals = [0.0, 0.0, 0, 0]
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, 'rb') as file:
+            raw = file.read()
+        html = raw.decode('utf-8', errors='replace')
+
+        new_ms, new_text = measure(streaming_extract, html, args.max_chars, args.repeat)
+        old_ms, old_text = (measure(baseline_extract, raw, args.max_chars, args.repeat)
+                            if has_baseline else (0.0, ''))
+        old_tokens, new_tokens = count_tokens(old_text), count_tokens(new_text)
+        totals[0] += old_ms
+        totals[1] += new_ms
+        totals[2] += old_tokens
+        totals[3] += new_tokens
+        print(f"{os.path.basename(path)[:32]:<32} {len(raw):>8} {old_ms:>8.2f} {new_ms:>8.2f} {old_tokens:>8} {new_tokens:>8}")
+
+    print('-' * len(header))
+    print(f"{'total':<32} {'':>8} {totals[0]:>8.2f} {totals[1]:>8.2f} {totals[2]:>8} {totals[3]:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure how often the lexical fast path of search_knowledge_base fires and what it saves.
+
+Queries are the sample questions of every exam plus their topic names, which look like the
+short keyword queries agents send ("NAV", "ELSS lock-in", ...). The BM25 index is built over
+the same chunk records build_index.py writes to Chroma.
+
+For the latency effect, the embedding round trip is timed against the real endpoint when
+--live is given, otherwise --embedding-ms is used as its cost.
+
+Usage:
+    python benchmarks/hybrid_search_benchmark.py [--live] [--embedding-ms 350]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_index import build_records
+from configs import config
+from corpus import EXAM_DOCUMENTS, load_questions
+from lexical_index import BM25Index
+from benchmarks.common import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--granularity", choices=["chunk", "page"], default=config.INDEX_GRANULARITY)
+    parser.add_argument("--live", action="store_true", help="time real embedding calls")
+    parser.add_argument("--embedding-ms", type=float, default=350.0)
+    args = parser.parse_args()
+
+    print(f"{'exam':<20} {'query kind':<10} {'queries':>7} {'fast path':>9} {'bm25 p50 ms':>11} "
+          f"{'embed ms':>8} {'saved ms/query':>14}")
+    for exam_name in EXAM_DOCUMENTS:
+        records = build_records(exam_name, args.granularity)
+        index = BM25Index([r["id"] for r in records], [r["document"] for r in records],
+                          [r["metadata"] for r in records])
+        questions = load_questions(exam_name)
+        query_sets = {
+            "question": [question["question"] for question in questions],
+            "topic": sorted({question["topic_name"] for question in questions}),
+        }
+        for kind, queries in query_sets.items():
+            fast, lexical_ms, embed_ms = 0, [], []
+            for query in queries:
+                start = time.perf_counter()
+                hits = index.search(query, k=config.KB_TOP_K * 2)
+                confident = index.is_confident(query, hits)
+                lexical_ms.append((time.perf_counter() - start) * 1000)
+                fast += confident
+                if args.live:
+                    from embeddings import get_embeddings
+                    start = time.perf_counter()
+                    get_embeddings(query)
+                    embed_ms.append((time.perf_counter() - start) * 1000)
+            embedding_cost = statistics.mean(embed_ms) if embed_ms else args.embedding_ms
+            print(f"{exam_name:<20} {kind:<10} {len(queries):>7} {fast / len(queries):>9.1%} "
+                  f"{percentile(lexical_ms, 0.5):>11.2f} {embedding_cost:>8.0f} "
+                  f"{fast / len(queries) * embedding_cost:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+End-to-end load test of the app against local stand-ins for every external service.
+
+Starts benchmarks/fake_services.py, writes a throwaway service account whose tokens come from the
+fake OAuth endpoint, starts the app with uvicorn pointed at the fakes, and then drives each
+scenario with --concurrency parallel clients for --requests requests:
+  - send_message: a chat question (the fake model calls a tool for --tool-call-rate of them)
+  - same_question: a class asking the same chat question at once (concurrent identical requests
+    share one run)
+  - mock_exam: the next mock exam question
+  - generate_explanation: the exam guide crew explaining a question
+  - transcribe: a final transcription of a 5 second recording
+
+For every scenario we report throughput, errors, time to first byte and p50/p95/p99 latency of the
+complete response. Fake service latencies stay fixed between runs, so changes in these numbers
+come from the orchestration code. Pass --app-url to load test an app that is already running
+(it has to be configured for the fakes itself).
+
+Usage:
+    python benchmarks/load_test.py [--scenarios send_message transcribe] [--concurrency 8] [--requests 40]
+                                   [--ttft 0.4] [--token-rate 60] [--tool-call-rate 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from corpus import load_questions
+from benchmarks.common import percentile
+from benchmarks.fake_services import FAKE_CREDENTIALS_PATH, build_parser as fake_parser, write_fake_credentials
+
+SCENARIOS = ["send_message", "same_question", "mock_exam", "generate_explanation", "transcribe"]
+EXAM = "investor_awareness"
+
+
+def app_environment(fake_url):
+    return {
+        **os.environ,
+        "AZURE_API_BASE": fake_url,
+        "AZURE_API_KEY": "load-test",
+        "AZURE_API_VERSION": "2024-10-21",
+        "DEPLOYMENT_NAME": "gpt-4o",
+        "EMBEDDINGS_URL": f"{fake_url}/v1/projects/load-test/locations/us-central1/publishers/google/models/"
+                          f"text-embedding-005:predict",
+        "GOOGLE_CREDS_JSON": FAKE_CREDENTIALS_PATH,
+        "GOOGLE_PROJECT_ID": "load-test",
+        "SERPER_API_KEY": "load-test",
+        "SERPER_URL": f"{fake_url}/search",
+        "TRANSLATION_API_BASE": fake_url,
+        "SPEECH_API_ENDPOINT": fake_url,
+    }
+
+
+async def wait_until_up(url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process and process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def build_requests(scenario, count):
+    questions = load_questions(EXAM)
+    requests = []
+    for i in range(count):
+        question = questions[0 if scenario == "same_question" else i % len(questions)]
+        if scenario in ("send_message", "same_question"):
+            requests.append(("POST", "/send_message", {"json": {
+                "exam_type": EXAM, "language": "en-US",
+                "chat_history": [{"role": "user", "content": question["question"]}]}}))
+        elif scenario == "mock_exam":
+            requests.append(("POST", "/mock_exam", {"json": {"messages": [], "is_initial": True, "exam_type": EXAM}}))
+        elif scenario == "generate_explanation":
+            requests.append(("POST", "/generate_explanation", {"json": {
+                "question": json.dumps(question, ensure_ascii=False), "language": "en-US", "exam_type": EXAM}}))
+        elif scenario == "transcribe":
+            # the fake recognizer does not decode audio, only the size of the upload matters
+            audio = os.urandom(5 * 4000)
+            requests.append(("POST", "/transcribe", {"files": {"audio_data": ("audio.webm", audio, "audio/webm")},
+                                                     "data": {"language": "en-US", "streaming": "false"}}))
+    return requests
+
+
+async def run_scenario(client, scenario, concurrency, count):
+    requests = build_requests(scenario, count)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one(method, path, kwargs):
+        async with semaphore:
+            start = time.perf_counter()
+            first_byte = None
+            try:
+                async with client.stream(method, path, **kwargs) as response:
+                    async for _ in response.aiter_bytes():
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                    ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            results.append((ok, first_byte if first_byte is not None else elapsed, elapsed))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    wall = time.perf_counter() - start
+    latencies = [elapsed for ok, _, elapsed in results if ok] or [0.0]
+    first_bytes = [first_byte for ok, first_byte, _ in results if ok] or [0.0]
+    return {
+        "requests": len(results),
+        "errors": sum(not ok for ok, _, _ in results),
+        "throughput": len(results) / wall,
+        "ttfb_p50": statistics.median(first_bytes),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+async def drive(args, app_url):
+    print(f"{'scenario':<22} {'requests':>8} {'errors':>6} {'req/s':>7} {'ttfb p50':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        for scenario in args.scenarios:
+            row = await run_scenario(client, scenario, args.concurrency, args.requests)
+            print(f"{scenario:<22} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>7.2f} "
+                  f"{row['ttfb_p50'] * 1000:>9.0f} {row['p50'] * 1000:>8.0f} {row['p95'] * 1000:>8.0f} "
+                  f"{row['p99'] * 1000:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     parents=[fake_parser()], conflict_handler="resolve")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--app-url", help="load test an app that is already running")
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        app_url = args.app_url
+        if not app_url:
+            fake_url = f"http://127.0.0.1:{args.port}"
+            write_fake_credentials(FAKE_CREDENTIALS_PATH, f"{fake_url}/token")
+            fake_args = [f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items()
+                         if name in vars(fake_parser().parse_args([]))]
+            processes.append(subprocess.Popen([sys.executable, "benchmarks/fake_services.py", *fake_args]))
+            asyncio.run(wait_until_up(f"{fake_url}/stats", processes[-1]))
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.app_port), "--log-level", "warning"],
+                env=app_environment(fake_url)))
+            app_url = f"http://127.0.0.1:{args.app_port}"
+            # measure the warmed-up steady state, /readyz answers 503 until the startup warm-up is done
+            asyncio.run(wait_until_up(f"{app_url}/readyz", processes[-1]))
+        asyncio.run(drive(args, app_url))
+        if not args.app_url:
+            print("fake service calls:", httpx.get(f"http://127.0.0.1:{args.port}/stats").json())
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Prompt tokens saved by MMR re-ranking at equal answer recall.
+
+Each sample question retrieves MMR_FETCH_K candidates, which are cut to k either by plain
+relevance order (the baseline) or by maximal marginal relevance. For every k we report:
+  - answer recall: share of the correct option's terms found in the retrieved context
+  - prompt size: estimated tokens of the cited pages handed to the LLM
+  - near duplicates: share of selected pairs with cosine similarity above --duplicate-threshold
+
+The summary line compares the baseline at KB_TOP_K with the smallest MMR k whose answer
+recall is at least as high.
+
+Usage:
+    python benchmarks/mmr_benchmark.py [--scorer embedding|lexical] [--granularity page|chunk]
+                                       [--lambdas 0.8 0.7 0.5]
+
+The embedding scorer embeds questions (and records without a stored vector) once through the
+embeddings endpoint and caches them in benchmarks/.cache. The lexical scorer ranks with BM25
+and runs offline on the exams whose page files carry vectors.
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from build_index import build_records
+from configs import config
+from context_packer import _lexical_scores, estimate_tokens, tokenize
+from corpus import EXAM_DOCUMENTS, load_questions
+from reranking import maximal_marginal_relevance
+from benchmarks.chunking_benchmark import cite
+from benchmarks.common import EmbeddingCache
+
+
+def relevance_scores(records, matrix, question, scorer, cache):
+    if scorer == "lexical":
+        return np.asarray(_lexical_scores(tokenize(question), [record["tokens"] for record in records]),
+                          dtype=np.float32)
+    query = np.asarray(cache.embed([question])[0], dtype=np.float32)
+    return matrix @ (query / (np.linalg.norm(query) + 1e-12))
+
+
+def evaluate(records, matrix, selected, answer_terms, threshold):
+    citations = cite(records, selected, len(selected))
+    context_terms = set()
+    for text in citations.values():
+        context_terms.update(tokenize(text))
+    recall = len(answer_terms & context_terms) / len(answer_terms) if answer_terms else 1.0
+    tokens = sum(estimate_tokens(text) for text in citations.values())
+    similarity = matrix[selected] @ matrix[selected].T
+    pairs = np.triu_indices(len(selected), 1)
+    duplicates = float((similarity[pairs] > threshold).mean()) if len(pairs[0]) else 0.0
+    return recall, tokens, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scorer", choices=["embedding", "lexical"], default="embedding")
+    parser.add_argument("--granularity", choices=["chunk", "page"], default="page")
+    parser.add_argument("--fetch-k", type=int, default=config.MMR_FETCH_K)
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.8, 0.7, 0.5])
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 4, 5, 6])
+    parser.add_argument("--duplicate-threshold", type=float, default=0.9)
+    args = parser.parse_args()
+    cache = EmbeddingCache()
+
+    print(f"{'exam':<20} {'ranking':<10} {'k':>2} {'answer recall':>13} {'prompt tokens':>13} {'near dups':>9}")
+    for exam_name in EXAM_DOCUMENTS:
+        records = build_records(exam_name, args.granularity)
+        missing = [record for record in records if not record["embedding"]]
+        if missing and args.scorer == "lexical":
+            records = [record for record in records if record["embedding"]]
+        elif missing:
+            for record, vector in zip(missing, cache.embed([record["document"] for record in missing])):
+                record["embedding"] = vector
+        if not records:
+            print(f"{exam_name:<20} no stored vectors, skipped")
+            continue
+        for record in records:
+            record["tokens"] = tokenize(record["document"])
+        matrix = np.asarray([record["embedding"] for record in records], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+
+        rankings = {"relevance": {}, **{f"mmr {lambda_mult}": {} for lambda_mult in args.lambdas}}
+        for question in load_questions(exam_name):
+            answer_terms = set(tokenize(question["options"].get(question["correct_option"], "")))
+            scores = relevance_scores(records, matrix, question["question"], args.scorer, cache)
+            candidates = np.argsort(-scores)[:args.fetch_k]
+            relevance = scores[candidates]
+            spread = relevance.max() - relevance.min()
+            relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+            for k in args.k:
+                selections = {"relevance": candidates[:k].tolist()}
+                for lambda_mult in args.lambdas:
+                    order = maximal_marginal_relevance(relevance, matrix[candidates], k, lambda_mult)
+                    selections[f"mmr {lambda_mult}"] = candidates[order].tolist()
+                for name, selected in selections.items():
+                    rankings[name].setdefault(k, []).append(
+                        evaluate(records, matrix, selected, answer_terms, args.duplicate_threshold))
+
+        summary = {}
+        for name, by_k in rankings.items():
+            for k, rows in by_k.items():
+                recall, tokens, duplicates = (statistics.mean(column) for column in zip(*rows))
+                summary[name, k] = (recall, tokens)
+                print(f"{exam_name:<20} {name:<10} {k:>2} {recall:>13.2%} {tokens:>13.0f} {duplicates:>9.2%}")
+
+        baseline_recall, baseline_tokens = summary.get(("relevance", config.KB_TOP_K), (None, None))
+        if baseline_recall is None:
+            continue
+        for lambda_mult in args.lambdas:
+            matching = [(k, tokens) for (name, k), (recall, tokens) in sorted(summary.items())
+                        if name == f"mmr {lambda_mult}" and recall >= baseline_recall]
+            if matching:
+                k, tokens = min(matching)
+                print(f"{exam_name:<20} mmr {lambda_mult} reaches the k={config.KB_TOP_K} recall with k={k}: "
+                      f"{tokens:.0f} vs {baseline_tokens:.0f} tokens ({1 - tokens / baseline_tokens:.1%} saved)")
+            else:
+                print(f"{exam_name:<20} mmr {lambda_mult} does not reach the k={config.KB_TOP_K} recall")
+
+
+if __name__ == "__main__":
+    main()
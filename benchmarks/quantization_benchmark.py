@@ -0,0 +1,86 @@
+"""
+Memory, search latency and recall@5 of reduced-dimension and quantized vector storage,
+relative to full precision (768 dims, float32).
+
+Queries are the sample questions of each exam, embedded through the embeddings endpoint
+(cached in benchmarks/.cache). With --queries pages the stored page vectors are used as
+queries instead (each page against the rest), which needs no API access.
+
+Usage:
+    python benchmarks/quantization_benchmark.py [--queries questions|pages] [--granularity page|chunk]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from build_index import build_records
+from corpus import EXAM_DOCUMENTS, load_questions
+from vector_index import VectorIndex
+from benchmarks.common import EmbeddingCache, percentile
+
+SETTINGS = [(768, "float32"), (768, "float16"), (768, "int8"),
+            (256, "float32"), (256, "float16"), (256, "int8"), (128, "int8")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", choices=["questions", "pages"], default="questions")
+    parser.add_argument("--granularity", choices=["chunk", "page"], default="page")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    cache = EmbeddingCache()
+
+    print(f"{'exam':<20} {'dims':>4} {'dtype':<7} {'records':>7} {'memory KiB':>10} {'p50 us':>8} "
+          f"{'p95 us':>8} {'recall@' + str(args.top_k):>9}")
+    for exam_name in EXAM_DOCUMENTS:
+        records = build_records(exam_name, args.granularity)
+        missing = [record for record in records if not record["embedding"]]
+        if missing:
+            if args.queries == "pages":
+                records = [record for record in records if record["embedding"]]
+            else:
+                for record, vector in zip(missing, cache.embed([r["document"] for r in missing])):
+                    record["embedding"] = vector
+        if not records:
+            print(f"{exam_name:<20} no stored vectors, skipped")
+            continue
+
+        if args.queries == "pages":
+            queries = [record["embedding"] for record in records]
+        else:
+            queries = cache.embed([question["question"] for question in load_questions(exam_name)])
+
+        # a stored page is its own nearest neighbour, so page queries leave it out on both sides
+        own_ids = [record["id"] for record in records] if args.queries == "pages" else [None] * len(queries)
+        fetch = args.top_k + (1 if args.queries == "pages" else 0)
+
+        def top_ids(index, query, own_id):
+            return [doc_id for doc_id in index.query([query], fetch)["ids"][0] if doc_id != own_id][:args.top_k]
+
+        baseline = VectorIndex.from_records(exam_name, records, 768, "float32")
+        expected = [set(top_ids(baseline, query, own_id)) for query, own_id in zip(queries, own_ids)]
+        for dimensions, dtype in SETTINGS:
+            index = VectorIndex.from_records(exam_name, records, dimensions, dtype)
+            latencies, recalls = [], []
+            for query, own_id, relevant in zip(queries, own_ids, expected):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    index.query([query], fetch)
+                latencies.append((time.perf_counter() - start) * 1e6 / args.repeat)
+                found = top_ids(index, query, own_id)
+                recalls.append(len(set(found) & relevant) / len(relevant))
+            print(f"{exam_name:<20} {dimensions:>4} {dtype:<7} {len(records):>7} {index.nbytes / 1024:>10.1f} "
+                  f"{percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.95):>8.0f} "
+                  f"{statistics.mean(recalls):>9.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Offline recall, MRR and latency of search_knowledge_base across retrieval settings.
+
+Queries are the sample questions and topic names of data/*_test_questions.json. Their relevant
+pages are listed in benchmarks/fixtures/retrieval_labels.json. `--label` (re)generates that file
+with silver labels: the pages BM25 ranks highest for the question together with its correct
+answer (within 80% of the best score, at most 3), and for a topic the pages of its questions.
+Correct the file by hand where the silver labels are wrong; every run is scored against it.
+
+Each setting builds the exam collections in memory, patches them into search_knowledge_base and
+runs every query through it, so hybrid search, the lexical fast path, MMR and context packing
+behave as in the app. A setting is a comma separated list of key=value pairs:
+    backend=chroma|memory|lexical  dimensions=768  dtype=float32|float16|int8  granularity=chunk|page
+    hybrid=true  fast_path=true  mmr=true
+where lexical uses BM25 only and runs without any embedding. Query and record embeddings come from
+benchmarks/.cache (embedded through the endpoint on first use), so latency excludes the embedding
+round trip; the number of queries that needed one is reported instead.
+
+Results per setting and exam (recall@1/3/5, MRR, p50/p95 latency) are printed and written to a
+JSON report; --baseline prints the change against an earlier report.
+
+Usage:
+    python benchmarks/retrieval_eval.py [--label] [--settings backend=memory,granularity=page ...]
+                                        [--exams investor_awareness] [--output report.json]
+                                        [--baseline benchmarks/reports/retrieval-....json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import custom_tools
+import request_context
+from build_index import build_records, index_exam
+from configs import config
+from corpus import EXAM_DOCUMENTS, load_questions
+from lexical_index import BM25Index
+from vector_index import VectorIndex, truncate_embedding
+from benchmarks.common import EmbeddingCache, percentile
+
+LABELS_PATH = os.path.join("benchmarks", "fixtures", "retrieval_labels.json")
+REPORTS_DIR = os.path.join("benchmarks", "reports")
+RECALL_AT = (1, 3, 5)
+
+DEFAULT_SETTINGS = [
+    "backend=lexical,granularity=chunk",
+    "backend=memory,granularity=page",
+    "backend=memory,granularity=chunk",
+    "backend=memory,granularity=chunk,dimensions=256",
+    "backend=memory,granularity=chunk,dtype=int8",
+    "backend=chroma,granularity=chunk",
+    "backend=memory,granularity=chunk,hybrid=false,fast_path=false,mmr=false",
+]
+
+SETTING_DEFAULTS = {"backend": "memory", "dimensions": "768", "dtype": "float32", "granularity": "chunk",
+                    "hybrid": "true", "fast_path": "true", "mmr": "true"}
+
+
+def parse_setting(text):
+    setting = dict(SETTING_DEFAULTS)
+    for pair in filter(None, text.split(",")):
+        key, _, value = pair.partition("=")
+        if key.strip() not in SETTING_DEFAULTS:
+            raise SystemExit(f"unknown setting {key!r}, expected one of {', '.join(SETTING_DEFAULTS)}")
+        setting[key.strip()] = value.strip()
+    return setting
+
+
+def setting_name(setting):
+    return ",".join(f"{key}={value}" for key, value in setting.items() if SETTING_DEFAULTS[key] != value) or "default"
+
+
+def build_queries(exam_name):
+    """Sample questions (with their correct answer for labelling) and the distinct topics"""
+    queries = []
+    for question in load_questions(exam_name):
+        answer = question["options"].get(question["correct_option"], "")
+        queries.append({"kind": "question", "query": question["question"], "topic": question["topic_name"],
+                        "answer": answer})
+    return queries
+
+
+def label(exams):
+    """Silver relevant pages for every query, see the module docstring"""
+    labels = {}
+    for exam_name in exams:
+        records = build_records(exam_name, "page")
+        index = BM25Index([r["id"] for r in records], [r["document"] for r in records],
+                          [r["metadata"] for r in records])
+        entries, topics = [], {}
+        for query in build_queries(exam_name):
+            hits = index.search(f"{query['query']} {query['answer']}", k=10)
+            best = hits[0][1] if hits else 0.0
+            pages = [[records[i]["metadata"]["file_name"], records[i]["metadata"]["page_number"]]
+                     for i, score, _ in hits if score >= 0.8 * best][:3]
+            entries.append({"kind": "question", "query": query["query"], "relevant": pages})
+            topic_pages = topics.setdefault(query["topic"], [])
+            topic_pages.extend(page for page in pages if page not in topic_pages)
+        entries.extend({"kind": "topic", "query": topic, "relevant": pages} for topic, pages in sorted(topics.items()))
+        labels[exam_name] = entries
+    os.makedirs(os.path.dirname(LABELS_PATH), exist_ok=True)
+    with open(LABELS_PATH, "w", encoding="utf-8") as file:
+        json.dump(labels, file, ensure_ascii=False, indent=1)
+    print(f"wrote {sum(len(entries) for entries in labels.values())} labelled queries to {LABELS_PATH}")
+
+
+class QueryEmbedder:
+    """Replaces get_embeddings in search_knowledge_base with cached vectors, counting the calls"""
+
+    def __init__(self, cache, dimensions):
+        self.cache, self.dimensions, self.calls = cache, dimensions, 0
+
+    def __call__(self, text, dimensions=None):
+        self.calls += 1
+        vector = self.cache.embed([text])[0]
+        return truncate_embedding(vector, self.dimensions).tolist()
+
+
+def build_collection(exam_name, setting, cache, chroma_client):
+    records = build_records(exam_name, setting["granularity"])
+    dimensions = int(setting["dimensions"])
+    if setting["backend"] == "lexical":
+        # vectors are never searched, zero vectors keep the in-memory index layout
+        for record in records:
+            record["embedding"] = [0.0] * 8
+        return VectorIndex.from_records(f"{exam_name}-lexical", records)
+    missing = [record for record in records if not record["embedding"]]
+    for record, vector in zip(missing, cache.embed([record["document"] for record in missing])):
+        record["embedding"] = vector
+    for record in records:
+        record["embedding"] = truncate_embedding(record["embedding"], dimensions).tolist()
+    name = f"{exam_name}-{setting['granularity']}-{dimensions}-{setting['dtype']}"
+    if setting["backend"] == "chroma":
+        return index_exam(chroma_client, name, records, setting["granularity"])
+    return VectorIndex.from_records(name, records, dtype=setting["dtype"])
+
+
+@contextmanager
+def patched_search(collection, embedder, setting):
+    """Point search_knowledge_base at the collection and settings under test"""
+    original = (custom_tools.open_collection, custom_tools.get_embeddings, config.HYBRID_SEARCH,
+                config.LEXICAL_FAST_PATH, config.MMR_RERANK)
+
+    @contextmanager
+    def open_collection(name):
+        yield collection, int(setting["dimensions"])
+
+    custom_tools.open_collection, custom_tools.get_embeddings = open_collection, embedder
+    lexical = setting["backend"] == "lexical"
+    config.HYBRID_SEARCH = lexical or setting["hybrid"] == "true"
+    config.LEXICAL_FAST_PATH = setting["fast_path"] == "true"
+    config.MMR_RERANK = setting["mmr"] == "true" and not lexical
+    try:
+        yield
+    finally:
+        (custom_tools.open_collection, custom_tools.get_embeddings, config.HYBRID_SEARCH,
+         config.LEXICAL_FAST_PATH, config.MMR_RERANK) = original
+
+
+def lexical_search(collection, query):
+    """BM25-only ranking for backend=lexical, returned in the layout search_knowledge_base returns"""
+    index = custom_tools.get_lexical_index(collection)
+    results = index.to_results(index.search(query, k=config.KB_TOP_K))
+    return custom_tools.display_results(results, query)
+
+
+def evaluate(exam_name, entries, collection, embedder, setting):
+    request_context.exam_name.set(exam_name)
+    rows = []
+    with patched_search(collection, embedder, setting):
+        for entry in entries:
+            if not entry["relevant"]:
+                continue
+            calls = embedder.calls
+            start = time.perf_counter()
+            if setting["backend"] == "lexical":
+                output = lexical_search(collection, entry["query"])
+            else:
+                output = custom_tools.search_knowledge_base.invoke({"query": entry["query"]})
+            elapsed = time.perf_counter() - start
+            ranked = []
+            for page in json.loads(output):
+                key = [page["document_name"], page["page_number"]]
+                if key not in ranked:
+                    ranked.append(key)
+            relevant = entry["relevant"]
+            recall = {k: len([page for page in ranked[:k] if page in relevant]) / len(relevant) for k in RECALL_AT}
+            rank = next((position for position, page in enumerate(ranked, 1) if page in relevant), None)
+            rows.append({"kind": entry["kind"], "recall": recall, "reciprocal_rank": 1 / rank if rank else 0.0,
+                         "seconds": elapsed, "embedded": embedder.calls > calls})
+    return rows
+
+
+def summarize(rows):
+    latencies = [row["seconds"] * 1000 for row in rows]
+    return {
+        "queries": len(rows),
+        **{f"recall@{k}": statistics.mean(row["recall"][k] for row in rows) for k in RECALL_AT},
+        "mrr": statistics.mean(row["reciprocal_rank"] for row in rows),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "embedding_calls": sum(row["embedded"] for row in rows),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--label", action="store_true", help="regenerate the silver labels and exit")
+    parser.add_argument("--settings", nargs="+", default=DEFAULT_SETTINGS)
+    parser.add_argument("--exams", nargs="+", choices=list(EXAM_DOCUMENTS), default=list(EXAM_DOCUMENTS))
+    parser.add_argument("--output", help="report path, benchmarks/reports/retrieval-<time>.json by default")
+    parser.add_argument("--baseline", help="earlier report to compare with")
+    args = parser.parse_args()
+
+    if args.label:
+        label(args.exams)
+        return
+    with open(LABELS_PATH, "r", encoding="utf-8") as file:
+        labels = json.load(file)
+
+    cache = EmbeddingCache()
+    chroma_client = None
+    report = {"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": git_commit(),
+              "kb_top_k": config.KB_TOP_K, "results": {}}
+    print(f"{'setting':<62} {'exam':<19} {'R@1':>5} {'R@3':>5} {'R@5':>5} {'MRR':>5} {'p50 ms':>7} "
+          f"{'p95 ms':>7} {'embeds':>6}")
+    for text in args.settings:
+        setting = parse_setting(text)
+        name = setting_name(setting)
+        if setting["backend"] == "chroma" and chroma_client is None:
+            import chromadb
+            chroma_client = chromadb.EphemeralClient()
+        embedder = QueryEmbedder(cache, int(setting["dimensions"]))
+        results, all_rows = {}, []
+        for exam_name in args.exams:
+            collection = build_collection(exam_name, setting, cache, chroma_client)
+            rows = evaluate(exam_name, labels[exam_name], collection, embedder, setting)
+            results[exam_name] = summarize(rows)
+            all_rows.extend(rows)
+        results["all"] = summarize(all_rows)
+        report["results"][name] = {"setting": setting, **results}
+        for exam_name, summary in results.items():
+            print(f"{name[:62]:<62} {exam_name:<19} {summary['recall@1']:>5.2f} {summary['recall@3']:>5.2f} "
+                  f"{summary['recall@5']:>5.2f} {summary['mrr']:>5.2f} {summary['p50_ms']:>7.1f} "
+                  f"{summary['p95_ms']:>7.1f} {summary['embedding_calls']:>6}")
+
+    output = args.output or os.path.join(REPORTS_DIR, f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+    print(f"report written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(f"\nchange against {args.baseline} ({baseline.get('commit')})")
+        for name, results in report["results"].items():
+            before = baseline["results"].get(name, {}).get("all")
+            if before:
+                after = results["all"]
+                print(f"{name[:62]:<62} R@5 {after['recall@5'] - before['recall@5']:+.3f}  "
+                      f"MRR {after['mrr'] - before['mrr']:+.3f}  p50 {after['p50_ms'] - before['p50_ms']:+.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Throughput of serve.py from 1 to N worker processes, against the local service stand-ins.
+
+For every --workers count the script starts `serve.py --workers K` pointed at
+benchmarks/fake_services.py, waits for /readyz, drives each scenario of benchmarks/load_test.py
+with --concurrency clients and reports requests per second, p50/p95 latency, the speedup over
+one worker and the memory of the whole server (PSS, so pages shared copy-on-write with the
+preloading master are counted once). The fakes share the machine with the server, give them a
+core of their own (e.g. `taskset`) when measuring on few cores.
+
+Usage:
+    python benchmarks/scaling_benchmark.py [--workers 1 2 4] [--scenarios send_message mock_exam]
+                                           [--concurrency 32] [--requests 200]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.fake_services import FAKE_CREDENTIALS_PATH, build_parser as fake_parser, write_fake_credentials
+from benchmarks.load_test import SCENARIOS, app_environment, run_scenario, wait_until_up
+
+
+def default_worker_counts():
+    counts, count = [], 1
+    while count < (os.cpu_count() or 1):
+        counts.append(count)
+        count *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def pss_kb(pid):
+    """Proportional set size of a process and its children"""
+    children = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split()
+    total = 0
+    for process in [str(pid), *children]:
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as file:
+                total += next(int(line.split()[1]) for line in file if line.startswith("Pss:"))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+async def measure(args, app_url):
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        return {scenario: await run_scenario(client, scenario, args.concurrency, args.requests)
+                for scenario in args.scenarios}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     parents=[fake_parser()], conflict_handler="resolve")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts())
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=["send_message", "mock_exam"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--app-port", type=int, default=8903)
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{args.port}"
+    write_fake_credentials(FAKE_CREDENTIALS_PATH, f"{fake_url}/token")
+    fake_args = [f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items()
+                 if name in vars(fake_parser().parse_args([]))]
+    fakes = subprocess.Popen([sys.executable, "benchmarks/fake_services.py", *fake_args])
+    baseline = {}
+    try:
+        asyncio.run(wait_until_up(f"{fake_url}/stats", fakes))
+        print(f"{os.cpu_count()} cores")
+        print(f"{'workers':>7} {'scenario':<22} {'req/s':>7} {'speedup':>7} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'errors':>6} {'PSS MB':>7}")
+        for workers in args.workers:
+            server = subprocess.Popen([sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+                                       "--port", str(args.app_port)], env=app_environment(fake_url),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                app_url = f"http://127.0.0.1:{args.app_port}"
+                # every worker answers /readyz on its own, wait until a few in a row say ready
+                asyncio.run(wait_until_up(f"{app_url}/readyz", server))
+                time.sleep(1)
+                asyncio.run(wait_until_up(f"{app_url}/readyz", server))
+                results = asyncio.run(measure(args, app_url))
+                memory_mb = pss_kb(server.pid) / 1024
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            for scenario, row in results.items():
+                baseline.setdefault(scenario, row["throughput"])
+                print(f"{workers:>7} {scenario:<22} {row['throughput']:>7.2f} "
+                      f"{row['throughput'] / baseline[scenario]:>6.2f}x {row['p50'] * 1000:>8.0f} "
+                      f"{row['p95'] * 1000:>8.0f} {row['errors']:>6} {memory_mb:>7.0f}")
+    finally:
+        fakes.terminate()
+        fakes.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Startup cost of the app: an import-time profile and the time to the first `/` response.
+
+The profile runs `python -X importtime -c "import app"` and lists the modules with the largest
+cumulative and self import time, and whether each of the heavy libraries (crewai, langchain_openai,
+chromadb, pandas, scipy, numexpr, bs4, google.cloud.speech) is imported at startup or deferred to
+first use / the background warm-up. The time to first response starts `uvicorn app:app` --runs
+times and measures from process start until `GET /` answers 200, and until `/readyz` does (the
+background warm-up finished). The script exits with status 1 when the median time to the first
+response is above --target-seconds, so it can gate a CI job. Without credentials the warm-up steps
+that call Azure OpenAI or Vertex AI fail fast, run benchmarks/load_test.py's fakes for realistic
+readiness times.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--target-seconds 2.0] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+REPORTS_DIR = os.path.join("benchmarks", "reports")
+HEAVY_MODULES = ["crewai", "langchain_openai", "chromadb", "pandas", "scipy", "numexpr", "bs4", "google.cloud.speech"]
+
+
+def import_profile(module="app"):
+    """Entries (name, depth, self_us, cumulative_us) of -X importtime, in import order"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def time_to_first_response(port, timeout=120):
+    """Seconds from starting uvicorn to the first 200 from / and from /readyz"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+                                "--log-level", "warning"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client() as client:
+            return [wait_for_ok(client, process, f"http://127.0.0.1:{port}{path}", start, timeout)
+                    for path in ("/", "/readyz")]
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def wait_for_ok(client, process, url, start, timeout):
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{url} did not answer 200 within {timeout}s")
+
+
+def git_commit():
+    completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return completed.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-seconds", type=float, default=2.0,
+                        help="median time to the first / response that fails the run")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--output", help="report path, benchmarks/reports/startup-<time>.json by default")
+    args = parser.parse_args()
+
+    entries = import_profile()
+    total_us = sum(cumulative for _, depth, _, cumulative in entries if depth == 0)
+    imported = {name for name, _, _, _ in entries}
+    print(f"import app: {total_us / 1e6:.2f} s for {len(entries)} modules\n")
+    print(f"{'module':<50} {'cumulative ms':>13} {'self ms':>8}")
+    by_cumulative = sorted(entries, key=lambda entry: entry[3], reverse=True)
+    for name, _, self_us, cumulative_us in by_cumulative[:args.top]:
+        print(f"{name[:50]:<50} {cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}")
+    print(f"\n{'module':<50} {'self ms':>8}")
+    for name, _, self_us, _ in sorted(entries, key=lambda entry: entry[2], reverse=True)[:args.top]:
+        print(f"{name[:50]:<50} {self_us / 1000:>8.1f}")
+    heavy = {module: module in imported for module in HEAVY_MODULES}
+    print("\nheavy libraries:", ", ".join(f"{module} {'AT STARTUP' if at_startup else 'deferred'}"
+                                       for module, at_startup in heavy.items()))
+
+    runs = [time_to_first_response(args.port) for _ in range(args.runs)]
+    samples, ready_samples = [run[0] for run in runs], [run[1] for run in runs]
+    median = statistics.median(samples)
+    print(f"\ntime to first / response over {args.runs} runs: median {median:.2f} s, "
+          f"min {min(samples):.2f} s, max {max(samples):.2f} s (target {args.target_seconds:.2f} s)")
+    print(f"time to /readyz: median {statistics.median(ready_samples):.2f} s, max {max(ready_samples):.2f} s")
+
+    report = {"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": git_commit(),
+              "import_seconds": total_us / 1e6, "modules": len(entries),
+              "top_cumulative_ms": {name: cumulative_us / 1000 for name, _, _, cumulative_us in
+                                    by_cumulative[:args.top]},
+              "heavy_at_startup": heavy, "first_response_seconds": samples, "ready_seconds": ready_samples,
+              "target_seconds": args.target_seconds}
+    output = args.output or os.path.join(REPORTS_DIR, f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=1)
+    print(f"report written to {output}")
+    if median > args.target_seconds:
+        print("FAILED: time to first response is above the target")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
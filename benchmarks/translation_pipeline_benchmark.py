@@ -0,0 +1,78 @@
+"""
+Compare answering directly in the user's language with generating in English and translating.
+
+For every UI language, the first --questions sample questions are asked twice:
+  - direct: the LLM is told to answer in the user's language (the default mode)
+  - translated: the LLM answers in English and the stream goes through StreamingTranslator
+    (GENERATE_IN_ENGLISH=true)
+and we report time to first token shown to the user, total time, generated output tokens and the
+characters sent to the Translation API. The translation cache hits (sentences repeated across
+answers are translated once per language) are printed at the end.
+
+Needs the Azure OpenAI and Google Translation credentials of the app.
+
+Usage:
+    python benchmarks/translation_pipeline_benchmark.py [--questions 5] [--languages Hindi Bengali]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from corpus import load_questions
+from llm_models import get_azure_llm
+from translator import StreamingTranslator, get_translation_client
+
+LANGUAGES = ["Hindi", "Bengali", "Marathi", "Kannada", "Gujarati"]
+SYSTEM_PROMPT = ("You are an experienced AI Tutor helping Users prepare for their SEBI Certification Exams. "
+                 "Always respond in {language} Language irrespective of the language of the user query.")
+
+
+def run(question, language, translate):
+    """Stream one answer and return (ttft seconds, total seconds, output tokens, characters translated)"""
+    messages = [SystemMessage(content=SYSTEM_PROMPT.format(language="English" if translate else language)),
+                HumanMessage(content=question)]
+    translator = StreamingTranslator(language) if translate else None
+    start = time.perf_counter()
+    ttft, output_tokens, english = None, 0, []
+    for chunk in get_azure_llm().stream(messages, stream_usage=True):
+        if chunk.usage_metadata:
+            output_tokens += chunk.usage_metadata.get("output_tokens", 0)
+        content = chunk.content
+        if content and translator:
+            english.append(content)
+            content = translator.feed(content)
+        if content and ttft is None:
+            ttft = time.perf_counter() - start
+    if translator and translator.flush() and ttft is None:
+        ttft = time.perf_counter() - start
+    return ttft or 0.0, time.perf_counter() - start, output_tokens, sum(len(text) for text in english)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES)
+    args = parser.parse_args()
+    questions = [f"Explain the answer to this exam question: {question['question']}"
+                 for question in load_questions("investor_awareness")[:args.questions]]
+
+    print(f"{'language':<10} {'mode':<10} {'ttft ms':>8} {'total ms':>9} {'output tokens':>13} "
+          f"{'translated chars':>16}")
+    for language in args.languages:
+        for mode in ("direct", "translated"):
+            rows = [run(question, language, mode == "translated") for question in questions]
+            ttft, total, tokens, chars = (statistics.mean(column) for column in zip(*rows))
+            print(f"{language:<10} {mode:<10} {ttft * 1000:>8.0f} {total * 1000:>9.0f} {tokens:>13.0f} {chars:>16.0f}")
+    cache = get_translation_client().cache
+    print(f"translation cache: {cache.hits} hits, {cache.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
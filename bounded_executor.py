@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    """Raised when a BoundedExecutor already holds as many jobs as it may run and queue"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking calls made from async routes, with a hard cap on waiting work.
+
+    At most `max_workers` jobs run at once and `max_queue` more may wait; further submissions
+    fail immediately with ExecutorBusy so callers can shed load (HTTP 429) instead of piling
+    up requests behind a slow backend and starving the event loop.
+    """
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool without blocking the event loop.
+
+        Returns:
+            tuple: (result, seconds waited in the queue, seconds spent running)
+
+        Raises:
+            ExecutorBusy: When every worker and queue slot is taken
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorBusy(f"{self.name} is at capacity")
+        with self._lock:
+            self.in_flight += 1
+        queued_at = time.perf_counter()
+
+        def call():
+            started_at = time.perf_counter()
+            return fn(*args, **kwargs), started_at - queued_at, time.perf_counter() - started_at
+
+        def done(future):
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+        # the slot is freed when the job finishes (or is cancelled before it started), not when the
+        # awaiting request goes away, so disconnecting clients cannot pile up work past the bound
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            done(None)
+            raise
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def snapshot(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "max_workers": self.max_workers, "max_queue": self.max_queue,
+                    "completed": self.completed, "rejected": self.rejected}
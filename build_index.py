@@ -0,0 +1,132 @@
+"""
+Build the study material collections of the knowledge base.
+
+Every exam collection is rebuilt from the page files in ./data. With chunk granularity
+each page is split on its heading structure into bounded, overlapping chunks that keep
+the file name and page number; with page granularity one vector is stored per page.
+
+Vectors can be reduced to fewer Matryoshka dimensions (--dimensions) and written either to
+Chroma or to the in-memory NumPy index (--backend memory) stored as float32, float16 or int8.
+
+Usage:
+    python build_index.py [--exam mf_foundation ...] [--granularity chunk|page] [--db-path PATH]
+                          [--dimensions 256] [--backend chroma|memory] [--dtype float32|float16|int8]
+"""
+import argparse
+import time
+
+from chunking import chunk_page
+from configs import config
+from corpus import EXAM_DOCUMENTS, load_exam_pages
+from embeddings import get_embeddings_batch
+from vector_index import SUPPORTED_DTYPES, VectorIndex, index_path, truncate_embedding
+
+
+def build_records(exam_name, granularity=config.INDEX_GRANULARITY, max_chars=config.CHUNK_MAX_CHARS,
+                  overlap=config.CHUNK_OVERLAP):
+    """
+    Turn the pages of an exam's study materials into index records.
+
+    Args:
+        exam_name (str): Exam / collection name
+        granularity (str): "chunk" for sub-page chunks, "page" for one record per page
+        max_chars (int): Maximum chunk length
+        overlap (int): Characters shared by consecutive chunks
+
+    Returns:
+        list[dict]: Records with id, document, metadata and an optional precomputed embedding
+    """
+    records = []
+    for page in load_exam_pages(exam_name):
+        if granularity == "page":
+            if not page["page_content"].strip():
+                continue
+            chunks = [{"chunk_index": 0, "chunk_count": 1, "start": 0, "end": len(page["page_content"]),
+                       "page_content": page["page_content"]}]
+        else:
+            chunks = chunk_page(page, max_chars, overlap)
+        for chunk in chunks:
+            records.append({
+                "id": f"{page['document_name']}:{page['page_number']}:{chunk['chunk_index']}",
+                "document": chunk["page_content"],
+                "metadata": {
+                    "file_name": page["document_name"],
+                    "page_number": page["page_number"],
+                    "chunk_index": chunk["chunk_index"],
+                    "chunk_count": chunk["chunk_count"],
+                    "start": chunk["start"],
+                    "end": chunk["end"],
+                },
+                # whole pages can reuse the vectors already stored in the *_pages_embed.json files
+                "embedding": page["content_vector"] if granularity == "page" else None,
+            })
+    return records
+
+
+def embed_records(records, dimensions=None):
+    """Fill in the embedding of every record that does not have one yet, reduced to `dimensions`"""
+    dimensions = dimensions or config.EMBEDDING_DIM
+    missing = [record for record in records if not record["embedding"]]
+    if missing:
+        vectors = get_embeddings_batch([record["document"] for record in missing], dimensions=dimensions)
+        for record, vector in zip(missing, vectors):
+            record["embedding"] = vector
+    for record in records:
+        # precomputed page vectors are full size
+        if len(record["embedding"]) > dimensions:
+            record["embedding"] = truncate_embedding(record["embedding"], dimensions).tolist()
+    return records
+
+
+def index_exam(client, exam_name, records, granularity=config.INDEX_GRANULARITY, batch_size=256):
+    """Replace the exam's collection with the given records, built with `granularity`"""
+    try:
+        client.delete_collection(exam_name)
+    except Exception:
+        pass
+    dimensions = len(records[0]["embedding"]) if records else config.EMBEDDING_DIM
+    collection = client.create_collection(name=exam_name, metadata={"granularity": granularity,
+                                                                    "dimensions": dimensions})
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        collection.add(
+            ids=[record["id"] for record in batch],
+            documents=[record["document"] for record in batch],
+            metadatas=[record["metadata"] for record in batch],
+            embeddings=[record["embedding"] for record in batch],
+        )
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exam", nargs="+", choices=list(EXAM_DOCUMENTS), default=list(EXAM_DOCUMENTS))
+    parser.add_argument("--granularity", choices=["chunk", "page"], default=config.INDEX_GRANULARITY)
+    parser.add_argument("--max-chars", type=int, default=config.CHUNK_MAX_CHARS)
+    parser.add_argument("--overlap", type=int, default=config.CHUNK_OVERLAP)
+    parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    parser.add_argument("--dimensions", type=int, default=config.EMBEDDING_DIM)
+    parser.add_argument("--backend", choices=["chroma", "memory"], default=config.VECTOR_BACKEND)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=config.VECTOR_DTYPE)
+    parser.add_argument("--index-dir", default=config.VECTOR_INDEX_PATH)
+    args = parser.parse_args()
+
+    client = None
+    if args.backend == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=args.db_path)
+    for exam_name in args.exam:
+        start = time.perf_counter()
+        records = embed_records(build_records(exam_name, args.granularity, args.max_chars, args.overlap),
+                                args.dimensions)
+        if client is not None:
+            index_exam(client, exam_name, records, args.granularity)
+        else:
+            VectorIndex.from_records(exam_name, records, args.dimensions, args.dtype).save(
+                index_path(exam_name, args.index_dir))
+        print(f"{exam_name}: indexed {len(records)} {args.granularity} records "
+              f"({args.dimensions} dims, {args.backend}) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
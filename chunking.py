@@ -0,0 +1,142 @@
+import re
+
+DEFAULT_MAX_CHARS = 1200
+DEFAULT_OVERLAP = 200
+
+_PAGE_MARKER = re.compile(r'^\s*<!--\s*Page\s+\d+\s*-->\s*')
+_HEADING = re.compile(r'\n+(?=#{1,6} )')
+_PARAGRAPH = re.compile(r'\n\s*\n')
+_LINE = re.compile(r'\n')
+_SENTENCE = re.compile(r'(?<=[.!?।:;])\s')
+_SPACE = re.compile(r'\s')
+
+# Boundaries in order of preference: a chunk ends before a heading if possible,
+# otherwise at a paragraph, line, sentence or word break
+_BOUNDARY_PATTERNS = (_HEADING, _PARAGRAPH, _LINE, _SENTENCE, _SPACE)
+
+
+def _boundaries(text):
+    return [sorted({match.start() for match in pattern.finditer(text)}) for pattern in _BOUNDARY_PATTERNS]
+
+
+def _last_between(positions, low, high):
+    best = None
+    for position in positions:
+        if position > high:
+            break
+        if position > low:
+            best = position
+    return best
+
+
+def _first_after(positions, low, high):
+    for position in positions:
+        if position >= high:
+            return None
+        if position > low:
+            return position
+    return None
+
+
+def chunk_text(text, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP):
+    """
+    Split markdown-like page text into bounded, overlapping chunks.
+
+    Chunk ends are placed at the last heading that fits within `max_chars`, falling back to
+    paragraph, line, sentence and word breaks. Consecutive chunks share about `overlap`
+    characters so that a sentence cut at a boundary is still seen whole by one chunk.
+
+    Args:
+        text (str): Page content
+        max_chars (int): Maximum chunk length
+        overlap (int): Characters repeated from the end of the previous chunk
+
+    Returns:
+        list[tuple[int, int]]: (start, end) character offsets of each chunk in `text`
+    """
+    marker = _PAGE_MARKER.match(text)
+    start = marker.end() if marker else 0
+    length = len(text.rstrip())
+    if start >= length:
+        return []
+
+    overlap = min(overlap, max_chars // 2)
+    min_chars = max_chars // 3
+    boundaries = _boundaries(text)
+    spans = []
+    while start < length:
+        if length - start <= max_chars:
+            spans.append((start, length))
+            break
+        end = None
+        for positions in boundaries:
+            end = _last_between(positions, start + min_chars, start + max_chars)
+            if end is not None:
+                break
+        if end is None:
+            end = start + max_chars
+        spans.append((start, end))
+
+        # step back by the overlap, snapped forward to a word boundary
+        next_start = end
+        if overlap:
+            snapped = _first_after(boundaries[-1], end - overlap, end)
+            next_start = snapped + 1 if snapped is not None else end
+        while next_start < length and text[next_start].isspace():
+            next_start += 1
+        start = max(next_start, start + 1)
+    return spans
+
+
+def chunk_page(page, max_chars=DEFAULT_MAX_CHARS, overlap=DEFAULT_OVERLAP):
+    """
+    Split one study material page into chunks that keep the page's file and page metadata.
+
+    Args:
+        page (dict): Page with document_name, page_number and page_content (see corpus.load_pages)
+        max_chars (int): Maximum chunk length
+        overlap (int): Characters shared by consecutive chunks
+
+    Returns:
+        list[dict]: Chunks with document_name, page_number, chunk_index, chunk_count,
+            start, end and page_content
+    """
+    text = page["page_content"]
+    spans = chunk_text(text, max_chars, overlap)
+    return [{
+        "document_name": page["document_name"],
+        "page_number": page["page_number"],
+        "chunk_index": index,
+        "chunk_count": len(spans),
+        "start": start,
+        "end": end,
+        "page_content": text[start:end],
+    } for index, (start, end) in enumerate(spans)]
+
+
+def merge_chunks(chunks):
+    """
+    Merge chunks of the same page back into one passage.
+
+    Overlapping or touching chunks are stitched using their character offsets, so shared
+    text appears once; gaps between non adjacent chunks are marked with "...".
+
+    Args:
+        chunks (list[dict]): Chunks of one page with start, end and page_content
+
+    Returns:
+        str: Merged text in page order
+    """
+    parts = []
+    current_end = None
+    for chunk in sorted(chunks, key=lambda item: item["start"]):
+        text, start, end = chunk["page_content"], chunk["start"], chunk["end"]
+        if current_end is None:
+            parts.append(text)
+        elif start <= current_end:
+            if end > current_end:
+                parts.append(text[current_end - start:])
+        else:
+            parts.append("\n...\n" + text)
+        current_end = end if current_end is None else max(current_end, end)
+    return "".join(parts)
@@ -9,13 +9,120 @@ class Config:
     AZURE_API_KEY = os.getenv("AZURE_API_KEY")
     AZURE_ENDPOINT = os.getenv("AZURE_API_BASE")
     SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+    SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
     GOOGLE_CREDS_JSON = os.getenv("GOOGLE_CREDS_JSON")
     GOOGLE_PROJECT_ID = os.getenv("GOOGLE_PROJECT_ID")
     EMBEDDINGS_URL = os.getenv("EMBEDDINGS_URL")
     CHROMA_DB_PATH = r"./data/sebi_study_materials_db"
-    chroma_collection_name = ""
-    exam_name = ""
-    user_language = ""
-    kb_results = []
+    KB_TOP_K = int(os.getenv("KB_TOP_K", "5"))
+    # Embedding size (768 is full size, smaller values use Matryoshka truncation) and the vector store:
+    # "chroma", or "memory" for the NumPy index in VECTOR_INDEX_PATH stored as float32, float16 or int8
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+    VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+    VECTOR_INDEX_PATH = r"./data/vector_index"
+    # Blue/green index versions built by index_versions.py; workers poll the active version and
+    # old versions are deleted after the grace period, keeping the most recent ones for rollback
+    INDEX_VERSIONS_PATH = r"./data/index_versions"
+    INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "5"))
+    INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+    INDEX_GC_GRACE_SECONDS = int(os.getenv("INDEX_GC_GRACE_SECONDS", "600"))
+    # Token expected in the X-Admin-Token header of the /admin endpoints, which are disabled without it
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+    # Memory-mapped per-document artifacts built by corpus_store.py
+    ARTIFACT_PATH = r"./data/artifacts"
+    # Knowledge base indexing: "chunk" splits pages into overlapping sub-page chunks, "page" keeps one vector per page
+    INDEX_GRANULARITY = os.getenv("INDEX_GRANULARITY", "chunk")
+    CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    # Hybrid BM25 + vector retrieval, and the lexical-only fast path that skips the embedding call
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+    LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+    LEXICAL_FAST_PATH_MIN_SCORE = float(os.getenv("LEXICAL_FAST_PATH_MIN_SCORE", "3.0"))
+    LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))
+    # MMR re-ranking: over-fetch MMR_FETCH_K candidates and keep KB_TOP_K diverse ones
+    # (MMR_LAMBDA 1.0 ranks by relevance only, lower values penalize near-duplicate passages more)
+    MMR_RERANK = os.getenv("MMR_RERANK", "true").lower() == "true"
+    MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+    # Compiled calculator expressions kept in memory
+    CALCULATOR_CACHE_SIZE = int(os.getenv("CALCULATOR_CACHE_SIZE", "1024"))
+    # Query-aware packing of tool outputs before they are sent back to the LLM
+    CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() == "true"
+    KB_CONTEXT_TOKEN_BUDGET = int(os.getenv("KB_CONTEXT_TOKEN_BUDGET", "1500"))
+    WEB_CONTEXT_TOKEN_BUDGET = int(os.getenv("WEB_CONTEXT_TOKEN_BUDGET", "1500"))
+    # Generate answers in English and stream them translated into the user's language sentence by
+    # sentence (Indic scripts cost several times more tokens to generate than English)
+    GENERATE_IN_ENGLISH = os.getenv("GENERATE_IN_ENGLISH", "false").lower() == "true"
+    TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+    # Translation client: requests arriving within the batch window are sent as one request over a
+    # keep-alive pool, and translations are also cached on disk for every worker
+    TRANSLATION_API_BASE = os.getenv("TRANSLATION_API_BASE", "https://translation.googleapis.com")
+    TRANSLATION_BATCH_WINDOW_MS = float(os.getenv("TRANSLATION_BATCH_WINDOW_MS", "10"))
+    TRANSLATION_POOL_SIZE = int(os.getenv("TRANSLATION_POOL_SIZE", "8"))
+    TRANSLATION_DISK_CACHE = r"./data/translation_cache.sqlite3"
+    # /transcribe: upload cap, and recognitions run on a bounded pool; requests beyond
+    # TRANSCRIBE_WORKERS running + TRANSCRIBE_MAX_QUEUE waiting are shed with 429
+    TRANSCRIBE_MAX_UPLOAD_BYTES = int(os.getenv("TRANSCRIBE_MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+    TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+    TRANSCRIBE_MAX_QUEUE = int(os.getenv("TRANSCRIBE_MAX_QUEUE", "8"))
+    TRANSCRIBE_RETRY_AFTER_SECONDS = int(os.getenv("TRANSCRIBE_RETRY_AFTER_SECONDS", "2"))
+    # Interim /transcribe uploads: a client's recording is re-recognized only after it grew by
+    # INTERIM_MIN_GROWTH_BYTES (~2s of opus), clients are forgotten after INTERIM_IDLE_SECONDS
+    INTERIM_MIN_GROWTH_BYTES = int(os.getenv("INTERIM_MIN_GROWTH_BYTES", "8192"))
+    INTERIM_MAX_CLIENTS = int(os.getenv("INTERIM_MAX_CLIENTS", "1000"))
+    INTERIM_IDLE_SECONDS = float(os.getenv("INTERIM_IDLE_SECONDS", "60"))
+    # Load and prime the orchestrator, LLM clients, crews, speech client, OAuth tokens and indexes in a
+    # background thread at startup, otherwise each is loaded by the first request that needs it
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+    # /readyz reports ready after this long even if a warm-up step is still running
+    WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "60"))
+    # Pause between retries of a failed warm-up step the instance cannot serve without
+    WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "15"))
+    # serve.py: worker processes (0 = one per CPU core) forked after loading the app, question banks
+    # and in-memory indexes once
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))
+    SERVE_PORT = int(os.getenv("SERVE_PORT", "8080"))
+    # Cache shared by the workers of a host (query embeddings, web search results, explanations),
+    # an in-process LRU in front of a sqlite file
+    SHARED_CACHE_PATH = r"./data/shared_cache.sqlite3"
+    SHARED_CACHE_MEMORY_ITEMS = int(os.getenv("SHARED_CACHE_MEMORY_ITEMS", "2048"))
+    WEB_CACHE_TTL_SECONDS = int(os.getenv("WEB_CACHE_TTL_SECONDS", str(6 * 3600)))
+    EXPLANATION_CACHE_TTL_SECONDS = int(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    # Rows kept per namespace in the sqlite file; expired and surplus (oldest) rows are deleted
+    # every SHARED_CACHE_PRUNE_EVERY writes of a worker
+    SHARED_CACHE_MAX_ROWS = int(os.getenv("SHARED_CACHE_MAX_ROWS", "100000"))
+    SHARED_CACHE_PRUNE_EVERY = int(os.getenv("SHARED_CACHE_PRUNE_EVERY", "500"))
+    # CrewAI crews per kind (tutor, exam guide) that may run kickoffs at the same time; further
+    # kickoffs wait up to CREW_POOL_TIMEOUT_SECONDS for a free crew
+    CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "4"))
+    CREW_POOL_TIMEOUT_SECONDS = float(os.getenv("CREW_POOL_TIMEOUT_SECONDS", "120"))
+    # Admission control of upstream calls, per worker process: requests and tokens per minute
+    # (0 = unlimited, set them to the quota divided by SERVE_WORKERS) and calls in flight. A chat call
+    # that would wait longer than RATE_LIMIT_MAX_WAIT_SECONDS fails at once with a retry hint,
+    # background work (warm-up, index builds) queues behind it for up to the background wait
+    AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+    AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+    AZURE_OPENAI_CONCURRENCY = int(os.getenv("AZURE_OPENAI_CONCURRENCY", "16"))
+    EMBEDDINGS_RPM = int(os.getenv("EMBEDDINGS_RPM", "0"))
+    EMBEDDINGS_CONCURRENCY = int(os.getenv("EMBEDDINGS_CONCURRENCY", "16"))
+    SERPER_RPM = int(os.getenv("SERPER_RPM", "0"))
+    SERPER_CONCURRENCY = int(os.getenv("SERPER_CONCURRENCY", "8"))
+    SPEECH_RPM = int(os.getenv("SPEECH_RPM", "0"))
+    SPEECH_CONCURRENCY = int(os.getenv("SPEECH_CONCURRENCY", "8"))
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "10"))
+    RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS", "300"))
+    # Pause after a 429 without a Retry-After header
+    RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "10"))
+    # Tokens charged for an LLM call before its usage is known: the completion of a chat call, and
+    # a whole crew kickoff (its agent makes a few LLM calls)
+    LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "800"))
+    CREW_LLM_CALLS_ESTIMATE = int(os.getenv("CREW_LLM_CALLS_ESTIMATE", "3"))
+    CREW_TOKENS_ESTIMATE = int(os.getenv("CREW_TOKENS_ESTIMATE", "6000"))
+    # Speech-to-Text endpoint override (e.g. the load test stand-in), the client then talks REST to it
+    SPEECH_API_ENDPOINT = os.getenv("SPEECH_API_ENDPOINT")
+    # WebSocket speech streaming: audio cap per session and how long to wait for the last final result
+    SPEECH_STREAM_MAX_BYTES = int(os.getenv("SPEECH_STREAM_MAX_BYTES", str(5 * 1024 * 1024)))
+    SPEECH_STREAM_FINAL_TIMEOUT = float(os.getenv("SPEECH_STREAM_FINAL_TIMEOUT", "10"))
 
 config = Config()
\ No newline at end of file
@@ -0,0 +1,182 @@
+import math
+import re
+from collections import Counter
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how', 'in',
+    'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was', 'what', 'when',
+    'which', 'who', 'why', 'will', 'with', 'you', 'your', 'about', 'into', 'under', 'between',
+}
+
+_TOKEN = re.compile(r'\w+')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n+|\n(?=#)')
+_SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+
+def estimate_tokens(text):
+    """Rough token count for budget decisions (about 4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+def tokenize(text):
+    """Lowercase word tokens without stop words"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def split_passages(text, max_chars=700):
+    """
+    Split text into passages on paragraph and heading boundaries.
+
+    Short paragraphs are merged up to `max_chars`, long ones are split on sentence boundaries.
+
+    Args:
+        text (str): Page or web content
+        max_chars (int): Upper bound on passage length
+
+    Returns:
+        list[str]: Passages in document order
+    """
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph or paragraph.startswith('<!--'):
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        current = ''
+        for sentence in _SENTENCE_END.split(paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = ''
+            current = f"{current} {sentence}".strip()
+            while len(current) > max_chars:
+                pieces.append(current[:max_chars])
+                current = current[max_chars:]
+        if current:
+            pieces.append(current)
+
+    passages = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > max_chars:
+            passages.append(current)
+            current = ''
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _lexical_scores(query_tokens, passages_tokens, k1=1.2, b=0.75):
+    """BM25 scores of each passage for the query, computed over the candidate passages only"""
+    if not query_tokens or not passages_tokens:
+        return [0.0] * len(passages_tokens)
+    n = len(passages_tokens)
+    avg_len = sum(len(tokens) for tokens in passages_tokens) / n or 1.0
+    document_frequency = Counter()
+    for tokens in passages_tokens:
+        document_frequency.update(set(tokens))
+    scores = []
+    for tokens in passages_tokens:
+        counts = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        score = 0.0
+        for term in set(query_tokens):
+            tf = counts.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def _shingles(tokens, size=3):
+    if len(tokens) < size:
+        return {tuple(tokens)}
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _normalize(scores):
+    top = max(scores, default=0.0)
+    low = min(scores, default=0.0)
+    if top - low <= 1e-12:
+        return [1.0 if top > 0 else 0.0 for _ in scores]
+    return [(score - low) / (top - low) for score in scores]
+
+
+def pack_documents(query, documents, token_budget, text_key='page_content', document_scores=None,
+                   lexical_weight=0.5, max_passage_chars=700, duplicate_threshold=0.8):
+    """
+    Keep only the passages of tool results that are relevant to the query, within a token budget.
+
+    Every document is split into passages which are scored by BM25 against the query blended with
+    the document level semantic score (e.g. 1 - vector distance of the page for the query embedding).
+    Exact and near duplicate passages are dropped, and the best passages are added until the budget
+    is used. Selected passages are regrouped per document in their original order, so every returned
+    document keeps its citation fields (document name, page number, url...).
+
+    Args:
+        query (str): The query the tool was called with
+        documents (list[dict]): Tool results, each with the text under `text_key` plus citation fields
+        token_budget (int): Maximum estimated tokens of packed text
+        text_key (str): Key holding the document text
+        document_scores (list[float] | None): Semantic relevance of each document, higher is better
+        lexical_weight (float): Weight of the lexical score, the semantic score gets the remainder
+        max_passage_chars (int): Upper bound on passage length
+        duplicate_threshold (float): Shingle Jaccard similarity above which a passage is a duplicate
+
+    Returns:
+        list[dict]: Documents ordered by relevance, text replaced by the selected passages
+    """
+    passages = []
+    for doc_index, document in enumerate(documents):
+        for position, text in enumerate(split_passages(document.get(text_key) or '', max_passage_chars)):
+            passages.append({'doc_index': doc_index, 'position': position, 'text': text,
+                             'tokens': tokenize(text)})
+    if not passages:
+        return []
+
+    lexical = _normalize(_lexical_scores(tokenize(query), [passage['tokens'] for passage in passages]))
+    if document_scores is not None and len(document_scores) == len(documents):
+        semantic = _normalize(list(document_scores))
+        weight = lexical_weight
+    else:
+        semantic = [0.0] * len(documents)
+        weight = 1.0
+    for passage, lexical_score in zip(passages, lexical):
+        passage['score'] = weight * lexical_score + (1 - weight) * semantic[passage['doc_index']]
+
+    selected = []
+    seen_texts = set()
+    selected_shingles = []
+    used_tokens = 0
+    for passage in sorted(passages, key=lambda item: item['score'], reverse=True):
+        cost = estimate_tokens(passage['text'])
+        if used_tokens + cost > token_budget:
+            continue
+        key = ' '.join(passage['tokens'])
+        if key in seen_texts:
+            continue
+        shingles = _shingles(passage['tokens'])
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= duplicate_threshold
+               for other in selected_shingles):
+            continue
+        seen_texts.add(key)
+        selected_shingles.append(shingles)
+        selected.append(passage)
+        used_tokens += cost
+
+    by_document = {}
+    for passage in selected:
+        by_document.setdefault(passage['doc_index'], []).append(passage)
+
+    packed = []
+    for doc_index, doc_passages in sorted(by_document.items(),
+                                          key=lambda item: max(p['score'] for p in item[1]), reverse=True):
+        doc_passages.sort(key=lambda item: item['position'])
+        document = dict(documents[doc_index])
+        document[text_key] = '\n...\n'.join(passage['text'] for passage in doc_passages)
+        packed.append(document)
+    return packed
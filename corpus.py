@@ -0,0 +1,127 @@
+import ast
+import glob
+import json
+import os
+import re
+
+DATA_DIR = r"./data"
+
+# Study material page files that make up each exam's knowledge base collection
+EXAM_DOCUMENTS = {
+    "investor_awareness": [
+        "SEBI-Investor-Awareness-Test-FAQ.pdf",
+        "SEBI_-_Investor_Certification_Examination_-_Financial_Education_Booklet_30092024170623.pdf",
+        "SEBI_-_Investor_Certification_Examination_-_Securities_Market_Booklet_30092024170647.pdf",
+        "reading-mat-eng.pdf",
+        "Workshop.pdf",
+    ],
+    "mf_foundation": [
+        "NISM SERIES V-B MFF Workbook 2025 May 2025.pdf",
+    ],
+    "invest_advisor": [
+        "NISM Series X-A-Investment Adviser Level 1 - June 2025 version.pdf",
+    ],
+}
+
+QUESTION_FILES = {
+    "mf_foundation": r"./data/mf_foundation_test_questions.json",
+    "investor_awareness": r"./data/investor_awareness_test_questions.json",
+    "invest_advisor": r"./data/invest_advisor_test_questions.json",
+}
+
+_PAGE_FILE_NAME = re.compile(r"\('(?P<stem>.+)', '(?P<ext>\.\w+)'\)_pages(?:_embed)?\.json$")
+
+
+def document_name_from_path(path):
+    """Map a page file such as "('Workshop', '.pdf')_pages_embed.json" to its PDF name "Workshop.pdf" """
+    match = _PAGE_FILE_NAME.search(os.path.basename(path))
+    if not match:
+        return os.path.basename(path)
+    return f"{match.group('stem')}{match.group('ext')}"
+
+
+def page_files(data_dir=DATA_DIR):
+    """Return {document_name: page file path}, preferring files that already carry embeddings"""
+    files = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "*_pages.json"))) + \
+            sorted(glob.glob(os.path.join(data_dir, "*_pages_embed.json"))):
+        files[document_name_from_path(path)] = path
+    return files
+
+
+def load_pages(path):
+    """
+    Load the pages of one study material file.
+
+    Both page file layouts are supported: plain pages ({page_content, page_number}) and
+    embedded pages ({page_content, metadata, content_vector}) where metadata and vector are
+    stored as text.
+
+    Args:
+        path (str): Path of the page file
+
+    Returns:
+        list[dict]: Pages with document_name, page_number (int), page_content and
+            content_vector (list[float] or None)
+    """
+    document_name = document_name_from_path(path)
+    with open(path, "r", encoding="utf-8") as file:
+        raw_pages = json.load(file)
+
+    pages = []
+    for index, raw in enumerate(raw_pages, 1):
+        page_number = raw.get("page_number")
+        if page_number is None and raw.get("metadata"):
+            metadata = raw["metadata"]
+            if isinstance(metadata, str):
+                metadata = ast.literal_eval(metadata)
+            page_number = metadata.get("page_number")
+        vector = raw.get("content_vector")
+        if isinstance(vector, str):
+            vector = json.loads(vector)
+        pages.append({
+            "document_name": document_name,
+            "page_number": int(page_number) if page_number is not None else index,
+            "page_content": raw.get("page_content") or "",
+            "content_vector": vector,
+        })
+    return pages
+
+
+def load_exam_pages(exam_name, data_dir=DATA_DIR):
+    """Load all pages of the study materials of an exam, from the compact artifacts when they were built"""
+    from corpus_store import open_document
+    files = page_files(data_dir)
+    pages = []
+    for document_name in EXAM_DOCUMENTS[exam_name]:
+        artifact = open_document(document_name)
+        if artifact is not None:
+            pages.extend(artifact.pages())
+        elif document_name in files:
+            pages.extend(load_pages(files[document_name]))
+    return pages
+
+
+def load_questions(exam_name):
+    """
+    Load the sample question bank of an exam.
+
+    Options are normalized to a {letter: text} dict, whether the file stores them as a list
+    of "a: text" strings, a list of single entry dicts or a dict.
+    """
+    with open(QUESTION_FILES[exam_name], "r", encoding="utf-8") as file:
+        # some banks carry trailing characters after the JSON array
+        questions, _ = json.JSONDecoder().raw_decode(file.read().strip())
+
+    for question in questions:
+        options = question.get("options", {})
+        if isinstance(options, list):
+            normalized = {}
+            for option in options:
+                if isinstance(option, dict):
+                    normalized.update(option)
+                else:
+                    letter, _, text = str(option).partition(":")
+                    normalized[letter.strip()] = text.strip()
+            question["options"] = normalized
+    return questions
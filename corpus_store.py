@@ -0,0 +1,218 @@
+"""
+Compact binary artifacts for the study material corpus.
+
+An artifact is a directory holding:
+    header.json   small metadata header (name, record keys, metadata columns, format version)
+    texts.bin     every text compressed on its own with zlib, back to back
+    offsets.npy   int64 offsets of each compressed text in texts.bin (n + 1 entries)
+    vectors.npy   optional float32/float16/int8 vector block, one row per text
+    scales.npy    optional per-row scales of an int8 vector block
+
+Artifacts are opened with memory maps, so loading is O(1), any text is read and
+decompressed only when accessed, and worker processes share the same pages through the
+OS page cache instead of each holding a parsed copy of the JSON page files.
+
+Usage:
+    python corpus_store.py [--out ./data/artifacts]    # build one artifact per study material document
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import threading
+import zlib
+
+import numpy as np
+
+from configs import config
+
+FORMAT_VERSION = 1
+
+
+class TextStore:
+    """Read-only sequence of texts backed by a compressed blob and an offset index"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("text index out of range")
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return zlib.decompress(self.blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def write_artifact(path, header, texts, vectors=None, scales=None):
+    """
+    Write an artifact directory, replacing any previous one at `path` in a single rename.
+
+    Args:
+        path (str): Artifact directory
+        header (dict): JSON serializable metadata
+        texts (list[str]): Texts stored in the compressed text store
+        vectors (np.ndarray | None): Vector block with one row per text
+        scales (np.ndarray | None): Per-row scales of an int8 vector block
+    """
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    offsets = [0]
+    with open(os.path.join(tmp_path, "texts.bin"), "wb") as file:
+        for text in texts:
+            compressed = zlib.compress((text or "").encode("utf-8"), 6)
+            file.write(compressed)
+            offsets.append(offsets[-1] + len(compressed))
+    np.save(os.path.join(tmp_path, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    if vectors is not None:
+        np.save(os.path.join(tmp_path, "vectors.npy"), np.ascontiguousarray(vectors))
+    if scales is not None:
+        np.save(os.path.join(tmp_path, "scales.npy"), np.asarray(scales, dtype=np.float32))
+    header = dict(header, format_version=FORMAT_VERSION, count=len(texts))
+    with open(os.path.join(tmp_path, "header.json"), "w", encoding="utf-8") as file:
+        json.dump(header, file, ensure_ascii=False)
+
+    old_path = f"{path}.old"
+    if os.path.exists(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class Artifact:
+    """Memory-mapped view of an artifact directory"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "header.json"), "r", encoding="utf-8") as file:
+            self.header = json.load(file)
+        if self.header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format {self.header.get('format_version')} in {path}")
+
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "texts.bin"), "rb") as file:
+            # mmap of an empty file is not allowed
+            blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b""
+        self.texts = TextStore(blob, offsets)
+        self.vectors = self._load_optional("vectors.npy")
+        self.scales = self._load_optional("scales.npy")
+
+    def _load_optional(self, name):
+        file_path = os.path.join(self.path, name)
+        return np.load(file_path, mmap_mode="r") if os.path.exists(file_path) else None
+
+
+def document_artifact_path(document_name, artifact_dir=None):
+    return os.path.join(artifact_dir or config.ARTIFACT_PATH, document_name)
+
+
+def build_document_artifact(page_file, artifact_dir=None):
+    """
+    Convert one page file (*_pages.json or *_pages_embed.json) into an artifact.
+
+    Page vectors are stored when the file has them; pages without one get a zero row and are
+    listed in the header under "missing_vectors".
+
+    Returns:
+        str: Path of the written artifact
+    """
+    from corpus import load_pages
+    pages = load_pages(page_file)
+    document_name = pages[0]["document_name"] if pages else os.path.basename(page_file)
+    vectors = None
+    missing = [page["page_number"] for page in pages if not page["content_vector"]]
+    dimensions = next((len(page["content_vector"]) for page in pages if page["content_vector"]), 0)
+    if dimensions:
+        vectors = np.zeros((len(pages), dimensions), dtype=np.float32)
+        for index, page in enumerate(pages):
+            if page["content_vector"]:
+                vectors[index] = page["content_vector"]
+    path = document_artifact_path(document_name, artifact_dir)
+    write_artifact(path, {"name": document_name, "page_numbers": [page["page_number"] for page in pages],
+                          "missing_vectors": missing if dimensions else []},
+                   [page["page_content"] for page in pages], vectors)
+    return path
+
+
+class DocumentArtifact(Artifact):
+    """Artifact of one study material document with O(1) access by page number"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.document_name = self.header["name"]
+        self.page_numbers = self.header["page_numbers"]
+        self._positions = {page_number: index for index, page_number in enumerate(self.page_numbers)}
+        self._missing_vectors = set(self.header.get("missing_vectors", []))
+
+    def page_text(self, page_number):
+        return self.texts[self._positions[int(page_number)]]
+
+    def page_vector(self, page_number):
+        page_number = int(page_number)
+        if self.vectors is None or page_number in self._missing_vectors:
+            return None
+        return self.vectors[self._positions[page_number]]
+
+    def pages(self):
+        """Pages in the same layout as corpus.load_pages"""
+        return [{
+            "document_name": self.document_name,
+            "page_number": page_number,
+            "page_content": self.texts[index],
+            "content_vector": (self.vectors[index].tolist()
+                               if self.vectors is not None and page_number not in self._missing_vectors else None),
+        } for index, page_number in enumerate(self.page_numbers)]
+
+
+_documents = {}
+_documents_lock = threading.Lock()
+
+
+def open_document(document_name, artifact_dir=None):
+    """Open (once per process) the artifact of a document, or return None if it was not built"""
+    path = document_artifact_path(document_name, artifact_dir)
+    artifact = _documents.get(path)
+    if artifact is None and os.path.exists(os.path.join(path, "header.json")):
+        with _documents_lock:
+            artifact = _documents.get(path)
+            if artifact is None:
+                artifact = DocumentArtifact(path)
+                _documents[path] = artifact
+    return artifact
+
+
+def page_text(document_name, page_number):
+    """Text of one page, read from the document's artifact"""
+    artifact = open_document(document_name)
+    if artifact is None:
+        raise FileNotFoundError(f"No artifact built for {document_name}, run corpus_store.py")
+    return artifact.page_text(page_number)
+
+
+def main():
+    from corpus import page_files
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=config.ARTIFACT_PATH)
+    args = parser.parse_args()
+    for document_name, page_file in page_files().items():
+        path = build_document_artifact(page_file, args.out)
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"{document_name}: {os.path.getsize(page_file) / 1024:.0f} KiB json -> {size / 1024:.0f} KiB artifact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from configs import config
+from metrics import register_callback, STAGE_SECONDS
+from rate_limiter import azure_openai_limiter
+
+
+class CrewPoolBusy(Exception):
+    """Raised when no crew of a CrewPool became free within its timeout"""
+
+
+class CrewPool:
+    """
+    Bounded pool of prepared crews, so concurrent requests never kick off the same Crew.
+
+    Crew, Agent and Task objects keep per-run state (task outputs, agent executors, callbacks), so
+    each in-flight kickoff leases a crew of its own. Crews are built by `factory` on demand up to
+    `size`; the tools and LLM clients they use are shared. Async callers run on the pool's own
+    `size` threads (the default executor is too small to scale), blocking callers lease directly.
+    A kickoff that waited more than `timeout` seconds for a crew fails with CrewPoolBusy.
+    """
+
+    def __init__(self, name, factory, size, timeout):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        # calls waiting for one of the pool's threads, and kickoffs waiting for a crew: one call is only ever in one
+        self.queued = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"crew-{name}")
+        register_callback("sebi_crew_pool_in_use", "Crews running a kickoff",
+                          lambda: {(name,): self.in_use}, ["crew"])
+        register_callback("sebi_crew_pool_queued", "Crew calls waiting for a pool thread",
+                          lambda: {(name,): self.queued}, ["crew"])
+        register_callback("sebi_crew_pool_waiting", "Kickoffs waiting for a free crew",
+                          lambda: {(name,): self.waiting}, ["crew"])
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            build = self.created < self.size
+            if build:
+                self.created += 1
+            else:
+                self.waiting += 1
+        if build:
+            try:
+                return self.factory()
+            except BaseException:
+                with self._lock:
+                    self.created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.rejected += 1
+            raise CrewPoolBusy(f"No {self.name} crew became free within {self.timeout}s")
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    @contextmanager
+    def lease(self):
+        crew = self._acquire()
+        with self._lock:
+            self.in_use += 1
+        try:
+            yield crew
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(crew)
+
+    def prewarm(self, count=1):
+        """Build up to count crews ahead of the first kickoff"""
+        crews = []
+        with self._lock:
+            count = min(count, self.size - self.created)
+            self.created += count
+        try:
+            for _ in range(count):
+                crews.append(self.factory())
+        finally:
+            with self._lock:
+                self.created -= count - len(crews)
+            for crew in crews:
+                self._idle.put(crew)
+
+    def kickoff(self, inputs):
+        """
+        Run a kickoff on a leased crew, blocking; the wait for a free crew is recorded as <name>_crew_wait.
+
+        The kickoff is admitted by the Azure OpenAI limiter as a few LLM calls (CREW_LLM_CALLS_ESTIMATE
+        and CREW_TOKENS_ESTIMATE), the agents' own calls are not seen by it.
+
+        Raises:
+            CrewPoolBusy: When no crew became free within timeout
+            RateLimited: When the LLM quota has no room for the kickoff within its deadline
+        """
+        start = time.perf_counter()
+        with self.lease() as crew:
+            STAGE_SECONDS.observe(time.perf_counter() - start, f"{self.name}_crew_wait")
+            with azure_openai_limiter.acquire(tokens=config.CREW_TOKENS_ESTIMATE,
+                                              requests=config.CREW_LLM_CALLS_ESTIMATE):
+                return crew.kickoff(inputs=inputs)
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args), a call that kicks off one of this pool's crews, on the pool's threads so the
+        event loop keeps serving other requests. It runs in a copy of the caller's context, so the
+        crew's tools see the caller's request_context.
+
+        Raises:
+            CrewPoolBusy: When the call waited longer than timeout for a thread
+        """
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+        with self._lock:
+            self.queued += 1
+
+        def call():
+            with self._lock:
+                self.queued -= 1
+                if time.perf_counter() - submitted > self.timeout:
+                    self.rejected += 1
+                    raise CrewPoolBusy(f"No {self.name} crew became free within {self.timeout}s")
+            return context.run(fn, *args)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def kickoff_async(self, inputs):
+        return await self.run(self.kickoff, inputs)
+
+    def snapshot(self):
+        with self._lock:
+            return {"size": self.size, "created": self.created, "in_use": self.in_use,
+                    "queued": self.queued, "waiting": self.waiting, "idle": self._idle.qsize(), "rejected": self.rejected}
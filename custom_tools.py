@@ -1,31 +1,32 @@
 from langchain_core.tools import tool
 from crewai.tools import BaseTool
-import pandas as pd
 from datetime import datetime, timedelta
-import requests, re, json, traceback, chromadb
-from bs4 import BeautifulSoup
+import requests, re, json, traceback
 from typing import Optional, Dict, Any
 from collections import defaultdict
 from embeddings import get_embeddings
-import math, calendar
-import numexpr
-import numpy as np
-from scipy import stats
+from html_extractor import extract_from_response
+from context_packer import pack_documents
+from chunking import merge_chunks
+from lexical_index import get_lexical_index, reciprocal_rank_fusion, search_stats
+from index_versions import open_collection
+from reranking import diversify_results
+from finance import parse_date
+from expression_engine import evaluate
+from metrics import span, TOOL_SECONDS
+from shared_cache import SharedCache
+from rate_limiter import RateLimited, serper_limiter
+from single_flight import SingleFlight, normalize_text
+import request_context
+import calendar, time
 # from agents import ai_tutor_crew
 from configs import config
 
+# Fetched web pages per search query, shared by the workers; packing for the query happens per call
+_web_cache = SharedCache("web_results", ttl_seconds=config.WEB_CACHE_TTL_SECONDS)
+# Crews searching the same exam for the same query at the same time share one search
+_knowledge_base_flights = SingleFlight("knowledge_base")
 
-def clean_text(text):
-    """Clean text by removing multiple consecutive newlines and extra whitespace"""
-    # Remove multiple consecutive newlines and replace with single newline
-    text = re.sub(r'\n\s*\n+', '\n', text)
-    # Remove multiple consecutive spaces
-    text = re.sub(r' +', ' ', text)
-    # Strip leading/trailing whitespace from each line
-    lines = [line.strip() for line in text.split('\n')]
-    # Remove empty lines and join
-    cleaned_lines = [line for line in lines if line]
-    return '\n'.join(cleaned_lines)
 
 @tool
 def get_web_search_result(query: str):
@@ -51,11 +52,30 @@ def get_web_search_result(query: str):
                                 (truncated to 5000 chars for efficiency)
     """
     print('here')
-    serper_url = "https://google.serper.dev/search"
+    cache_key = SharedCache.key(query)
+    full_content_results = _web_cache.get(cache_key)
+    if full_content_results is None:
+        try:
+            full_content_results = fetch_web_results(query)
+        except RateLimited as e:
+            return f"Web search is unavailable right now ({e}), answer without web results."
+        _web_cache.put(cache_key, full_content_results)
+
+    if config.CONTEXT_PACKING:
+        full_content_results = pack_documents(query, full_content_results, config.WEB_CONTEXT_TOKEN_BUDGET,
+                                              text_key='full_content')
+
+    return json.dumps(full_content_results)
+
+
+def fetch_web_results(query: str):
+    """Serper results for a query, each with the extracted text of its page"""
+    serper_url = config.SERPER_URL
     headers = {"X-API-KEY": config.SERPER_API_KEY}
     payload = {"q": query}
     
-    response = requests.post(serper_url, json=payload, headers=headers)
+    with serper_limiter.acquire(), span("serper_search"):
+        response = requests.post(serper_url, json=payload, headers=headers)
     search_results = response.json()
     
     full_content_results = []
@@ -63,49 +83,70 @@ def get_web_search_result(query: str):
     for result in search_results.get('organic', []):
         url = result['link']
         try:
-            # Fetch the full page content
-            page_response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(page_response.content, 'html.parser')
-            
-            full_text = soup.get_text()
-            
-            cleaned_text = clean_text(full_text)
+            # Stream the page and stop reading once 5000 chars of main content are extracted
+            with span("web_fetch"):
+                page_response = requests.get(url, timeout=10, stream=True)
+                cleaned_text = extract_from_response(page_response, max_chars=5000)
 
             full_content_results.append({
                 'title': result['title'],
                 'url': url,
-                'full_content': cleaned_text[:5000]  # Limit to first 5000 chars
+                'full_content': cleaned_text
             })
         except Exception as e:
             # print(f"Error fetching {url}: {e}")
             continue
-    
-    return json.dumps(full_content_results)
 
+    return full_content_results
 
-def display_results(results):
-    """Display query results in a readable format"""
+
+def display_results(results, query=None):
+    """
+    Display query results in a readable format, packed to the relevant passages when a query is given.
+
+    Chunks of the same page are merged back into a single page citation.
+    """
     
     if not results or not results['documents'][0]:
         return []
         
-    document_list = []
+    pages = {}
     
     for i in range(len(results['documents'][0])):
         doc = results['documents'][0][i]
         metadata = results['metadatas'][0][i]
         distance = results['distances'][0][i]
-        doc_id = results['ids'][0][i]
         
+        key = (metadata['file_name'], metadata['page_number'])
+        if key not in pages:
+            pages[key] = {"chunks": [], "distance": distance}
+        pages[key]["chunks"].append({
+            "page_content": doc,
+            "start": metadata.get('start', 0),
+            "end": metadata.get('end', len(doc)),
+        })
+        pages[key]["distance"] = min(pages[key]["distance"], distance)
+
+    document_list = []
+    distances = []
+    
+    for (file_name, page_number), page in pages.items():
         # Create document JSON object
         document_json = {
-            "page_content": doc,
-            "document_name": metadata['file_name'],
-            "page_number": metadata['page_number'],
+            "page_content": merge_chunks(page["chunks"]),
+            "document_name": file_name,
+            "page_number": page_number,
         }
         
         # Convert to JSON string and add to list
         document_list.append(document_json)
+        distances.append(page["distance"])
+
+    if query and config.CONTEXT_PACKING:
+        # lower distance means more similar to the query embedding
+        document_scores = [-distance for distance in distances]
+        document_list = pack_documents(query, document_list, config.KB_CONTEXT_TOKEN_BUDGET,
+                                       document_scores=document_scores)
     
     return json.dumps(document_list, ensure_ascii=False)
 
@@ -124,23 +165,50 @@ def search_knowledge_base(query: str):
     Returns:
         json string containing: semantic search results with source document name and page number.
     """
-    # Connect to ChromaDB
-    client = chromadb.PersistentClient(path=config.CHROMA_DB_PATH)
-    
     try:
-        collection_name = config.exam_name if config.exam_name else "invest_advisor"
-        # Get the collection
-        collection = client.get_collection(name=collection_name)
-
-        # Generate embedding for the query
-        print("search_query", query)
-        query_embedding = get_embeddings(query)
-        # Perform semantic search
-        results = collection.query(
-            query_embeddings=[query_embedding],  # Use embedding instead of text
-            n_results= 5
-        )
-        return display_results(results)
+        start_time = time.perf_counter()
+        collection_name = request_context.exam_name.get() or "invest_advisor"
+        # Lease the collection of the active index version (Chroma or the in-memory index, which
+        # answers the same query/get calls); an index switch mid-query does not affect it
+        with open_collection(collection_name) as (collection, dimensions):
+            print("search_query", query)
+            candidates = max(config.KB_TOP_K * 2, config.MMR_FETCH_K if config.MMR_RERANK else 0)
+            lexical_index = get_lexical_index(collection) if config.HYBRID_SEARCH else None
+            lexical_hits = lexical_index.search(query, k=candidates) if lexical_index else []
+
+            # Exact terms that clearly single out a few passages don't need the embedding round trip
+            lexical_only = config.LEXICAL_FAST_PATH and lexical_index and lexical_index.is_confident(query, lexical_hits)
+            if not lexical_only:
+                try:
+                    # Generate embedding for the query
+                    query_embedding = get_embeddings(query, dimensions=dimensions)
+                except RateLimited as e:
+                    # over the embeddings quota the BM25 results still answer, worse than hybrid but now
+                    if not lexical_index:
+                        raise
+                    print(f"Falling back to lexical search: {e}")
+                    lexical_only = True
+            if lexical_only:
+                if config.MMR_RERANK:
+                    results = diversify_results(collection, lexical_index.to_results(lexical_hits))
+                else:
+                    results = lexical_index.to_results(lexical_hits[:config.KB_TOP_K])
+                search_stats.record(True, time.perf_counter() - start_time)
+                return display_results(results, query)
+            # Perform semantic search
+            with span("vector_query"):
+                results = collection.query(
+                    query_embeddings=[query_embedding],  # Use embedding instead of text
+                    n_results= candidates if lexical_index or config.MMR_RERANK else config.KB_TOP_K
+                )
+            if lexical_index:
+                results = reciprocal_rank_fusion([results, lexical_index.to_results(lexical_hits)],
+                                                 n_results=candidates if config.MMR_RERANK else config.KB_TOP_K)
+            # Drop near-duplicate passages (overlapping booklets, neighbouring chunks) from the top-k
+            if config.MMR_RERANK:
+                results = diversify_results(collection, results)
+            search_stats.record(False, time.perf_counter() - start_time)
+            return display_results(results, query)
         
     except Exception as e:
         print(f"Error querying collection: {str(e)}\n {traceback.format_exc()}")
@@ -161,8 +229,10 @@ class StudyMaterialSearchTool(BaseTool):
     """)
     
     def _run(self, query: str) -> str:
-        output = search_knowledge_base(query)
-        config.kb_results = json.loads(output)
+        key = SharedCache.key(normalize_text(query), request_context.exam_name.get())
+        with span("study_material_search", metric=TOOL_SECONDS):
+            output = _knowledge_base_flights.do(key, search_knowledge_base, query)
+        request_context.record_sources(json.loads(output))
         return output
 
 
@@ -234,12 +304,13 @@ class WebSearchTool(BaseTool):
     """)
     
     def _run(self, query: str) -> str:
-        return get_web_search_result(query)
+        with span("web_search", metric=TOOL_SECONDS):
+            return get_web_search_result(query)
         
 
 @tool
 def calculator(expression: str) -> str:
-    """Calculate mathematical and statistical expressions safely using Python's numexpr and numpy.
+    """Calculate mathematical and statistical expressions safely with a validated expression engine and numpy.
     
     This tool should be used whenever you need to perform mathematical calculations, \
     solve equations, evaluate numerical expressions, or compute statistical measures. \
@@ -252,15 +323,28 @@ def calculator(expression: str) -> str:
     - Statistical calculations: mean, median, mode, standard deviation
     - Complex expressions with parentheses and operator precedence
     - Calculations involving mathematical constants (pi, e)
+    - Financial calculations: SIP, lump sum growth, CAGR, NPV, IRR/XIRR, EMI, real return, expense ratio impact
     - Any time precise numerical or statistical computation is required
     
     SUPPORTED OPERATIONS:
     - Arithmetic: +, -, *, /, %, ** (power)
-    - Math functions: sin, cos, tan, log, log10, exp, sqrt, abs
-    - Statistical functions: mean([1,2,3]), std([1,2,3]), median([1,2,3])
+    - Math functions: sin, cos, tan, log, log10, exp, sqrt, abs, round(x, 2)
+    - Statistical functions: mean([1,2,3]), std([1,2,3]), median([1,2,3]), sum, min, max
+    - Lists are arrays, arithmetic on them is element-wise: [100, 200] * 1.1
     - Constants: pi (3.14159...), e (2.71828...)
     - Parentheses for grouping: (2 + 3) * 4
     
+    FINANCIAL FUNCTIONS (rates as decimals, 0.12 for 12%):
+    - sip_fv(monthly_investment, annual_rate, years): future value of a monthly SIP
+    - fv(principal, annual_rate, years, periods_per_year=1) / pv(future_amount, annual_rate, years, periods_per_year=1)
+    - cagr(begin_value, end_value, years)
+    - npv(rate, [cf0, cf1, ...]): first cash flow at period 0; irr([cf0, cf1, ...])
+    - xirr([cashflows], ["YYYY-MM-DD", ...]) / xnpv(rate, [cashflows], ["YYYY-MM-DD", ...]): dated cash flows
+    - emi(principal, annual_rate, months)
+    - real_return(nominal_rate, inflation_rate)
+    - expense_drag(amount, gross_return, expense_ratio, years): corpus lost to the expense ratio
+    - Pass a list for any number to compare scenarios in one call: sip_fv(5000, [0.08, 0.10, 0.12], 10)
+    
     EXAMPLES:
     - Simple math: "2 + 3 * 4" → 14
     - With parentheses: "(2 + 3) * 4" → 20
@@ -270,6 +354,9 @@ def calculator(expression: str) -> str:
     - Standard deviation: "std([1, 2, 3, 4, 5])" → 1.58
     - Median: "median([1, 2, 3, 4, 5])" → 3.0
     - Combined: "mean([1, 2, 3]) + std([4, 5, 6])" → 2.82
+    - SIP: "sip_fv(5000, 0.12, 10)" → 1161695.38
+    - EMI: "emi(1000000, 0.085, 240)" → 8678.23
+    - XIRR: "xirr([-10000, 2000, 12000], ['2023-01-01', '2024-01-01', '2025-03-01'])" → 0.1849
     
     Args:
         expression (str): A mathematical or statistical expression as a string. 
@@ -280,70 +367,15 @@ def calculator(expression: str) -> str:
     Returns:
         str: The numerical result of the calculation as a string.
     """
-    # Enhanced local dictionary with statistical functions
-    def mean(data_list):
-        return np.mean(data_list)
-    
-    def median(data_list):
-        return np.median(data_list)
-    
-    def mode(data_list):
-        mode_result = stats.mode(data_list, keepdims=True)
-        return float(mode_result.mode[0])
-    
-    def std(data_list):
-        return np.std(data_list)
-    
-    def var(data_list):
-        return np.var(data_list)
-    
-    def min_val(data_list):
-        return np.min(data_list)
-    
-    def max_val(data_list):
-        return np.max(data_list)
-    
-    local_dict = {
-        "pi": math.pi, 
-        "e": math.e,
-        "mean": mean,
-        "median": median, 
-        "mode": mode,
-        "std": std,
-        "var": var,
-        "min": min_val,
-        "max": max_val,
-        "sqrt": np.sqrt,
-        "sin": np.sin,
-        "cos": np.cos,
-        "tan": np.tan,
-        "log": np.log,
-        "log10": np.log10,
-        "exp": np.exp,
-        "abs": np.abs
-    }
-    
     try:
-        # Handle list notation by converting to numpy arrays
-        expression_clean = expression.strip()
-        
-        # Check if expression contains statistical functions with lists
-        if any(func in expression_clean for func in ['mean', 'median', 'mode', 'std', 'var', 'min', 'max']):
-            # Use eval for statistical expressions (more controlled environment)
-            result = eval(expression_clean, {"__builtins__": {}}, local_dict)
-        else:
-            # Use numexpr for simple mathematical expressions
-            result = numexpr.evaluate(expression_clean, local_dict=local_dict)
-            
-        return str(result)
-    
+        return str(evaluate(expression))
     except Exception as e:
         return f"Error: {str(e)}. Please check your expression format."
 
 
 class CalculatorTool(BaseTool):
     name: str ="Calculator Tool"
-    description: str = ("""Calculate mathematical and statistical expressions safely using Python's numexpr and numpy.
+    description: str = ("""Calculate mathematical and statistical expressions safely with a validated expression engine and numpy.
     
     This tool should be used whenever you need to perform mathematical calculations, \
     solve equations, evaluate numerical expressions, or compute statistical measures. \
@@ -356,15 +388,28 @@ class CalculatorTool(BaseTool):
     - Statistical calculations: mean, median, mode, standard deviation
     - Complex expressions with parentheses and operator precedence
     - Calculations involving mathematical constants (pi, e)
+    - Financial calculations: SIP, lump sum growth, CAGR, NPV, IRR/XIRR, EMI, real return, expense ratio impact
     - Any time precise numerical or statistical computation is required
     
     SUPPORTED OPERATIONS:
     - Arithmetic: +, -, *, /, %, ** (power)
-    - Math functions: sin, cos, tan, log, log10, exp, sqrt, abs
-    - Statistical functions: mean([1,2,3]), std([1,2,3]), median([1,2,3])
+    - Math functions: sin, cos, tan, log, log10, exp, sqrt, abs, round(x, 2)
+    - Statistical functions: mean([1,2,3]), std([1,2,3]), median([1,2,3]), sum, min, max
+    - Lists are arrays, arithmetic on them is element-wise: [100, 200] * 1.1
     - Constants: pi (3.14159...), e (2.71828...)
     - Parentheses for grouping: (2 + 3) * 4
     
+    FINANCIAL FUNCTIONS (rates as decimals, 0.12 for 12%):
+    - sip_fv(monthly_investment, annual_rate, years): future value of a monthly SIP
+    - fv(principal, annual_rate, years, periods_per_year=1) / pv(future_amount, annual_rate, years, periods_per_year=1)
+    - cagr(begin_value, end_value, years)
+    - npv(rate, [cf0, cf1, ...]): first cash flow at period 0; irr([cf0, cf1, ...])
+    - xirr([cashflows], ["YYYY-MM-DD", ...]) / xnpv(rate, [cashflows], ["YYYY-MM-DD", ...]): dated cash flows
+    - emi(principal, annual_rate, months)
+    - real_return(nominal_rate, inflation_rate)
+    - expense_drag(amount, gross_return, expense_ratio, years): corpus lost to the expense ratio
+    - Pass a list for any number to compare scenarios in one call: sip_fv(5000, [0.08, 0.10, 0.12], 10)
+    
     EXAMPLES:
     - Simple math: "2 + 3 * 4" → 14
     - With parentheses: "(2 + 3) * 4" → 20
@@ -374,6 +419,9 @@ class CalculatorTool(BaseTool):
     - Standard deviation: "std([1, 2, 3, 4, 5])" → 1.58
     - Median: "median([1, 2, 3, 4, 5])" → 3.0
     - Combined: "mean([1, 2, 3]) + std([4, 5, 6])" → 2.82
+    - SIP: "sip_fv(5000, 0.12, 10)" → 1161695.38
+    - EMI: "emi(1000000, 0.085, 240)" → 8678.23
+    - XIRR: "xirr([-10000, 2000, 12000], ['2023-01-01', '2024-01-01', '2025-03-01'])" → 0.1849
     
     Args:
         expression (str): A mathematical or statistical expression as a string. 
@@ -385,7 +433,8 @@ class CalculatorTool(BaseTool):
         str: The numerical result of the calculation as a string.""")
     
     def _run(self, expression: str) -> str:
-        return calculator(expression)
+        with span("calculator", metric=TOOL_SECONDS):
+            return calculator(expression)
 
 
 @tool
@@ -451,15 +500,15 @@ def date_calculator(operation: str, date_input: str = "") -> str:
         elif operation == "day_of_week":
             if not date_input:
                 return "Error: Please provide a date in YYYY-MM-DD format"
-            date_obj = datetime.strptime(date_input.strip(), "%Y-%m-%d")
+            date_obj = parse_date(date_input)
             return date_obj.strftime("%A")
             
         elif operation == "days_between":
             if not date_input or "," not in date_input:
                 return "Error: Please provide two dates separated by comma (YYYY-MM-DD,YYYY-MM-DD)"
             date1_str, date2_str = date_input.split(",")
-            date1 = datetime.strptime(date1_str.strip(), "%Y-%m-%d")
-            date2 = datetime.strptime(date2_str.strip(), "%Y-%m-%d")
+            date1 = parse_date(date1_str)
+            date2 = parse_date(date2_str)
             diff = abs((date2 - date1).days)
             return f"{diff} days"
             
@@ -467,7 +516,7 @@ def date_calculator(operation: str, date_input: str = "") -> str:
             if not date_input or "," not in date_input:
                 return "Error: Please provide date and number of days (YYYY-MM-DD,number)"
             date_str, days_str = date_input.split(",")
-            base_date = datetime.strptime(date_str.strip(), "%Y-%m-%d")
+            base_date = parse_date(date_str)
             days_to_add = int(days_str.strip())
             result_date = base_date + timedelta(days=days_to_add)
             weekday = result_date.strftime("%A")
@@ -477,7 +526,7 @@ def date_calculator(operation: str, date_input: str = "") -> str:
             if not date_input or "," not in date_input:
                 return "Error: Please provide date and number of days (YYYY-MM-DD,number)"
             date_str, days_str = date_input.split(",")
-            base_date = datetime.strptime(date_str.strip(), "%Y-%m-%d")
+            base_date = parse_date(date_str)
             days_to_subtract = int(days_str.strip())
             result_date = base_date - timedelta(days=days_to_subtract)
             weekday = result_date.strftime("%A")
@@ -503,7 +552,7 @@ def date_calculator(operation: str, date_input: str = "") -> str:
         elif operation == "week_number":
             if not date_input:
                 return "Error: Please provide a date in YYYY-MM-DD format"
-            date_obj = datetime.strptime(date_input.strip(), "%Y-%m-%d")
+            date_obj = parse_date(date_input)
             week_num = date_obj.isocalendar()[1]
             return f"Week {week_num} of {date_obj.year}"
             
@@ -567,4 +616,5 @@ class DateSearchTool(BaseTool):
     """)
     
     def _run(self, operation:str, date_input:str = "") -> str:
-        return date_calculator(operation, date_input)
\ No newline at end of file
+        with span("date_calculator", metric=TOOL_SECONDS):
+            return date_calculator(operation, date_input)
\ No newline at end of file
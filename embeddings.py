@@ -2,8 +2,24 @@ import requests
 import json, os
 from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
-import time
+import threading
 from configs import config
+from vector_index import truncate_embedding
+from metrics import span
+from shared_cache import SharedCache
+from rate_limiter import background, embeddings_limiter, retry_after_seconds
+
+# Size of the full text-embedding-005 vectors; smaller EMBEDDING_DIM values use Matryoshka truncation
+FULL_EMBEDDING_DIM = 768
+
+# Keep-alive connections to the embeddings endpoint, and credentials per service account file whose
+# token is only refreshed when it expired, so a request does not pay a TLS handshake and an OAuth round trip
+_session = requests.Session()
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+# Query embeddings are deterministic, every worker reuses the ones any worker fetched
+_embedding_cache = SharedCache("embeddings")
 
 # def get_creds():
 #     credentials, project = default()
@@ -12,7 +28,7 @@ from configs import config
 
 def get_creds(service_account_path=config.GOOGLE_CREDS_JSON):
     """
-    Get access token using service account JSON file.
+    Get access token using service account JSON file, refreshing it only when it expired.
     
     Args:
         service_account_path (str): Path to the service account JSON file
@@ -21,22 +37,53 @@ def get_creds(service_account_path=config.GOOGLE_CREDS_JSON):
         str: Access token
     """
     try:
-        # Load service account credentials from JSON file
-        credentials = Credentials.from_service_account_file(
-            service_account_path,
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh the credentials to get an access token
-        credentials.refresh(Request())
-        
-        return credentials.token
+        with _credentials_lock:
+            credentials = _credentials.get(service_account_path)
+            if credentials is None:
+                # Load service account credentials from JSON file
+                credentials = Credentials.from_service_account_file(
+                    service_account_path,
+                    scopes=['https://www.googleapis.com/auth/cloud-platform']
+                )
+                _credentials[service_account_path] = credentials
+
+            if not credentials.valid:
+                # Refresh the credentials to get an access token
+                with span("oauth_refresh"):
+                    credentials.refresh(Request())
+
+            return credentials.token
     except Exception as e:
         print(f"Error getting access token: {e}")
         return None
 
-def get_embeddings(input_text):
+def _embedding_parameters(dimensions):
+    if dimensions and dimensions < FULL_EMBEDDING_DIM:
+        return {"outputDimensionality": dimensions}
+    return {}
+
+
+def get_embeddings(input_text, dimensions=None):
+    """
+    Get the embedding of a text.
+
+    Args:
+        input_text (str): Text to embed
+        dimensions (int | None): Output size, defaults to config.EMBEDDING_DIM. Reduced sizes are
+            requested from the API and re-normalized to unit length.
+
+    Returns:
+        list[float]: Embedding vector
+
+    Raises:
+        RateLimited: When the embeddings quota is exhausted for longer than the admission deadline
+    """
+    dimensions = dimensions or config.EMBEDDING_DIM
     url = config.EMBEDDINGS_URL
+    cache_key = SharedCache.key(url, dimensions, input_text)
+    cached = _embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     headers = {
         'Authorization': f'Bearer {get_creds()}',
@@ -51,26 +98,71 @@ def get_embeddings(input_text):
             "content": input_text
             }
         ],
-        # "parameters": {
-        #     "outputDimensionality": 256
-        # }
+        "parameters": _embedding_parameters(dimensions)
     }
 
-    # Send the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+    # Send the POST request; on 429 the limiter pauses every embeddings call and this one is queued
+    # again, or rejected with a retry hint when the pause outlasts its deadline
+    while True:
+        with embeddings_limiter.acquire(), span("embeddings"):
+            response = _session.post(url, headers=headers, data=json.dumps(data))
+        if response.status_code != 429:
+            break
+        print('quota limit reached, backing off')
+        embeddings_limiter.backoff(retry_after_seconds(response))
 
     # Print the response
     if response.status_code != 200:
-        if response.status_code == 429:
-            print('quota limit reached, waiting a minute')
-            time.sleep(60)
-            print("trying again")
-            return get_embeddings(input_text)
-        else:
-            print(response.status_code)
-            print(response.json())
+        print(response.status_code)
+        print(response.json())
     else:
         response_json = response.json()
-        return response_json['predictions'][0]['embeddings']['values']
+        values = response_json['predictions'][0]['embeddings']['values']
+        if dimensions < FULL_EMBEDDING_DIM:
+            values = truncate_embedding(values, dimensions).tolist()
+        _embedding_cache.put(cache_key, values)
+        return values
+
+def get_embeddings_batch(input_texts, batch_size=16, dimensions=None):
+    """
+    Get embeddings for many texts, sending `batch_size` instances per request.
+
+    Index builds are background work for the rate limiter, so they yield to query embeddings.
+
+    Args:
+        input_texts (list[str]): Texts to embed
+        batch_size (int): Number of instances per request
+        dimensions (int | None): Output size, defaults to config.EMBEDDING_DIM
+
+    Returns:
+        list[list[float]]: One embedding per input text, in order
+    """
+    dimensions = dimensions or config.EMBEDDING_DIM
+    url = config.EMBEDDINGS_URL
+    vectors = []
+    start = 0
+    while start < len(input_texts):
+        batch = input_texts[start:start + batch_size]
+        headers = {
+            'Authorization': f'Bearer {get_creds()}',
+            'Content-Type': 'application/json'
+        }
+        data = {"instances": [{"content": text} for text in batch],
+                "parameters": _embedding_parameters(dimensions)}
+        with background(), embeddings_limiter.acquire(), span("embeddings_batch"):
+            response = _session.post(url, headers=headers, data=json.dumps(data))
+        if response.status_code == 429:
+            print('quota limit reached, backing off')
+            embeddings_limiter.backoff(retry_after_seconds(response))
+            continue
+        if response.status_code != 200:
+            raise RuntimeError(f"Embedding request failed with {response.status_code}: {response.text}")
+        for prediction in response.json()['predictions']:
+            values = prediction['embeddings']['values']
+            if dimensions < FULL_EMBEDDING_DIM:
+                values = truncate_embedding(values, dimensions).tolist()
+            vectors.append(values)
+        start += batch_size
+    return vectors
 
 # print(get_embeddings("hello world"))
\ No newline at end of file
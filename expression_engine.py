@@ -0,0 +1,165 @@
+import ast
+import math
+import operator
+from functools import lru_cache
+
+import numpy as np
+
+from configs import config
+from finance import FINANCE_FUNCTIONS
+from metrics import register_cache
+
+# Largest result of ** on integers, in bits (about 20,000 digits): Python would otherwise compute
+# arbitrarily large integers such as 9 ** 9 ** 9 or (9 ** 10000) ** 10000
+MAX_INTEGER_POWER_BITS = 65536
+
+
+class ExpressionError(ValueError):
+    """The expression uses syntax, names or functions the calculator does not allow"""
+
+
+def _mode(data_list):
+    # scipy.stats takes about a second to import and only mode() needs it
+    from scipy import stats
+
+    return float(stats.mode(data_list, keepdims=True).mode[0])
+
+
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+FUNCTIONS = {
+    "mean": np.mean,
+    "median": np.median,
+    "mode": _mode,
+    "std": np.std,
+    "var": np.var,
+    "min": np.min,
+    "max": np.max,
+    "sum": np.sum,
+    "round": np.round,
+    "sqrt": np.sqrt,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "log": np.log,
+    "log10": np.log10,
+    "exp": np.exp,
+    "abs": np.abs,
+    **FINANCE_FUNCTIONS,
+}
+
+
+def _power(base, exponent):
+    # the size of the result is estimated before computing it, the operands may be results of ** too
+    if (isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1
+            and abs(exponent) * math.log2(abs(base)) > MAX_INTEGER_POWER_BITS):
+        raise ExpressionError("The result of ** is too large")
+    return operator.pow(base, exponent)
+
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def _number(value):
+    """Arithmetic is for numbers and arrays only, str or list repetition could exhaust memory"""
+    if isinstance(value, (str, list)):
+        raise ExpressionError("Arithmetic needs numbers or lists of numbers")
+    return value
+
+
+def _sequence(items):
+    """Numeric lists become arrays so arithmetic on them is element-wise, other lists (dates) stay lists"""
+    if items and all(isinstance(item, (int, float, np.number, np.ndarray)) for item in items):
+        return np.asarray(items, dtype=np.float64)
+    return items
+
+
+def _compile(node):
+    """Turn a validated AST node into a closure computing its value"""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float, str)):
+            raise ExpressionError(f"Unsupported constant {node.value!r}")
+        value = node.value
+        return lambda: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise ExpressionError(f"Unknown name '{node.id}'")
+        value = CONSTANTS[node.id]
+        return lambda: value
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        apply, left, right = BINARY_OPERATORS[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda: apply(_number(left()), _number(right()))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        apply, operand = UNARY_OPERATORS[type(node.op)], _compile(node.operand)
+        return lambda: apply(operand())
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(item) for item in node.elts]
+        return lambda: _sequence([item() for item in items])
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            name = node.func.id if isinstance(node.func, ast.Name) else ast.unparse(node.func)
+            raise ExpressionError(f"Unknown function '{name}'")
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(kw.arg is None for kw in node.keywords):
+            raise ExpressionError("Argument unpacking is not supported")
+        function = FUNCTIONS[node.func.id]
+        args = [_compile(arg) for arg in node.args]
+        keywords = {kw.arg: _compile(kw.value) for kw in node.keywords}
+        return lambda: function(*(arg() for arg in args), **{name: value() for name, value in keywords.items()})
+
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=config.CALCULATOR_CACHE_SIZE)
+def compile_expression(expression):
+    """
+    Parse and validate an expression once; repeated expressions come from the cache.
+
+    Only numbers, strings (for dates), lists, arithmetic operators, the constants in CONSTANTS
+    and calls of the functions in FUNCTIONS are accepted, nothing is ever passed to eval.
+
+    Args:
+        expression (str): Expression such as "sip_fv(5000, [0.08, 0.12], 10) - 600000"
+
+    Returns:
+        Callable[[], Any]: Computes the expression's value
+
+    Raises:
+        ExpressionError: When the expression is not valid calculator syntax
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from None
+    return _compile(tree.body)
+
+
+register_cache("calculator_expressions", lambda: (compile_expression.cache_info().hits,
+                                                  compile_expression.cache_info().misses))
+
+
+def evaluate(expression):
+    """Value of an expression, NumPy arrays for list arguments and plain numbers otherwise"""
+    result = compile_expression(expression)()
+    if isinstance(result, np.ndarray) and result.ndim == 0:
+        return result.item()
+    if isinstance(result, np.generic):
+        return result.item()
+    return result
@@ -0,0 +1,195 @@
+from datetime import datetime
+
+import numpy as np
+
+DATE_FORMAT = "%Y-%m-%d"
+DAYS_PER_YEAR = 365.0
+
+
+def parse_date(date_str):
+    """Parse a YYYY-MM-DD date as used by the date calculator"""
+    return datetime.strptime(date_str.strip(), DATE_FORMAT)
+
+
+def _array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _result(values):
+    """Plain float for scalar inputs, an array when a batch of scenarios was evaluated"""
+    values = np.asarray(values, dtype=np.float64)
+    return float(values) if values.ndim == 0 else values
+
+
+def sip_future_value(monthly_investment, annual_rate, years, annuity_due=True):
+    """
+    Future value of a monthly SIP with monthly compounding.
+
+    Every argument may be a number or a list, lists evaluate all scenarios at once
+    (e.g. annual_rate=[0.08, 0.10, 0.12]).
+
+    Args:
+        monthly_investment: Amount invested each month
+        annual_rate: Expected annual return as a decimal (0.12 for 12%)
+        years: Investment horizon in years
+        annuity_due (bool): Instalments at the start of each month, as SIP calculators assume
+
+    Returns:
+        float | numpy.ndarray: Corpus at the end of the horizon
+    """
+    monthly_investment, annual_rate, years = _array(monthly_investment), _array(annual_rate), _array(years)
+    rate, months = annual_rate / 12, years * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(rate == 0, months, ((1 + rate) ** months - 1) / rate)
+    return _result(monthly_investment * growth * np.where(annuity_due, 1 + rate, 1.0))
+
+
+def future_value(principal, annual_rate, years, periods_per_year=1):
+    """Future value of a lump sum compounded periods_per_year times a year"""
+    principal, annual_rate, years = _array(principal), _array(annual_rate), _array(years)
+    return _result(principal * (1 + annual_rate / periods_per_year) ** (years * periods_per_year))
+
+
+def present_value(future_amount, annual_rate, years, periods_per_year=1):
+    """Amount to invest today to reach future_amount"""
+    future_amount, annual_rate, years = _array(future_amount), _array(annual_rate), _array(years)
+    return _result(future_amount / (1 + annual_rate / periods_per_year) ** (years * periods_per_year))
+
+
+def cagr(begin_value, end_value, years):
+    """Compound annual growth rate as a decimal"""
+    begin_value, end_value, years = _array(begin_value), _array(end_value), _array(years)
+    return _result((end_value / begin_value) ** (1 / years) - 1)
+
+
+def npv(rate, cashflows):
+    """
+    Net present value of periodic cash flows, the first flow at period 0 (undiscounted).
+
+    Args:
+        rate: Discount rate per period as a decimal, or a list of rates
+        cashflows: One series, or a list of equally long series (one per scenario)
+
+    Returns:
+        float | numpy.ndarray: NPV per rate and/or scenario
+    """
+    cashflows = _array(cashflows)
+    rate = _array(rate)[..., None] if np.ndim(rate) else _array(rate)
+    periods = np.arange(cashflows.shape[-1])
+    return _result((cashflows / (1 + rate) ** periods).sum(axis=-1))
+
+
+def _solve_rate(cashflows, times, guess=0.1, tolerance=1e-10, max_iterations=100):
+    """Rate r with sum(cashflows / (1 + r) ** times) == 0 for each row, NaN when there is none"""
+    cashflows = np.atleast_2d(cashflows)
+    times = np.broadcast_to(times, cashflows.shape)
+    rate = np.full(cashflows.shape[0], guess)
+    converged = np.zeros_like(rate, dtype=bool)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iterations):
+            discount = (1 + rate[:, None]) ** -times
+            value = (cashflows * discount).sum(axis=1)
+            slope = (-times * cashflows * discount / (1 + rate[:, None])).sum(axis=1)
+            step = np.where(converged, 0.0, value / slope)
+            rate = np.maximum(rate - step, -0.999999)
+            converged |= np.abs(step) < tolerance
+            if converged.all():
+                break
+
+        # Newton can wander off for unusual cash flow patterns: bisect those rows on a wide bracket
+        for row in np.flatnonzero(~converged | ~np.isfinite(rate)):
+            low, high = -0.999999, 100.0
+            value = lambda r: (cashflows[row] * (1 + r) ** -times[row]).sum()
+            if np.sign(value(low)) == np.sign(value(high)):
+                rate[row] = np.nan
+                continue
+            for _ in range(200):
+                middle = (low + high) / 2
+                if np.sign(value(middle)) == np.sign(value(low)):
+                    low = middle
+                else:
+                    high = middle
+            rate[row] = (low + high) / 2
+    return rate
+
+
+def irr(cashflows):
+    """Internal rate of return per period of periodic cash flows (one series or a list of series)"""
+    cashflows = _array(cashflows)
+    rates = _solve_rate(cashflows, np.arange(cashflows.shape[-1], dtype=np.float64))
+    return _result(rates[0] if cashflows.ndim == 1 else rates)
+
+
+def _year_fractions(dates):
+    dates = [parse_date(date) if isinstance(date, str) else date for date in dates]
+    return np.array([(date - dates[0]).days for date in dates], dtype=np.float64) / DAYS_PER_YEAR
+
+
+def xnpv(rate, cashflows, dates):
+    """NPV of dated cash flows (YYYY-MM-DD strings), discounted on actual/365 from the first date"""
+    cashflows, years = _array(cashflows), _year_fractions(dates)
+    rate = _array(rate)[..., None] if np.ndim(rate) else _array(rate)
+    return _result((cashflows / (1 + rate) ** years).sum(axis=-1))
+
+
+def xirr(cashflows, dates):
+    """
+    Annualized return of dated, irregular cash flows, as spreadsheet XIRR computes it.
+
+    Args:
+        cashflows: Investments negative, redemptions positive; one series or a list of series
+        dates: YYYY-MM-DD date of each flow, shared by all series
+
+    Returns:
+        float | numpy.ndarray: Annual rate as a decimal, NaN when no rate exists
+    """
+    cashflows = _array(cashflows)
+    rates = _solve_rate(cashflows, _year_fractions(dates))
+    return _result(rates[0] if cashflows.ndim == 1 else rates)
+
+
+def emi(principal, annual_rate, months):
+    """Equated monthly instalment of a loan with monthly reducing balance"""
+    principal, annual_rate, months = _array(principal), _array(annual_rate), _array(months)
+    rate = annual_rate / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + rate) ** months
+        instalment = np.where(rate == 0, principal / months, principal * rate * growth / (growth - 1))
+    return _result(instalment)
+
+
+def real_return(nominal_rate, inflation_rate):
+    """Inflation-adjusted return (Fisher): (1 + nominal) / (1 + inflation) - 1"""
+    return _result((1 + _array(nominal_rate)) / (1 + _array(inflation_rate)) - 1)
+
+
+def expense_drag(amount, gross_return, expense_ratio, years):
+    """
+    Corpus lost to a fund's expense ratio over the holding period.
+
+    Args:
+        amount: Lump sum invested
+        gross_return: Annual return before expenses as a decimal
+        expense_ratio: Annual expense ratio as a decimal (0.015 for 1.5%)
+        years: Holding period in years
+
+    Returns:
+        float | numpy.ndarray: Corpus without expenses minus corpus after expenses
+    """
+    amount, gross_return, expense_ratio, years = (_array(value) for value in (amount, gross_return, expense_ratio, years))
+    return _result(amount * ((1 + gross_return) ** years - (1 + gross_return - expense_ratio) ** years))
+
+
+FINANCE_FUNCTIONS = {
+    "sip_fv": sip_future_value,
+    "fv": future_value,
+    "pv": present_value,
+    "cagr": cagr,
+    "npv": npv,
+    "irr": irr,
+    "xnpv": xnpv,
+    "xirr": xirr,
+    "emi": emi,
+    "real_return": real_return,
+    "expense_drag": expense_drag,
+}
@@ -0,0 +1,264 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+# Subtrees whose text never belongs in the extracted page content
+SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe',
+    'nav', 'footer', 'header', 'aside', 'form', 'button', 'select', 'head',
+}
+
+# Subtrees that hold the main content of a page when present
+MAIN_TAGS = {'article', 'main'}
+
+# Tags that end the current line of text
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'br', 'li', 'ul', 'ol', 'tr', 'table',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'dd', 'dt', 'dl',
+    'figcaption', 'td', 'th', 'hr',
+}
+
+# Elements that never have a closing tag, so they must not be pushed on the stack
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+
+DEFAULT_MAX_CHARS = 5000
+# How far past a full fallback buffer we keep reading in the hope of finding <main>/<article>
+DEFAULT_LOOKAHEAD_BYTES = 256 * 1024
+# Hard cap on bytes downloaded for a single page
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+# Bytes of the page searched for a <meta> charset when the Content-Type header names none
+SNIFF_BYTES = 4 * 1024
+
+_SPACES = re.compile(r'\s+')
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([^\s;"\']+)', re.IGNORECASE)
+# <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+
+class _BudgetReached(Exception):
+    pass
+
+
+class _TextBuffer:
+    """Line oriented text buffer that stops accepting text once the character budget is used."""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.lines = []
+        self.current = []
+        self.size = 0
+
+    @property
+    def full(self):
+        return self.size >= self.max_chars
+
+    def add(self, text):
+        if not self.full:
+            self.current.append(text)
+
+    def end_line(self):
+        if not self.current:
+            return
+        line = _SPACES.sub(' ', ''.join(self.current)).strip()
+        self.current = []
+        if not line or self.full:
+            return
+        # account for the newline joining this line to the previous one
+        self.size += len(line) + (1 if self.lines else 0)
+        self.lines.append(line)
+
+    def text(self):
+        self.end_line()
+        return '\n'.join(self.lines)[:self.max_chars]
+
+
+class MainContentExtractor(HTMLParser):
+    """
+    Streaming HTML to text extractor.
+
+    Text inside <article>/<main> (or role="main") is collected separately from the rest of
+    the page, and boilerplate subtrees (scripts, styles, navigation, footers...) are skipped.
+    Parsing stops as soon as the main content buffer holds `max_chars` characters.
+    """
+
+    def __init__(self, max_chars=DEFAULT_MAX_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.main = _TextBuffer(max_chars)
+        self.fallback = _TextBuffer(max_chars)
+        self.stack = []
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.seen_main = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS:
+                self._end_line()
+            return
+        is_main = tag in MAIN_TAGS or dict(attrs).get('role') == 'main'
+        is_skip = tag in SKIP_TAGS and not is_main
+        self.stack.append((tag, is_skip, is_main))
+        if is_skip:
+            self.skip_depth += 1
+        if is_main:
+            self.main_depth += 1
+            self.seen_main = True
+        if tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        # Pop up to the matching open tag, tolerating unclosed children
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        for _, is_skip, is_main in reversed(self.stack[index:]):
+            if is_skip:
+                self.skip_depth -= 1
+            if is_main:
+                self.main_depth -= 1
+        del self.stack[index:]
+        if tag in BLOCK_TAGS or tag in MAIN_TAGS:
+            self._end_line()
+        if self.main.full:
+            raise _BudgetReached()
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.main_depth:
+            self.main.add(data)
+        elif not self.seen_main:
+            self.fallback.add(data)
+
+    def _end_line(self):
+        self.main.end_line()
+        self.fallback.end_line()
+        if self.main.full:
+            raise _BudgetReached()
+
+    def feed_chunk(self, chunk):
+        """Feed a chunk of decoded HTML. Returns False once the main content budget is reached."""
+        try:
+            self.feed(chunk)
+        except _BudgetReached:
+            return False
+        return not self.main.full
+
+    def result(self):
+        main_text = self.main.text()
+        return main_text if main_text else self.fallback.text()
+
+
+def extract_main_text(html, max_chars=DEFAULT_MAX_CHARS):
+    """
+    Extract readable main content from an HTML document.
+
+    Args:
+        html (str | bytes): Full HTML document
+        max_chars (int): Maximum number of characters to keep
+
+    Returns:
+        str: Cleaned text, one block per line, at most `max_chars` long
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    extractor = MainContentExtractor(max_chars)
+    for start in range(0, len(html), CHUNK_SIZE):
+        if not extractor.feed_chunk(html[start:start + CHUNK_SIZE]):
+            break
+    return extractor.result()
+
+
+def _sniff_encoding(content_type, head):
+    """
+    Encoding of an HTML page: a byte order mark, the Content-Type charset or a <meta> charset in
+    the first bytes, in that order, and UTF-8 when none names a known codec.
+
+    requests' own guess (response.encoding) is not used: it is ISO-8859-1 for every text/html
+    response without a charset header, whatever the page declares.
+
+    Args:
+        content_type (str | None): Content-Type header of the response
+        head (bytes): First bytes of the page
+
+    Returns:
+        str: Codec name
+    """
+    candidates = []
+    if head.startswith(codecs.BOM_UTF8):
+        candidates.append('utf-8-sig')
+    match = _HEADER_CHARSET.search(content_type or '')
+    if match:
+        candidates.append(match.group(1))
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii'))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+def extract_from_response(response, max_chars=DEFAULT_MAX_CHARS,
+                          lookahead_bytes=DEFAULT_LOOKAHEAD_BYTES, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Extract main content from a streamed `requests` response without downloading the whole page.
+
+    Reading stops when the main content budget is filled, when the fallback (whole page) text is
+    full and no <main>/<article> showed up within `lookahead_bytes`, or after `max_bytes`. The
+    page is decoded with the encoding `_sniff_encoding` finds in the headers and the first bytes.
+
+    Args:
+        response: requests.Response opened with stream=True
+        max_chars (int): Maximum number of characters to keep
+        lookahead_bytes (int): Extra bytes to scan for a main content element once the fallback is full
+        max_bytes (int): Hard limit on downloaded bytes
+
+    Returns:
+        str: Cleaned text, at most `max_chars` long
+    """
+    decoder = None
+    head = b''
+    extractor = MainContentExtractor(max_chars)
+    read_bytes = 0
+    fallback_full_at = None
+    try:
+        for raw in response.iter_content(chunk_size=CHUNK_SIZE):
+            read_bytes += len(raw)
+            if decoder is None:
+                # hold the first bytes back until the <meta> charset can be searched in them
+                head += raw
+                if len(head) < SNIFF_BYTES:
+                    continue
+                encoding = _sniff_encoding(response.headers.get('Content-Type'), head)
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                raw = head
+            if not extractor.feed_chunk(decoder.decode(raw)):
+                break
+            if read_bytes >= max_bytes:
+                break
+            if extractor.fallback.full and not extractor.seen_main:
+                if fallback_full_at is None:
+                    fallback_full_at = read_bytes
+                elif read_bytes - fallback_full_at >= lookahead_bytes:
+                    break
+        else:
+            if decoder is None and head:
+                # the whole page was shorter than SNIFF_BYTES
+                encoding = _sniff_encoding(response.headers.get('Content-Type'), head)
+                extractor.feed_chunk(head.decode(encoding, errors='replace'))
+    finally:
+        response.close()
+    return extractor.result()
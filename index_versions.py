@@ -0,0 +1,536 @@
+"""
+Versioned knowledge base indexes with a zero-downtime blue/green switch.
+
+Every build goes to its own directory under INDEX_VERSIONS_PATH:
+    <version>/manifest.json        backend, build settings and record counts
+    <version>/chroma/              Chroma database (chroma backend)
+    <version>/vector_index/<exam>  corpus_store artifacts (memory backend)
+    active.json                    the active version and the activation history
+
+A new version is built next to the live one, validated with smoke queries and activated
+by atomically replacing active.json. Each worker process watches that file, opens and warms
+the new version (collections and BM25 indexes) in the background, then switches to it;
+queries already running keep the version they started on. Old versions are deleted once
+they have been inactive for INDEX_GC_GRACE_SECONDS, keeping the INDEX_KEEP_VERSIONS most
+recent ones for rollback.
+
+Without an active version, the legacy CHROMA_DB_PATH / VECTOR_INDEX_PATH indexes are used.
+
+Usage:
+    python index_versions.py build [--exam ...] [--backend chroma|memory] [--no-activate]
+    python index_versions.py list
+    python index_versions.py activate VERSION
+    python index_versions.py gc
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from configs import config
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = "active.json"
+MANIFEST_FILE = "manifest.json"
+# Share of smoke queries that must find their own record for a version to be activated
+SMOKE_MIN_HIT_RATE = 0.8
+SMOKE_SAMPLES = 5
+
+
+def _root(root=None):
+    return root or config.INDEX_VERSIONS_PATH
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_active(root=None):
+    """Return the active.json content, or None when no version was activated yet"""
+    try:
+        with open(os.path.join(_root(root), ACTIVE_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(root=None):
+    """Return the manifests of every complete version, oldest first"""
+    root = _root(root)
+    if not os.path.isdir(root):
+        return []
+    versions = []
+    for name in sorted(os.listdir(root)):
+        manifest_path = os.path.join(root, name, MANIFEST_FILE)
+        if not name.endswith(".building") and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                versions.append(json.load(file))
+    return versions
+
+
+class IndexVersion:
+    """Collections of one index version, opened once per process"""
+
+    def __init__(self, name, root=None):
+        self.name = name
+        self.path = os.path.join(_root(root), name)
+        with open(os.path.join(self.path, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        self.backend = self.manifest["backend"]
+        # query embeddings must be requested at the size the version was built with
+        self.dimensions = self.manifest.get("dimensions", config.EMBEDDING_DIM)
+        self._collections = {}
+        self._client = None
+        self._lock = threading.Lock()
+
+    def collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(collection_name)
+                if collection is None:
+                    collection = self._open(collection_name)
+                    self._collections[collection_name] = collection
+        return collection
+
+    def _open(self, collection_name):
+        if self.backend == "memory":
+            from vector_index import VectorIndex
+            return VectorIndex.load(os.path.join(self.path, "vector_index", collection_name))
+        if self._client is None:
+            import chromadb
+            self._client = chromadb.PersistentClient(path=os.path.join(self.path, "chroma"))
+        return self._client.get_collection(name=collection_name)
+
+    def warm(self):
+        """Open every collection and build its BM25 index so the first query after the switch is not cold"""
+        from lexical_index import get_lexical_index
+        for collection_name in self.manifest["collections"]:
+            collection = self.collection(collection_name)
+            if config.HYBRID_SEARCH:
+                get_lexical_index(collection)
+
+
+_current = None
+_current_lock = threading.Lock()
+# Serializes version switches of the watcher thread and of activate_version, so a slower switch
+# cannot replace the version a later one installed
+_refresh_lock = threading.Lock()
+_leases = Counter()
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _refresh():
+    """Switch this process to the version named in active.json, warming it up first"""
+    global _current
+    with _refresh_lock:
+        active = read_active()
+        name = active["version"] if active else None
+        if name == (_current.name if _current else None):
+            return _current
+        version = None
+        if name:
+            version = IndexVersion(name)
+            version.warm()
+        with _current_lock:
+            _current = version
+    logger.info(f"Knowledge base index version switched to {name}")
+    return version
+
+
+def _watch():
+    while True:
+        time.sleep(config.INDEX_POLL_SECONDS)
+        try:
+            _refresh()
+        except Exception as e:
+            # keep serving the current version, the next poll retries
+            logger.error(f"Could not switch knowledge base index version: {e}")
+
+
+def current_version():
+    """Return the version this process serves, starting the active.json watcher on first use"""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _refresh()
+                _watcher = threading.Thread(target=_watch, name="index-version-watcher", daemon=True)
+                _watcher.start()
+    return _current
+
+
+def preload():
+    """
+    Load and warm the active version without starting the active.json watcher.
+
+    serve.py calls it before forking the workers so they share the loaded indexes copy-on-write,
+    each worker then starts its own watcher on first use. Chroma clients must not cross a fork, so
+    for Chroma versions nothing is loaded and False is returned.
+    """
+    global _current
+    active = read_active()
+    if not active:
+        return False
+    version = IndexVersion(active["version"])
+    if version.backend != "memory":
+        return False
+    version.warm()
+    with _current_lock:
+        _current = version
+    return True
+
+
+def _legacy_collection(collection_name):
+    """The legacy collection and the size of its embeddings"""
+    if config.VECTOR_BACKEND == "memory":
+        from vector_index import get_vector_index
+        index = get_vector_index(collection_name)
+        return index, index.dimensions
+    import chromadb
+    client = chromadb.PersistentClient(path=config.CHROMA_DB_PATH)
+    collection = client.get_collection(name=collection_name)
+    return collection, (collection.metadata or {}).get("dimensions", config.EMBEDDING_DIM)
+
+
+@contextmanager
+def open_collection(collection_name):
+    """
+    Lease a knowledge base collection of the active version for the duration of one query.
+
+    The collection is a Chroma collection or a vector_index.VectorIndex, depending on the
+    backend the version was built with. A version switch during the query does not affect it.
+
+    Yields:
+        tuple: (collection, dimensions), query embeddings must be requested with `dimensions`
+    """
+    version = current_version()
+    if version is None:
+        yield _legacy_collection(collection_name)
+        return
+    with _current_lock:
+        _leases[version.name] += 1
+    try:
+        yield version.collection(collection_name), version.dimensions
+    finally:
+        with _current_lock:
+            _leases[version.name] -= 1
+
+
+def new_version_name():
+    return datetime.now(timezone.utc).strftime("v%Y%m%dT%H%M%S%fZ")
+
+
+def smoke_test(version, records_by_exam):
+    """
+    Check that every collection of a built version answers queries.
+
+    A few records of each exam, spread over the collection, are looked up with their own
+    embedding and with their own leading words through BM25; each must come back in the top
+    results. The leading words of one record are also embedded the way live queries are, at the
+    version's dimensions, and must be answered.
+
+    Returns:
+        dict: {exam: {"count", "vector_hit_rate", "lexical_hit_rate", "text_query_hit"}}
+
+    Raises:
+        RuntimeError: When a collection is incomplete, misses too many smoke queries or cannot
+            answer a text query
+    """
+    from embeddings import get_embeddings
+    from lexical_index import BM25Index
+    from rate_limiter import background
+    report = {}
+    for exam_name, records in records_by_exam.items():
+        collection = version.collection(exam_name)
+        count = collection.count()
+        if count != len(records):
+            raise RuntimeError(f"{exam_name}: {count} records indexed, expected {len(records)}")
+        if not records:
+            report[exam_name] = {"count": 0, "vector_hit_rate": 1.0, "lexical_hit_rate": 1.0}
+            continue
+        step = max(1, len(records) // SMOKE_SAMPLES)
+        samples = records[::step][:SMOKE_SAMPLES]
+        results = collection.query(query_embeddings=[record["embedding"] for record in samples],
+                                   n_results=config.KB_TOP_K)
+        vector_hits = sum(record["id"] in ids for record, ids in zip(samples, results["ids"]))
+        lexical_index = BM25Index.from_collection(collection)
+        lexical_hits = 0
+        for record in samples:
+            query = " ".join(record["document"].split()[:12])
+            hits = lexical_index.search(query, k=config.KB_TOP_K)
+            lexical_hits += any(lexical_index.ids[doc_index] == record["id"] for doc_index, _, _ in hits)
+        with background():
+            text_embedding = get_embeddings(" ".join(samples[0]["document"].split()[:12]),
+                                            dimensions=version.dimensions)
+        if not text_embedding:
+            raise RuntimeError(f"{exam_name}: could not embed the smoke text query")
+        text_results = collection.query(query_embeddings=[text_embedding], n_results=config.KB_TOP_K)
+        if not text_results["ids"][0]:
+            raise RuntimeError(f"{exam_name}: the smoke text query found nothing")
+        report[exam_name] = {"count": count, "vector_hit_rate": vector_hits / len(samples),
+                             "lexical_hit_rate": lexical_hits / len(samples),
+                             "text_query_hit": samples[0]["id"] in text_results["ids"][0]}
+        if min(report[exam_name]["vector_hit_rate"], report[exam_name]["lexical_hit_rate"]) < SMOKE_MIN_HIT_RATE:
+            raise RuntimeError(f"{exam_name}: smoke queries failed {report[exam_name]}")
+    return report
+
+
+@contextmanager
+def _build_lock(root):
+    """Allow a single build at a time across worker processes"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "build.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("Another index build is already running")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build_version(exams=None, backend=None, granularity=None, dimensions=None, dtype=None,
+                  activate=True, root=None, progress=None):
+    """
+    Build, validate and optionally activate a new index version.
+
+    Args:
+        exams (list[str] | None): Exam collections to build, all by default
+        backend (str | None): "chroma" or "memory", config.VECTOR_BACKEND by default
+        granularity (str | None): "chunk" or "page", config.INDEX_GRANULARITY by default
+        dimensions (int | None): Embedding size, config.EMBEDDING_DIM by default
+        dtype (str | None): Vector dtype of the memory backend, config.VECTOR_DTYPE by default
+        activate (bool): Switch to the new version once it passed the smoke queries
+        root (str | None): Versions directory
+        progress (callable | None): Called with a status message after each step
+
+    Returns:
+        dict: Manifest of the new version
+    """
+    from build_index import build_records, embed_records, index_exam
+    from corpus import EXAM_DOCUMENTS
+    from vector_index import VectorIndex
+
+    root = _root(root)
+    exams = exams or list(EXAM_DOCUMENTS)
+    backend = backend or config.VECTOR_BACKEND
+    granularity = granularity or config.INDEX_GRANULARITY
+    dimensions = dimensions or config.EMBEDDING_DIM
+    dtype = dtype or config.VECTOR_DTYPE
+    progress = progress or (lambda message: logger.info(message))
+
+    with _build_lock(root):
+        name = new_version_name()
+        build_path = os.path.join(root, f"{name}.building")
+        os.makedirs(build_path)
+        try:
+            client = None
+            if backend == "chroma":
+                import chromadb
+                client = chromadb.PersistentClient(path=os.path.join(build_path, "chroma"))
+            records_by_exam = {}
+            for exam_name in exams:
+                start = time.perf_counter()
+                records = embed_records(build_records(exam_name, granularity), dimensions)
+                if client is not None:
+                    index_exam(client, exam_name, records, granularity)
+                else:
+                    VectorIndex.from_records(exam_name, records, dimensions, dtype).save(
+                        os.path.join(build_path, "vector_index", exam_name))
+                records_by_exam[exam_name] = records
+                progress(f"{name}: indexed {len(records)} {exam_name} records in {time.perf_counter() - start:.1f}s")
+
+            manifest = {
+                "version": name,
+                "backend": backend,
+                "granularity": granularity,
+                "dimensions": dimensions,
+                "dtype": dtype if backend == "memory" else "float32",
+                "collections": {exam_name: len(records) for exam_name, records in records_by_exam.items()},
+                "created_at": time.time(),
+            }
+            _write_json_atomic(os.path.join(build_path, MANIFEST_FILE), manifest)
+            manifest["smoke_test"] = smoke_test(IndexVersion(f"{name}.building", root), records_by_exam)
+            _write_json_atomic(os.path.join(build_path, MANIFEST_FILE), manifest)
+            progress(f"{name}: smoke queries passed")
+            os.rename(build_path, os.path.join(root, name))
+        except Exception:
+            shutil.rmtree(build_path, ignore_errors=True)
+            raise
+
+    if activate:
+        activate_version(name, root)
+        progress(f"{name}: activated")
+        collect_garbage(root)
+    return manifest
+
+
+def activate_version(name, root=None):
+    """Make `name` the active version of every worker by atomically replacing active.json"""
+    root = _root(root)
+    if not os.path.exists(os.path.join(root, name, MANIFEST_FILE)):
+        raise ValueError(f"Unknown index version '{name}'")
+    active = read_active(root) or {"history": []}
+    now = time.time()
+    history = active.get("history", []) + [{"version": name, "activated_at": now}]
+    _write_json_atomic(os.path.join(root, ACTIVE_FILE),
+                       {"version": name, "activated_at": now, "history": history[-50:]})
+    # switch this process right away, the others follow on their next poll
+    if root == config.INDEX_VERSIONS_PATH and _watcher is not None:
+        _refresh()
+
+
+def collect_garbage(root=None, keep=None, grace_seconds=None):
+    """
+    Delete old versions and abandoned builds.
+
+    The active version and the `keep` most recent versions are kept. Other versions are
+    deleted once they have been inactive for `grace_seconds`, so queries of workers that had
+    not switched yet can finish, and unless a query of this process still uses them.
+
+    Returns:
+        list[str]: Deleted directory names
+    """
+    root = _root(root)
+    keep = config.INDEX_KEEP_VERSIONS if keep is None else keep
+    grace_seconds = config.INDEX_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    active = read_active(root)
+    if not active or not os.path.isdir(root):
+        return []
+
+    now = time.time()
+    # a version stopped serving when the next activation happened
+    deactivated_at = {}
+    history = active.get("history", [])
+    for entry, following in zip(history, history[1:]):
+        deactivated_at[entry["version"]] = following["activated_at"]
+
+    versions = [manifest["version"] for manifest in list_versions(root)]
+    kept = set(versions[-keep:]) | {active["version"]}
+    deleted = []
+    for name in versions:
+        if name in kept or _leases[name] > 0:
+            continue
+        if now - deactivated_at.get(name, 0) < grace_seconds:
+            continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        deleted.append(name)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.endswith(".building") and now - os.path.getmtime(path) > grace_seconds:
+            try:
+                with _build_lock(root):
+                    shutil.rmtree(path, ignore_errors=True)
+                    deleted.append(name)
+            except RuntimeError:
+                pass
+    for name in deleted:
+        logger.info(f"Deleted knowledge base index version {name}")
+    return deleted
+
+
+_build_state = {"running": False, "version": None, "error": None, "log": []}
+_build_state_lock = threading.Lock()
+
+
+def start_background_build(**kwargs):
+    """
+    Run build_version in a background thread.
+
+    Returns:
+        bool: False when a build started from this process is still running
+    """
+    with _build_state_lock:
+        if _build_state["running"]:
+            return False
+        _build_state.update(running=True, version=None, error=None, log=[])
+
+    def progress(message):
+        logger.info(message)
+        with _build_state_lock:
+            _build_state["log"].append(message)
+
+    def run():
+        try:
+            manifest = build_version(progress=progress, **kwargs)
+            with _build_state_lock:
+                _build_state["version"] = manifest["version"]
+        except Exception as e:
+            logger.error(f"Index build failed: {e}")
+            with _build_state_lock:
+                _build_state["error"] = str(e)
+        finally:
+            with _build_state_lock:
+                _build_state["running"] = False
+
+    threading.Thread(target=run, name="index-build", daemon=True).start()
+    return True
+
+
+def status():
+    """Active version, the version this process serves, available versions and the last background build"""
+    with _build_state_lock:
+        build = dict(_build_state, log=list(_build_state["log"]))
+    return {
+        "active": read_active(),
+        "serving": _current.name if _current else None,
+        "versions": list_versions(),
+        "build": build,
+    }
+
+
+def main():
+    from corpus import EXAM_DOCUMENTS
+    from vector_index import SUPPORTED_DTYPES
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build, validate and activate a new version")
+    build.add_argument("--exam", nargs="+", choices=list(EXAM_DOCUMENTS), default=list(EXAM_DOCUMENTS))
+    build.add_argument("--backend", choices=["chroma", "memory"], default=config.VECTOR_BACKEND)
+    build.add_argument("--granularity", choices=["chunk", "page"], default=config.INDEX_GRANULARITY)
+    build.add_argument("--dimensions", type=int, default=config.EMBEDDING_DIM)
+    build.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=config.VECTOR_DTYPE)
+    build.add_argument("--no-activate", action="store_true")
+    commands.add_parser("list", help="list versions")
+    activate = commands.add_parser("activate", help="switch to (or roll back to) a version")
+    activate.add_argument("version")
+    commands.add_parser("gc", help="delete old versions")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_version(args.exam, args.backend, args.granularity, args.dimensions, args.dtype,
+                                 activate=not args.no_activate, progress=print)
+        print(json.dumps(manifest, indent=2))
+    elif args.command == "list":
+        active = read_active()
+        for manifest in list_versions():
+            marker = "*" if active and active["version"] == manifest["version"] else " "
+            print(f"{marker} {manifest['version']}  {manifest['backend']:<6} {manifest['granularity']:<5} "
+                  f"{manifest['dimensions']:>4} dims  {manifest['collections']}")
+    elif args.command == "activate":
+        activate_version(args.version)
+        print(f"{args.version} activated")
+    elif args.command == "gc":
+        print("deleted:", collect_garbage() or "nothing")
+
+
+if __name__ == "__main__":
+    main()
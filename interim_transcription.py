@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from configs import config
+
+logger = logging.getLogger(__name__)
+
+
+def _prefix_hash(audio, size):
+    return hashlib.sha1(memoryview(audio)[:size]).hexdigest()
+
+
+class _ClientState:
+    def __init__(self, language):
+        self.language = language
+        self.recognized_size = 0
+        self.recognized_hash = None
+        self.result = {'success': True, 'transcript': '', 'confidence': 0.0, 'is_final': False}
+        self.in_flight = None
+        self.in_flight_size = 0
+        self.in_flight_hash = None
+        self.pending = None
+        self.last_seen = time.monotonic()
+
+
+class InterimTranscriptionManager:
+    """
+    De-duplicates and throttles the interim `/transcribe` calls of each client.
+
+    While recording without the WebSocket, the browser re-sends the whole recording so far
+    every second. Each client's last recognized audio is remembered by the hash of its prefix:
+      - audio that extends the last recognition by less than INTERIM_MIN_GROWTH_BYTES gets the
+        cached transcript back without calling the API
+      - at most one recognition runs per client; a request extending its audio supersedes any
+        earlier waiting audio, gets the cached transcript immediately, and its audio is
+        recognized once the running call finishes
+      - audio that extends neither the last recognition nor the running one starts a new
+        utterance right away, the previous utterance's running call is left to finish
+      - a failed recognition returns its error result and keeps the cached transcript as it was
+    All state lives on the event loop, so no locking is needed.
+    """
+
+    def __init__(self, recognize, min_growth_bytes=None, max_clients=None, idle_seconds=None):
+        """
+        Args:
+            recognize: Async callable (audio bytes, language code) -> transcription result dict
+            min_growth_bytes (int | None): Audio growth that warrants a new recognition
+            max_clients (int | None): Clients tracked at once, least recently seen are dropped
+            idle_seconds (float | None): Clients idle this long are dropped
+        """
+        self.recognize = recognize
+        self.min_growth_bytes = min_growth_bytes or config.INTERIM_MIN_GROWTH_BYTES
+        self.max_clients = max_clients or config.INTERIM_MAX_CLIENTS
+        self.idle_seconds = idle_seconds or config.INTERIM_IDLE_SECONDS
+        self.clients = OrderedDict()
+        self.stats = {'recognized': 0, 'failed': 0, 'unchanged': 0, 'superseded': 0}
+
+    def _client(self, client_id, language):
+        now = time.monotonic()
+        while self.clients:
+            oldest_id, oldest = next(iter(self.clients.items()))
+            if len(self.clients) < self.max_clients and now - oldest.last_seen < self.idle_seconds:
+                break
+            # a running recognition may be awaited by a request: detach it and let it finish
+            oldest.pending = None
+            del self.clients[oldest_id]
+
+        state = self.clients.get(client_id)
+        if state is None or state.language != language:
+            state = self.clients[client_id] = _ClientState(language)
+        self.clients.move_to_end(client_id)
+        state.last_seen = now
+        return state
+
+    def _cached(self, state, status):
+        self.stats[status] += 1
+        return dict(state.result), status
+
+    async def transcribe(self, client_id, audio, language):
+        """
+        Interim transcript for the recording a client has sent so far.
+
+        Args:
+            client_id (str): Identifies one recording session
+            audio (bytes): The whole recording so far
+            language (str): Language code for transcription
+
+        Returns:
+            tuple[dict, str]: Transcription result and how it was obtained:
+                'recognized', 'failed' (the recognition's error result), 'unchanged' (too little
+                new audio) or 'superseded' (cached while another recognition for this client
+                is running)
+        """
+        state = self._client(client_id, language)
+        continues = (state.recognized_hash is not None and len(audio) >= state.recognized_size
+                     and _prefix_hash(audio, state.recognized_size) == state.recognized_hash)
+        if continues and len(audio) - state.recognized_size < self.min_growth_bytes:
+            return self._cached(state, 'unchanged')
+        running = state.in_flight is not None and not state.in_flight.done()
+        extends_running = (running and len(audio) >= state.in_flight_size
+                           and _prefix_hash(audio, state.in_flight_size) == state.in_flight_hash)
+        if not continues and not extends_running and (state.recognized_hash is not None or running):
+            # the audio extends neither what we recognized nor what is being recognized: a new
+            # utterance. A running call of the previous one finishes on its own, detached state
+            state.pending = None
+            self.clients[client_id] = state = _ClientState(language)
+            running = False
+
+        if running:
+            if extends_running and len(audio) - state.in_flight_size >= self.min_growth_bytes:
+                state.pending = audio
+            return self._cached(state, 'superseded')
+
+        task = self._start(state, audio)
+        # a disconnecting caller must not cancel the recognition other requests rely on
+        result = await asyncio.shield(task)
+        if not result.get('success'):
+            self.stats['failed'] += 1
+            return dict(result), 'failed'
+        self.stats['recognized'] += 1
+        return dict(state.result), 'recognized'
+
+    def _start(self, state, audio):
+        state.in_flight = asyncio.create_task(self._recognize(state, audio))
+        state.in_flight_size = len(audio)
+        state.in_flight_hash = _prefix_hash(audio, len(audio))
+        return state.in_flight
+
+    async def _recognize(self, state, audio):
+        try:
+            result = await self.recognize(audio, state.language)
+            if result.get('success'):
+                state.result = result
+                state.recognized_size = len(audio)
+                state.recognized_hash = state.in_flight_hash
+            return result
+        finally:
+            state.in_flight = None
+            pending, state.pending = state.pending, None
+            if pending is not None and len(pending) - state.recognized_size >= self.min_growth_bytes:
+                # trailing edge of a burst: recognize the newest audio in the background
+                self._start(state, pending).add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Background interim transcription failed: {task.exception()}")
+
+    def forget(self, client_id):
+        """
+        Drop a client's state, e.g. once its final transcription arrived.
+
+        A running recognition is not cancelled, an interim request may still be awaiting it; it
+        finishes on the detached state and starts no follow-up.
+        """
+        state = self.clients.pop(client_id, None)
+        if state:
+            state.pending = None
+
+    def snapshot(self):
+        return {'clients': len(self.clients), **self.stats}
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import span
+from rate_limiter import background
+
+logger = logging.getLogger(__name__)
+
+
+def singleton(factory):
+    """
+    Decorator for the getter of a heavy process wide object (LLM clients, crews, the speech client).
+
+    The factory runs on the first call, once even when several threads ask at the same time, and
+    every later call returns the same object. A factory that raises is retried on the next call.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def getter():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    getter.loaded = lambda: bool(instance)
+    return getter
+
+
+async def load_async(getter):
+    """Call a singleton getter without blocking the event loop while it is still being built"""
+    if getter.loaded():
+        return getter()
+    return await asyncio.to_thread(getter)
+
+
+class Warmup:
+    """
+    Loads and primes the heavy subsystems in a background thread, so the server answers health
+    checks right away while the first chat request still finds everything ready.
+
+    stages is a list of lists of (name, function): stages run in order and the steps of one
+    stage run concurrently. A step that fails is logged and left to be retried on first use,
+    except the `required` ones, without which the instance cannot serve: those are retried every
+    retry_seconds, and the instance is not ready while one of them is failed. Steps run as
+    background work for the upstream rate limiters, so requests are served first.
+    """
+
+    def __init__(self, stages, timeout=None, required=(), retry_seconds=15):
+        self.stages = [list(stage) for stage in stages]
+        self.timeout = timeout
+        self.required = set(required)
+        self.retry_seconds = retry_seconds
+        self.state = {name: "pending" for stage in self.stages for name, _ in stage}
+        self.seconds = {}
+        self.started_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self.started_at = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+                self._thread.start()
+
+    def _step(self, name, step):
+        # a step being retried stays failed until it succeeds
+        if self.state[name] == "pending":
+            self.state[name] = "loading"
+        start = time.perf_counter()
+        try:
+            with background(), span(f"warmup_{name}"):
+                step()
+            self.state[name] = "ready"
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {str(e)}")
+            self.state[name] = "failed"
+        self.seconds[name] = round(time.perf_counter() - start, 3)
+
+    def _run(self):
+        for stage in self.stages:
+            if len(stage) == 1:
+                self._step(*stage[0])
+                continue
+            with ThreadPoolExecutor(max_workers=len(stage), thread_name_prefix="warmup") as executor:
+                for name, step in stage:
+                    executor.submit(self._step, name, step)
+        logger.info(f"Warm-up finished: {self.snapshot()}")
+        while failed := [(name, step) for stage in self.stages for name, step in stage
+                         if name in self.required and self.state[name] == "failed"]:
+            time.sleep(self.retry_seconds)
+            for name, step in failed:
+                self._step(name, step)
+            if all(self.state[name] == "ready" for name, _ in failed):
+                logger.info(f"Warm-up recovered: {self.snapshot()}")
+
+    def done(self):
+        return all(state in ("ready", "failed") for state in self.state.values())
+
+    def failed(self, required=True):
+        """Names of the failed required steps, or of the failed optional ones"""
+        return sorted(name for name, state in self.state.items()
+                      if state == "failed" and (name in self.required) == required)
+
+    def ready(self):
+        """
+        Whether to take traffic: no required step failed, and the warm-up finished or has been
+        running for longer than timeout
+        """
+        if self.failed():
+            return False
+        if self.done():
+            return True
+        return (self.started_at is not None and self.timeout is not None
+                and time.monotonic() - self.started_at > self.timeout)
+
+    def snapshot(self):
+        return {"steps": dict(self.state), "seconds": dict(self.seconds), "done": self.done(),
+                "failed": self.failed(), "degraded": self.failed(required=False),
+                "elapsed": round(time.monotonic() - self.started_at, 3) if self.started_at else None}
@@ -0,0 +1,176 @@
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+
+from configs import config
+from context_packer import tokenize
+from metrics import register_callback
+
+
+class BM25Index:
+    """In-memory inverted index over the documents of one knowledge base collection"""
+
+    def __init__(self, ids, documents, metadatas, k1=1.2, b=0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_index, document in enumerate(self.documents):
+            tokens = tokenize(document or "")
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((doc_index, tf))
+        n = len(self.documents)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 1.0
+        self.idf = {term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for term, postings in self.postings.items()}
+
+    @classmethod
+    def from_collection(cls, collection):
+        """Build the index from every document stored in a Chroma collection"""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+    def search(self, query, k=10):
+        """
+        Rank documents for the query with BM25.
+
+        Args:
+            query (str): Search query
+            k (int): Number of hits to return
+
+        Returns:
+            list[tuple[int, float, float]]: (document index, score, share of query terms matched)
+        """
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_index, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_length)
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_index] += 1
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(doc_index, score, matched[doc_index] / len(terms)) for doc_index, score in top]
+
+    def is_confident(self, query, hits, min_score=None, max_terms=None):
+        """
+        Decide whether lexical hits are good enough to answer without the vector search.
+
+        Only keyword style queries of at most `max_terms` terms qualify (e.g. "NAV",
+        "ELSS lock-in", "Regulation 15"); every one of the top `config.KB_TOP_K` hits must
+        contain all query terms and the best hit must score at least `min_score`.
+        """
+        min_score = config.LEXICAL_FAST_PATH_MIN_SCORE if min_score is None else min_score
+        max_terms = config.LEXICAL_FAST_PATH_MAX_TERMS if max_terms is None else max_terms
+        n_terms = len(set(tokenize(query)))
+        if not hits or n_terms == 0 or n_terms > max_terms:
+            return False
+        top_hits = hits[:config.KB_TOP_K]
+        return hits[0][1] >= min_score and all(coverage == 1.0 for _, _, coverage in top_hits)
+
+    def to_results(self, hits):
+        """Format hits like a Chroma query result; the distance is the negated score"""
+        return {
+            "ids": [[self.ids[doc_index] for doc_index, _, _ in hits]],
+            "documents": [[self.documents[doc_index] for doc_index, _, _ in hits]],
+            "metadatas": [[self.metadatas[doc_index] for doc_index, _, _ in hits]],
+            "distances": [[-score for _, score, _ in hits]],
+        }
+
+
+def reciprocal_rank_fusion(result_sets, k=60, n_results=5):
+    """
+    Fuse ranked Chroma-style results with reciprocal rank fusion.
+
+    Args:
+        result_sets (list[dict]): Query results with ids, documents, metadatas and distances
+        k (int): RRF damping constant
+        n_results (int): Number of fused hits to return
+
+    Returns:
+        dict: Chroma-style result whose distances are the negated fused scores
+    """
+    scores = defaultdict(float)
+    entries = {}
+    for results in result_sets:
+        if not results or not results["ids"] or not results["ids"][0]:
+            continue
+        for rank, doc_id in enumerate(results["ids"][0]):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+            if doc_id not in entries:
+                entries[doc_id] = (results["documents"][0][rank], results["metadatas"][0][rank])
+    fused = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+    return {
+        "ids": [[doc_id for doc_id, _ in fused]],
+        "documents": [[entries[doc_id][0] for doc_id, _ in fused]],
+        "metadatas": [[entries[doc_id][1] for doc_id, _ in fused]],
+        "distances": [[-score for _, score in fused]],
+    }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+# Builds kept per collection name: the live one and the one queries may still use during an index switch
+_BUILDS_PER_COLLECTION = 2
+
+
+def get_lexical_index(collection):
+    """Return the cached BM25 index of a collection, building it on first use or after a rebuild"""
+    key = (collection.name, str(collection.id))
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = BM25Index.from_collection(collection)
+                old_keys = [old for old in _indexes if old[0] == collection.name]
+                for old_key in old_keys[:max(0, len(old_keys) - _BUILDS_PER_COLLECTION + 1)]:
+                    del _indexes[old_key]
+                _indexes[key] = index
+    return index
+
+
+class SearchStats:
+    """Counts how often the lexical fast path answers a query and the latency of each path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.fast_path = 0
+        self.fast_path_seconds = 0.0
+        self.hybrid_seconds = 0.0
+
+    def record(self, fast_path, seconds):
+        with self._lock:
+            self.queries += 1
+            if fast_path:
+                self.fast_path += 1
+                self.fast_path_seconds += seconds
+            else:
+                self.hybrid_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            hybrid = self.queries - self.fast_path
+            return {
+                "queries": self.queries,
+                "fast_path": self.fast_path,
+                "fast_path_rate": self.fast_path / self.queries if self.queries else 0.0,
+                "fast_path_avg_ms": 1000 * self.fast_path_seconds / self.fast_path if self.fast_path else 0.0,
+                "hybrid_avg_ms": 1000 * self.hybrid_seconds / hybrid if hybrid else 0.0,
+            }
+
+
+search_stats = SearchStats()
+register_callback("sebi_kb_searches_total", "Knowledge base searches by path",
+                  lambda: {("fast_path",): search_stats.fast_path,
+                           ("hybrid",): search_stats.queries - search_stats.fast_path},
+                  ["path"], kind="counter")
@@ -1,22 +1,38 @@
 import os
-from langchain_openai import AzureChatOpenAI
-from crewai import LLM
 from configs import config
+from lazy import singleton
 
+# The clients are created on first use (or by the startup warm-up), importing langchain_openai and
+# crewai alone takes seconds
 
-azure_llm = AzureChatOpenAI(
+
+@singleton
+def get_azure_llm():
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
        api_version= config.AZURE_API_VERSION,
        api_key= config.AZURE_API_KEY,
        azure_endpoint= config.AZURE_ENDPOINT,
        azure_deployment= config.DEPLOYMENT_NAME, temperature= 0
    )
 
-llm = LLM(
-    model=f"azure/{config.DEPLOYMENT_NAME}",
-    api_version=config.AZURE_API_VERSION, temperature=0
-)
 
-llm_stream = LLM(
-    model=f"azure/{config.DEPLOYMENT_NAME}",
-    api_version=config.AZURE_API_VERSION,temperature=0, stream= True
-)
\ No newline at end of file
+@singleton
+def get_llm():
+    from crewai import LLM
+
+    return LLM(
+        model=f"azure/{config.DEPLOYMENT_NAME}",
+        api_version=config.AZURE_API_VERSION, temperature=0
+    )
+
+
+@singleton
+def get_llm_stream():
+    from crewai import LLM
+
+    return LLM(
+        model=f"azure/{config.DEPLOYMENT_NAME}",
+        api_version=config.AZURE_API_VERSION,temperature=0, stream= True
+    )
@@ -0,0 +1,198 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a cached lookup up to a multi-agent crew run
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 120, 160, 240, 320)
+
+_families = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, observing costs one lock and one bisect"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class CallbackMetric:
+    """
+    A value read from existing stats objects at scrape time, so the hot path pays nothing.
+
+    The callback returns a number, or a dict mapping label value tuples to numbers.
+    """
+
+    def __init__(self, name, help_text, callback, labelnames=(), kind="gauge"):
+        self.name, self.help, self.labelnames, self.kind = name, help_text, tuple(labelnames), kind
+        self.callbacks = [callback]
+
+    def samples(self):
+        for callback in self.callbacks:
+            values = callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for labels, value in sorted(values.items()):
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _families.get(metric.name)
+        if existing is None:
+            _families[metric.name] = metric
+            return metric
+        if isinstance(existing, CallbackMetric) and isinstance(metric, CallbackMetric):
+            # several sources (e.g. caches) can feed one family
+            existing.callbacks.extend(metric.callbacks)
+        return existing
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help_text, labelnames, buckets))
+
+
+def counter(name, help_text, labelnames=()):
+    return _register(Counter(name, help_text, labelnames))
+
+
+def register_callback(name, help_text, callback, labelnames=(), kind="gauge"):
+    """Expose a value computed at scrape time, see CallbackMetric"""
+    return _register(CallbackMetric(name, help_text, callback, labelnames, kind))
+
+
+def register_cache(cache_name, callback):
+    """Expose hit and miss counts of a cache; callback returns (hits, misses)"""
+    register_callback("sebi_cache_hits_total", "Cache hits", lambda: {(cache_name,): callback()[0]},
+                      ["cache"], kind="counter")
+    register_callback("sebi_cache_misses_total", "Cache misses", lambda: {(cache_name,): callback()[1]},
+                      ["cache"], kind="counter")
+
+
+STAGE_SECONDS = histogram("sebi_stage_seconds", "Time spent in each stage of a request", ["stage"])
+STAGE_ERRORS = counter("sebi_stage_errors_total", "Stages that ended with an exception", ["stage"])
+TOOL_SECONDS = histogram("sebi_tool_seconds", "Duration of agent tool calls", ["tool"])
+LLM_TTFT_SECONDS = histogram("sebi_llm_ttft_seconds", "Time to the first streamed token", ["phase"])
+LLM_TOKENS_PER_SECOND = histogram("sebi_llm_tokens_per_second", "Output tokens per second of streamed LLM calls",
+                                  ["phase"], buckets=TOKEN_RATE_BUCKETS)
+
+
+@contextmanager
+def span(stage, metric=STAGE_SECONDS):
+    """Time a block into sebi_stage_seconds{stage=...} (or another histogram), exceptions are counted and re-raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        metric.observe(time.perf_counter() - start, stage)
+
+
+def timed(stage):
+    """Decorator form of span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StreamTimer:
+    """Records time to first token and output token rate of one streamed LLM call"""
+
+    def __init__(self, phase, start=None):
+        self.phase = phase
+        self.start = start or time.perf_counter()
+        self.first_token_at = None
+        self.tokens = 0
+        self.total_tokens = 0
+
+    def chunk(self, chunk):
+        if chunk.content and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            LLM_TTFT_SECONDS.observe(self.first_token_at - self.start, self.phase)
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            self.tokens += usage.get("output_tokens", 0)
+            self.total_tokens += usage.get("total_tokens", 0)
+
+    def finish(self):
+        if self.first_token_at is None or not self.tokens:
+            return
+        elapsed = time.perf_counter() - self.first_token_at
+        if elapsed > 0:
+            LLM_TOKENS_PER_SECOND.observe(self.tokens / elapsed, self.phase)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        families = list(_families.values())
+    lines = []
+    for metric in families:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -2,18 +2,38 @@ from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, System
 from langchain_core.tools import tool
 import requests
 import json, asyncio, time
-import pandas as pd
+from functools import lru_cache
 from typing import Optional, Dict, Any, List, Union
 from custom_tools import get_web_search_result, calculator
-from agents import ai_tutor_tool, exam_guide_crew
-from llm_models import azure_llm
+from agents import ai_tutor_tool, ai_tutor_pool, exam_guide_pool
+from crew_pool import CrewPoolBusy
+from rate_limiter import RateLimited, azure_openai_limiter
+from context_packer import estimate_tokens
+from llm_models import get_azure_llm
+from lazy import singleton
+from shared_cache import SharedCache
+import index_versions
+from single_flight import SingleFlight, normalize_text
 from configs import config
-from crewai.utilities.events.llm_events import LLMStreamChunkEvent
-from crewai.utilities.events.base_event_listener import BaseEventListener
+import request_context
+from translator import StreamingTranslator, translate_markdown_async
+from metrics import span, StreamTimer, LLM_TTFT_SECONDS, STAGE_SECONDS, TOOL_SECONDS
 
 
 tools = [get_web_search_result, ai_tutor_tool, calculator]
-llm_with_tools = azure_llm.bind_tools(tools)
+
+# Explanations of mock exam questions per language, shared by the workers
+explanation_cache = SharedCache("explanations", ttl_seconds=config.EXPLANATION_CACHE_TTL_SECONDS)
+
+# Identical concurrent chat turns and explanations (a class asking the same first question or
+# explaining the same mock exam question) share one run whose events go to every request
+chat_flights = SingleFlight("chat")
+explanation_flights = SingleFlight("explanation")
+
+
+@singleton
+def get_llm_with_tools():
+    return get_azure_llm().bind_tools(tools)
 
 
 def convert_to_langchain_messages(messages_raw: List[Dict]) -> List[Union[SystemMessage, HumanMessage, AIMessage]]:
@@ -54,22 +74,57 @@ def convert_to_langchain_messages(messages_raw: List[Dict]) -> List[Union[System
     return messages_cleaned
 
 
-async def orchestrator_agent(messages):
+def llm_call_tokens(messages):
+    """Tokens to charge an LLM call before its usage is known: the prompt and a typical completion"""
+    return estimate_tokens("".join(str(message.content) for message in messages)) + config.LLM_OUTPUT_TOKENS_ESTIMATE
+
+
+def translate_to_user_language():
+    """Whether answers are generated in English and translated, instead of generated in the user's language"""
+    return config.GENERATE_IN_ENGLISH and request_context.user_language.get() not in ("", "English")
+
+
+def orchestrator_agent(messages):
     """
-    Process messages through LLM with tools and yield streaming responses
+    Process messages through LLM with tools and yield streaming responses.
+
+    Concurrent requests with the same conversation, exam and language share one run. The exam and
+    language are those of the request_context.
     """
+    key = SharedCache.key([(message.get('role'), normalize_text(message.get('content', ''))) for message in messages],
+                          request_context.exam_name.get(), request_context.user_language.get(),
+                          translate_to_user_language())
+    return chat_flights.stream(key, _orchestrator_agent, messages)
+
+
+async def _orchestrator_agent(messages):
+    request_start = time.perf_counter()
+    response_started = False
+    user_language = request_context.user_language.get()
+    # filled by the knowledge base searches of this run's tools
+    sources = request_context.collect_sources()
+    # In generate-in-English mode the answer is translated sentence by sentence while it streams
+    stream_translator = StreamingTranslator(user_language) if translate_to_user_language() else None
+    response_language = "English" if stream_translator else user_language
     chat_history = messages.copy()
     chat_history = [{"role": "system",
                     "content": f"""You are an experienced AI Tutor helping Users prepare for their SEBI Certification Exams.\
-                        Always repond in {config.user_language} Language irrespective of the language of the user query.\
+                        Always repond in {response_language} Language irrespective of the language of the user query.\
                             Maintain a postive tone always. follow all information and instructions received from tools.\
                     IMPORTANT: If there are any questions which are not related to SEBI or SEBI certification exam topics then let user know that you can not answer this."""}] + chat_history
     chat_history = convert_to_langchain_messages(chat_history)
     chunks = []
+    final_lease = None
     try:
-        # Collect all chunks first
-        for chunk in llm_with_tools.stream(chat_history):
-            chunks.append(chunk)
+        # Collect all chunks first, once the Azure OpenAI limiter admits the call
+        first_pass = StreamTimer("first_pass")
+        with await azure_openai_limiter.acquire_async(tokens=llm_call_tokens(chat_history)) as lease, \
+                span("llm_first_pass"):
+            for chunk in get_llm_with_tools().stream(chat_history, stream_usage=True):
+                first_pass.chunk(chunk)
+                chunks.append(chunk)
+            lease.release(used_tokens=first_pass.total_tokens or None)
+        first_pass.finish()
         
         # Process chunks and handle tool calls
         if chunks:
@@ -95,7 +150,9 @@ async def orchestrator_agent(messages):
                             }
                             yield f"data: {json.dumps(tool_data)}\n\n"
                             await asyncio.sleep(0.01)
-                            result = get_web_search_result.invoke(tool_call['args'])
+                            # the search, the page fetches and the Serper limiter's wait all block, keep them off the event loop
+                            with span(tool_name, metric=TOOL_SECONDS):
+                                result = await asyncio.to_thread(get_web_search_result.invoke, tool_call['args'])
                             tool_message = ToolMessage(
                                 content=result,
                                 tool_call_id=tool_call['id'],
@@ -111,7 +168,9 @@ async def orchestrator_agent(messages):
                             }
                             yield f"data: {json.dumps(tool_data)}\n\n"
                             await asyncio.sleep(0.01)
-                            result = ai_tutor_tool.invoke(tool_call['args'])
+                            # the crew runs for tens of seconds, keep it off the event loop on a crew pool thread
+                            with span(tool_name, metric=TOOL_SECONDS):
+                                result = await ai_tutor_pool.run(ai_tutor_tool.invoke, tool_call['args'])
                             tool_message = ToolMessage(
                                 content= str(result),
                                 tool_call_id=tool_call['id'],
@@ -128,7 +187,8 @@ async def orchestrator_agent(messages):
                             }
                             yield f"data: {json.dumps(tool_data)}\n\n"
                             await asyncio.sleep(0.01)
-                            result = calculator.invoke(tool_call['args'])
+                            with span(tool_name, metric=TOOL_SECONDS):
+                                result = calculator.invoke(tool_call['args'])
                             tool_message = ToolMessage(
                                 content=result,
                                 tool_call_id=tool_call['id'],
@@ -147,39 +207,64 @@ async def orchestrator_agent(messages):
                 yield f"data: {json.dumps({'type': 'newline', 'content': '\\n'})}\n\n"
                 yield f"data: {json.dumps({'type': 'newline', 'content': 'Generating Final Response'})}\n\n"
                 # Stream the final response after tool execution
-                for chunk in llm_with_tools.stream(chat_history):
-                    if chunk.content:
-                        data = {
-                            "type": "final_content",
-                            "content": chunk.content
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                        await asyncio.sleep(0.01)
+                content_type = "final_content"
+                final_lease = await azure_openai_limiter.acquire_async(tokens=llm_call_tokens(chat_history))
+                response_chunks = get_llm_with_tools().stream(chat_history, stream_usage=True)
             else:
                 # No tools needed - stream the response immediately
-                for chunk in chunks:
-                    if chunk.content:
-                        data = {
-                            "type": "content",
-                            "content": chunk.content
-                        }
-                        yield f"data: {json.dumps(data)}\n\n"
-                        await asyncio.sleep(0.01)
+                content_type = "content"
+                response_chunks = chunks
+
+            final_stream = StreamTimer("final") if content_type == "final_content" else None
+            stream_start = time.perf_counter()
+            for chunk in response_chunks:
+                if final_stream:
+                    final_stream.chunk(chunk)
+                content = chunk.content
+                if content and stream_translator:
+                    content = await stream_translator.feed_async(content)
+                if content:
+                    if not response_started:
+                        # time to first token as the user sees it, tools and translation included
+                        response_started = True
+                        LLM_TTFT_SECONDS.observe(time.perf_counter() - request_start, "response")
+                    data = {
+                        "type": content_type,
+                        "content": content
+                    }
+                    yield f"data: {json.dumps(data)}\n\n"
+                    await asyncio.sleep(0.01)
+            if stream_translator:
+                content = await stream_translator.flush_async()
+                if content:
+                    yield f"data: {json.dumps({'type': content_type, 'content': content})}\n\n"
+            if final_stream:
+                final_stream.finish()
+                final_lease.release(used_tokens=final_stream.total_tokens or None)
+            STAGE_SECONDS.observe(time.perf_counter() - stream_start, "final_stream")
 
+    except RateLimited as e:
+        error_data = {
+            "type": "error",
+            "content": f"The tutor is busy right now, please retry in {e.retry_after_header()} seconds",
+            "retry_after": e.retry_after
+        }
+        yield f"data: {json.dumps(error_data)}\n\n"
     except Exception as e:
         error_data = {
             "type": "error", 
             "content": f"Error in chat processing: {str(e)}"
         }
         yield f"data: {json.dumps(error_data)}\n\n"
+    finally:
+        if final_lease:
+            final_lease.release()
     
     # Send completion signal
-    if config.kb_results:
+    if sources:
         # Remove page_content from each source, keeping only metadata
-        sources = []
-        for obj in config.kb_results:
+        for obj in sources:
             obj.pop('page_content', None)  # Remove page_content
-            sources.append(obj)  # Keep document_name and page_number
         
         source_data = {
             "type": "source",
@@ -188,6 +273,7 @@ async def orchestrator_agent(messages):
         yield f"data: {json.dumps(source_data)}\n\n"
         await asyncio.sleep(0.01)
 
+    STAGE_SECONDS.observe(time.perf_counter() - request_start, "send_message")
     yield "data: [DONE]\n\n"
 
 exam_questions_dict = {"mf_foundation": 
@@ -201,7 +287,19 @@ exam_questions_dict = {"mf_foundation":
                         "file_path": r"./data/invest_advisor_test_questions.json"},
                     }
 
-def question_generator(prev_questions: list[Dict, str], exam_type: str, is_initial: bool = False) -> str:
+@lru_cache(maxsize=None)
+def sample_questions_text(exam_type: str) -> str:
+    """The question bank of an exam as prompt text, read once per process (serve.py loads it before forking)"""
+    sample_questions = ""
+    with open(exam_questions_dict[exam_type]["file_path"], 'r', encoding='utf-8') as file:
+            # some banks carry trailing characters after the JSON array
+            json_list, _ = json.JSONDecoder().raw_decode(file.read().strip())
+            for i, obj in enumerate(json_list, 1):
+                sample_questions += f"Question {i}: {json.dumps(obj, ensure_ascii=False)}" + "\n"
+    return sample_questions
+
+
+async def question_generator(prev_questions: list[Dict, str], exam_type: str, is_initial: bool = False) -> str:
     """
     Generate next question based on previous questions and exam type
     
@@ -220,11 +318,7 @@ def question_generator(prev_questions: list[Dict, str], exam_type: str, is_initi
             messages_text += "-" * 50 + "\n"
     
     exam_details = exam_questions_dict[exam_type]
-    sample_questions = ""
-    with open(exam_details["file_path"], 'r', encoding='utf-8') as file:
-            json_list = json.load(file)
-            for i, obj in enumerate(json_list, 1):
-                sample_questions += f"Question {i}: {json.dumps(obj, ensure_ascii=False)}" + "\n"
+    sample_questions = sample_questions_text(exam_type)
 
     prompt = f"""You are an experienced Examiner who makes the questions for various certification exams conducted by SEBI.\
         You will be given some questions for an exam, you will select the questions from them based on the adaptability of the examinee,\
@@ -259,29 +353,73 @@ def question_generator(prev_questions: list[Dict, str], exam_type: str, is_initi
 
         QUESTION:
         """
-    question = azure_llm.invoke(prompt)
+    lease = await azure_openai_limiter.acquire_async(tokens=estimate_tokens(prompt) + config.LLM_OUTPUT_TOKENS_ESTIMATE)
+    with lease, span("question_generator"):
+        question = await get_azure_llm().ainvoke(prompt)
         
     return question.content
 
 
-async def explain_question_stream(question: str):
-    config.kb_results = []
+def explain_question_stream(question: str):
+    """Explanation events of a mock exam question, shared by concurrent requests for the same question"""
+    key = SharedCache.key(normalize_text(question), request_context.exam_name.get(), request_context.user_language.get(),
+                          translate_to_user_language())
+    return explanation_flights.stream(key, _explain_question_stream, question)
+
+
+async def _explain_question_stream(question: str):
+    # filled by the knowledge base searches of the exam guide crew
+    sources = request_context.collect_sources()
+    user_language = request_context.user_language.get()
 
-    final_reponse = exam_guide_crew.kickoff(inputs={"question_details": question, "user_language": config.user_language})
+    translate = translate_to_user_language()
+    # the learner's own language still sets the cultural context of the case study
+    response_language = (f"English (the answer is translated to {user_language} afterwards, "
+                         f"use it for the cultural context)") if translate else user_language
+    # the explanation and its sources belong to the exam and to the index version they were found in
+    version = await asyncio.to_thread(index_versions.current_version)
+    cache_key = SharedCache.key(normalize_text(question), request_context.exam_name.get(), user_language, translate,
+                                version.name if version else None)
+    cached = await explanation_cache.get_async(cache_key)
+    if cached is not None:
+        final_reponse = cached["content"]
+        sources[:] = cached["sources"]
+    else:
+        try:
+            with span("exam_guide_crew"):
+                final_reponse = await exam_guide_pool.kickoff_async({"question_details": question,
+                                                                     "user_language": response_language})
+        except CrewPoolBusy:
+            yield f"data: {json.dumps({'type': 'error', 'content': 'Too many explanations in progress, please retry'})}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        except RateLimited as e:
+            error_data = {'type': 'error', 'retry_after': e.retry_after,
+                          'content': f'Too many explanations in progress, please retry in {e.retry_after_header()} seconds'}
+            yield f"data: {json.dumps(error_data)}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        if translate:
+            with span("translate_answer"):
+                final_reponse = await translate_markdown_async(str(final_reponse), user_language)
+        final_reponse = str(final_reponse)
+        await explanation_cache.put_async(cache_key, {
+            "content": final_reponse,
+            "sources": [{key: value for key, value in obj.items() if key != 'page_content'}
+                        for obj in sources],
+        })
     
     res_chunk = {
         "type": "final_content",
-        "content": str(final_reponse)
+        "content": final_reponse
     }
     yield f"data: {json.dumps(res_chunk)}\n\n"
     await asyncio.sleep(0.01)
     
-    if config.kb_results:
+    if sources:
         # Remove page_content from each source, keeping only metadata
-        sources = []
-        for obj in config.kb_results:
+        for obj in sources:
             obj.pop('page_content', None)  # Remove page_content
-            sources.append(obj)  # Keep document_name and page_number
         
         source_data = {
             "type": "source",
@@ -0,0 +1,273 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from configs import config
+from metrics import register_callback, STAGE_SECONDS
+
+# Admission priorities, lower is served first: chat and exam requests before warm-up and index builds
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+# How often an async waiter re-checks its place in the queue
+ASYNC_POLL_SECONDS = 0.02
+
+
+@contextmanager
+def background():
+    """Mark the upstream calls made in this block (this thread or task) as background work"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimited(Exception):
+    """Raised when an upstream call could not be admitted within its queue deadline"""
+
+    def __init__(self, upstream, retry_after):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"{upstream} is at capacity, retry in {retry_after:.0f}s")
+
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class _Bucket:
+    """Token bucket refilled continuously at rate_per_minute, holding at most capacity"""
+
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount):
+        """Time until `amount` can be taken; a cost above capacity only needs a full bucket"""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class _Lease:
+    """Admission of one upstream call, release it when the call finished"""
+
+    def __init__(self, limiter, tokens):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.admitted_at = time.monotonic()
+        self.released = False
+
+    def release(self, used_tokens=None):
+        """Free the concurrency slot; used_tokens, when known, corrects the estimate charged on admission"""
+        if not self.released:
+            self.released = True
+            self.limiter._release(self, used_tokens)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class UpstreamLimiter:
+    """
+    Admission control for one upstream API: requests and tokens per minute, and calls in flight.
+
+    Calls wait in a priority queue (see background()) and are admitted in order once both token
+    buckets hold enough and a concurrency slot is free. A call whose expected wait exceeds its
+    deadline (max_wait_seconds, or background_max_wait_seconds for background work) fails at once
+    with RateLimited, whose retry_after is the expected wait, so latency stays bounded under a burst
+    instead of growing with the queue. A rate of 0 disables that bucket.
+    """
+
+    def __init__(self, name, requests_per_minute, tokens_per_minute, max_concurrency,
+                 max_wait_seconds=config.RATE_LIMIT_MAX_WAIT_SECONDS,
+                 background_max_wait_seconds=config.RATE_LIMIT_BACKGROUND_MAX_WAIT_SECONDS):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = {INTERACTIVE: max_wait_seconds, BACKGROUND: background_max_wait_seconds}
+        # up to 10 seconds of quota may be spent in one burst, upstreams enforce per-minute quotas
+        # over shorter windows
+        self._requests_bucket = _Bucket(requests_per_minute, max(1.0, requests_per_minute / 6)) \
+            if requests_per_minute > 0 else None
+        self._tokens_bucket = _Bucket(tokens_per_minute, max(1.0, tokens_per_minute / 6)) \
+            if tokens_per_minute > 0 else None
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._hold_seconds = None
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        register_callback("sebi_upstream_in_flight", "Upstream calls in flight",
+                          lambda: {(name,): self.in_flight}, ["upstream"])
+        register_callback("sebi_upstream_waiting", "Upstream calls waiting for admission",
+                          lambda: {(name,): len(self._queue)}, ["upstream"])
+        register_callback("sebi_upstream_rejected_total", "Upstream calls rejected with a retry hint",
+                          lambda: {(name,): self.rejected}, ["upstream"], kind="counter")
+
+    def _costs(self, requests, tokens):
+        """(bucket, amount) pairs a call is charged"""
+        return [(bucket, amount) for bucket, amount in ((self._requests_bucket, requests),
+                                                        (self._tokens_bucket, tokens)) if bucket]
+
+    def _expected_wait(self, requests, tokens, priority, now):
+        """Seconds until a call queued now behind the waiters of equal or higher priority is admitted"""
+        ahead = [entry for entry in self._queue if entry[0] <= priority]
+        wait = max(0.0, self._paused_until - now)
+        for index, (bucket, amount) in enumerate(self._costs(requests, tokens)):
+            bucket.refill(now)
+            demand = amount + sum(self._costs(entry[2], entry[3])[index][1] for entry in ahead)
+            wait = max(wait, bucket.seconds_until(demand))
+        if self.max_concurrency:
+            # every round of max_concurrency calls ahead of us takes about one average call duration
+            rounds = (self.in_flight + len(ahead) + 1 - self.max_concurrency) / self.max_concurrency
+            if rounds > 0:
+                wait = max(wait, math.ceil(rounds) * (self._hold_seconds or 0.0))
+        return wait
+
+    def _admissible(self, entry, now):
+        if self._queue[0] is not entry or now < self._paused_until:
+            return False
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return False
+        return all(bucket.seconds_until(amount) == 0 for bucket, amount in self._costs(entry[2], entry[3]))
+
+    def _enqueue(self, requests, tokens, priority):
+        now = time.monotonic()
+        wait = self._expected_wait(requests, tokens, priority, now)
+        if wait > self.max_wait[priority]:
+            self.rejected += 1
+            raise RateLimited(self.name, wait)
+        entry = [priority, next(self._sequence), requests, tokens, now]
+        heapq.heappush(self._queue, entry)
+        return entry
+
+    def _try_admit(self, entry):
+        """Admit the entry if it is first in line and the upstream has room; raises past its deadline"""
+        now = time.monotonic()
+        costs = self._costs(entry[2], entry[3])
+        for bucket, _ in costs:
+            bucket.refill(now)
+        if self._admissible(entry, now):
+            heapq.heappop(self._queue)
+            for bucket, amount in costs:
+                bucket.level -= amount
+            self.in_flight += 1
+            self.admitted += 1
+            self._cond.notify_all()
+            STAGE_SECONDS.observe(now - entry[4], f"{self.name}_admission")
+            return _Lease(self, entry[3])
+        if now - entry[4] >= self.max_wait[entry[0]]:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self.rejected += 1
+            self._cond.notify_all()
+            raise RateLimited(self.name, self._expected_wait(entry[2], entry[3], entry[0], now))
+        return None
+
+    def _recheck_after(self, entry):
+        """How long a waiter can sleep before its admission may have changed without a notify"""
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        for bucket, amount in self._costs(entry[2], entry[3]):
+            wait = max(wait, bucket.seconds_until(amount))
+        deadline = entry[4] + self.max_wait[entry[0]] - now
+        return max(0.001, min(wait or deadline, deadline))
+
+    def acquire(self, tokens=1, requests=1, priority=None):
+        """
+        Wait for admission of a call, blocking the calling thread.
+
+        Args:
+            tokens (int): Estimated tokens the call consumes (prompt and completion)
+            requests (int): Upstream requests the call makes
+            priority (int | None): INTERACTIVE or BACKGROUND, defaults to the current context's
+
+        Returns:
+            _Lease: Release it (or use it as a context manager) once the call finished
+
+        Raises:
+            RateLimited: When the call would wait longer than its deadline
+        """
+        priority = _priority.get() if priority is None else priority
+        with self._cond:
+            entry = self._enqueue(requests, tokens, priority)
+            while True:
+                lease = self._try_admit(entry)
+                if lease:
+                    return lease
+                self._cond.wait(self._recheck_after(entry))
+
+    async def acquire_async(self, tokens=1, requests=1, priority=None):
+        """acquire without blocking the event loop, the waiter polls its place in the queue"""
+        priority = _priority.get() if priority is None else priority
+        with self._cond:
+            entry = self._enqueue(requests, tokens, priority)
+        while True:
+            with self._cond:
+                lease = self._try_admit(entry)
+                if lease:
+                    return lease
+                pause = min(self._recheck_after(entry), ASYNC_POLL_SECONDS)
+            try:
+                await asyncio.sleep(pause)
+            except asyncio.CancelledError:
+                with self._cond:
+                    if entry in self._queue:
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                        self._cond.notify_all()
+                raise
+
+    def _release(self, lease, used_tokens):
+        with self._cond:
+            self.in_flight -= 1
+            held = time.monotonic() - lease.admitted_at
+            self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+            if used_tokens is not None and self._tokens_bucket is not None:
+                self._tokens_bucket.level += lease.tokens - used_tokens
+            self._cond.notify_all()
+
+    def backoff(self, seconds):
+        """The upstream answered 429: admit nothing for the next `seconds`"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def snapshot(self):
+        with self._cond:
+            return {"in_flight": self.in_flight, "waiting": len(self._queue), "admitted": self.admitted,
+                    "rejected": self.rejected, "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                    "average_call_seconds": round(self._hold_seconds or 0.0, 3)}
+
+
+def retry_after_seconds(response, default=config.RATE_LIMIT_BACKOFF_SECONDS):
+    """Seconds to back off after a 429 response, from its Retry-After header if it has one"""
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Limiters are per worker process, set the per-minute rates to the account quotas divided by the
+# number of workers
+azure_openai_limiter = UpstreamLimiter("azure_openai", config.AZURE_OPENAI_RPM, config.AZURE_OPENAI_TPM,
+                                       config.AZURE_OPENAI_CONCURRENCY)
+embeddings_limiter = UpstreamLimiter("vertex_embeddings", config.EMBEDDINGS_RPM, 0, config.EMBEDDINGS_CONCURRENCY)
+serper_limiter = UpstreamLimiter("serper", config.SERPER_RPM, 0, config.SERPER_CONCURRENCY)
+speech_limiter = UpstreamLimiter("speech", config.SPEECH_RPM, 0, config.SPEECH_CONCURRENCY)
@@ -0,0 +1,39 @@
+"""
+Settings of the request being served: the exam, the language of the answer, and the knowledge base
+sources its searches found.
+
+Concurrent requests each see their own values: they are contextvars, so they follow a request into
+the asyncio tasks it starts. Work handed to a thread pool must run in a copy of the caller's context
+(see crew_pool.CrewPool.run), which the crews' tools then read.
+"""
+import contextvars
+
+exam_name = contextvars.ContextVar("exam_name", default="")
+user_language = contextvars.ContextVar("user_language", default="")
+# Sources of the request's latest knowledge base search, a list owned by the request
+_kb_results = contextvars.ContextVar("kb_results", default=None)
+
+
+def set_request(exam, language):
+    """Set the exam and answer language for the rest of this request"""
+    exam_name.set(exam)
+    user_language.set(language)
+
+
+def collect_sources():
+    """
+    Start collecting the knowledge base sources found from here on in this context.
+
+    Returns:
+        list[dict]: Filled with the results of the latest search, also by searches run in copies of this context
+    """
+    sources = []
+    _kb_results.set(sources)
+    return sources
+
+
+def record_sources(results):
+    """The results of a knowledge base search become the request's sources"""
+    sources = _kb_results.get()
+    if sources is not None:
+        sources[:] = results
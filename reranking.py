@@ -0,0 +1,74 @@
+import numpy as np
+
+from configs import config
+
+
+def maximal_marginal_relevance(relevance, vectors, k, lambda_mult=0.7):
+    """
+    Select k diverse candidates with maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+        lambda_mult * relevance - (1 - lambda_mult) * max cosine similarity to the picks so far,
+    so near-duplicates of an already selected passage drop down the list.
+
+    Args:
+        relevance (array-like): Relevance of each candidate to the query, higher is better
+        vectors (array-like): Candidate embeddings, one row per candidate
+        k (int): Number of candidates to select
+        lambda_mult (float): 1.0 ranks by relevance only, 0.0 by diversity only
+
+    Returns:
+        list[int]: Indices of the selected candidates in selection order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    n = len(relevance)
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+    for _ in range(min(k, n)):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+def diversify_results(collection, results, k=None, lambda_mult=None):
+    """
+    Re-rank over-fetched Chroma-style results with MMR and keep the k most useful ones.
+
+    Candidate embeddings are read back from the collection (Chroma or the in-memory index)
+    by id, so lexical and fused hits can be re-ranked too. Relevance is the negated distance
+    scaled to [0, 1], which works for cosine distances as well as negated BM25/RRF scores.
+
+    Args:
+        collection: Collection the results came from
+        results (dict): Query result with ids, documents, metadatas and distances
+        k (int | None): Number of results to keep, config.KB_TOP_K by default
+        lambda_mult (float | None): Relevance/diversity trade-off, config.MMR_LAMBDA by default
+
+    Returns:
+        dict: Result in the same layout holding at most k hits
+    """
+    k = k or config.KB_TOP_K
+    lambda_mult = config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    ids = results["ids"][0] if results and results["ids"] else []
+    if len(ids) <= k:
+        return results
+
+    stored = collection.get(ids=ids, include=["embeddings"])
+    embeddings = dict(zip(stored["ids"], stored["embeddings"]))
+    dimensions = len(next(iter(embeddings.values()))) if embeddings else 1
+    vectors = np.stack([np.asarray(embeddings[doc_id], dtype=np.float32) if doc_id in embeddings
+                        else np.zeros(dimensions, dtype=np.float32) for doc_id in ids])
+
+    relevance = -np.asarray(results["distances"][0], dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+    order = maximal_marginal_relevance(relevance, vectors, k, lambda_mult)
+    return {key: [[values[0][i] for i in order]] for key, values in results.items()
+            if key in ("ids", "documents", "metadatas", "distances")}
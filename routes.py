@@ -1,17 +1,57 @@
 from typing import Optional
-from fastapi import HTTPException, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi import HTTPException, Request, Form, UploadFile, File, WebSocket
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from app import app, templates
-from speech_service import SpeechService
-from orchestrator import orchestrator_agent, question_generator, explain_question_stream
-import logging, json
+from speech_streaming import run_websocket_session
+from bounded_executor import BoundedExecutor, ExecutorBusy
+from rate_limiter import RateLimited, azure_openai_limiter
+from interim_transcription import InterimTranscriptionManager
+import logging, json, asyncio, time
 from configs import config
+from lexical_index import search_stats
+import index_versions
+import metrics
+import request_context
+from lazy import singleton, load_async, Warmup
 
 
 logger = logging.getLogger(__name__)
 
-# Initialize speech service
-speech_service = SpeechService()
+
+@singleton
+def get_orchestrator():
+    """The chat orchestrator, importing it loads langchain, crewai and the agent tools"""
+    import orchestrator
+    return orchestrator
+
+
+@singleton
+def get_speech_service():
+    from speech_service import SpeechService
+    return SpeechService()
+
+
+# Recognitions run here, off the event loop, so speech traffic cannot starve chat streaming
+transcribe_executor = BoundedExecutor("transcribe", config.TRANSCRIBE_WORKERS, config.TRANSCRIBE_MAX_QUEUE)
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+async def recognize_interim(audio_content, language):
+    speech_service = await load_async(get_speech_service)
+    result, _, _ = await transcribe_executor.run(speech_service.transcribe_audio_blob, audio_content, language, True)
+    return result
+
+# Repeated interim uploads of a growing recording are de-duplicated and coalesced per client
+interim_transcriptions = InterimTranscriptionManager(recognize_interim)
+
+metrics.register_callback("sebi_executor_in_flight", "Jobs running or queued on a bounded executor",
+                          lambda: {("transcribe",): transcribe_executor.snapshot()["in_flight"]}, ["executor"])
+metrics.register_callback("sebi_executor_rejected_total", "Jobs shed because a bounded executor was full",
+                          lambda: {("transcribe",): transcribe_executor.snapshot()["rejected"]}, ["executor"],
+                          kind="counter")
+metrics.register_callback("sebi_interim_transcriptions_total", "Interim transcription requests by outcome",
+                          lambda: {(status,): count for status, count in interim_transcriptions.stats.items()},
+                          ["outcome"], kind="counter")
 
 EXAM_TYPES = {
     'investor_awareness': 'SEBI Investor Awareness Certification',
@@ -29,10 +69,71 @@ LANGUAGE_MAPPING = {
 }
 
 
+def build_crews():
+    import agents
+    agents.ai_tutor_pool.prewarm()
+    agents.exam_guide_pool.prewarm()
+
+
+def prime_chat_model():
+    """Bind the tools and send a one-token completion, which opens the TLS connection to Azure OpenAI"""
+    orchestrator = get_orchestrator()
+    orchestrator.get_llm_with_tools()
+    with azure_openai_limiter.acquire(tokens=16):
+        orchestrator.get_azure_llm().invoke("Reply with OK", max_tokens=1)
+
+
+@singleton
+def prime_embeddings():
+    """Fetch the OAuth token and embed one query over the kept-alive Vertex AI connection"""
+    from embeddings import get_embeddings
+    return get_embeddings("SEBI certification exam")
+
+
+def prime_knowledge_base():
+    """Open every collection of the served index version, build its BM25 index and run one vector query"""
+    from embeddings import get_embeddings
+    from lexical_index import get_lexical_index
+    embedding = prime_embeddings()
+    for exam_type in EXAM_TYPES:
+        with index_versions.open_collection(exam_type) as (collection, dimensions):
+            if config.HYBRID_SEARCH:
+                get_lexical_index(collection)
+            if embedding:
+                # at the served version's size, which may differ from EMBEDDING_DIM
+                embedding = get_embeddings("SEBI certification exam", dimensions=dimensions)
+                collection.query(query_embeddings=[embedding], n_results=1)
+
+
+def prime_translation():
+    from translator import get_translation_client
+    if config.GENERATE_IN_ENGLISH:
+        get_translation_client().access_token()
+
+
+def compile_templates():
+    for name in ("landing.html", "chat.html"):
+        templates.get_template(name)
+
+# Without these the instance cannot answer chats: /readyz stays 503 while one of them failed
+REQUIRED_WARMUP_STEPS = ("orchestrator", "templates", "chat_model", "crews")
+
+# Heavy subsystems are loaded and primed in a background thread once the server is up (see lifespan
+# in app.py), and /readyz reports 503 until then. Imports take the interpreter's import locks and
+# mostly hold the GIL, so they run one at a time; the network round trips and index loads overlap.
+# A request that arrives before its subsystem is loaded waits for it off the event loop.
+warmup = Warmup([
+    [("orchestrator", get_orchestrator)],
+    [("speech", get_speech_service)],
+    [("templates", compile_templates), ("chat_model", prime_chat_model), ("embeddings", prime_embeddings),
+     ("knowledge_base", prime_knowledge_base), ("crews", build_crews), ("translation", prime_translation)],
+], timeout=config.WARMUP_TIMEOUT_SECONDS, required=REQUIRED_WARMUP_STEPS, retry_seconds=config.WARMUP_RETRY_SECONDS)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def landing(request: Request):
     """Landing page with certification paths"""
-    return templates.TemplateResponse("landing.html", {
+    return templates.TemplateResponse(request, "landing.html", {
         "request": request, 
         "exam_types": EXAM_TYPES,
         "page_type": "landing"
@@ -44,7 +145,7 @@ async def chat(request: Request, exam_type: str):
     if exam_type not in EXAM_TYPES:
         raise HTTPException(status_code=404, detail="Invalid exam type selected")
     # exam_type = exam_type
-    return templates.TemplateResponse("chat.html", {
+    return templates.TemplateResponse(request, "chat.html", {
         "request": request,
         "exam_type": exam_type,
         "exam_title": EXAM_TYPES[exam_type],
@@ -57,12 +158,22 @@ async def chat(request: Request, exam_type: str):
 async def transcribe_audio(
     audio_data: UploadFile = File(...),
     language: str = Form(default='en-US'),
-    streaming: str = Form(default='false')
+    streaming: str = Form(default='false'),
+    client_id: str = Form(default='')
 ):
     """Transcribe audio data using Google Cloud Speech API"""
     try:
-        # Read audio data
-        audio_content = await audio_data.read()
+        start_time = time.perf_counter()
+        # Read audio data in chunks, enforcing the upload cap
+        audio_content = bytearray()
+        while chunk := await audio_data.read(UPLOAD_CHUNK_BYTES):
+            audio_content.extend(chunk)
+            if len(audio_content) > config.TRANSCRIBE_MAX_UPLOAD_BYTES:
+                return JSONResponse({
+                    'success': False,
+                    'error': f'Audio larger than {config.TRANSCRIBE_MAX_UPLOAD_BYTES} bytes'
+                }, status_code=413)
+        upload_seconds = time.perf_counter() - start_time
         
         # Debug logging
         logger.info(f"Received audio: size={len(audio_content)}, content_type={audio_data.content_type}, language={language}, streaming={streaming}")
@@ -78,9 +189,48 @@ async def transcribe_audio(
                 'error': 'Empty audio data received'
             })
         
-        result = speech_service.transcribe_audio_blob(audio_content, language, is_streaming)
-        logger.info(f"Transcription result: {result}")
-        return JSONResponse(result)
+        # The recognize call is a blocking gRPC request, run it on the bounded pool so it never blocks the event loop
+        # interim uploads are de-duplicated per recording, which only the browser can identify
+        # (an address is shared by everyone behind the same NAT or proxy)
+        if is_streaming and not client_id:
+            return JSONResponse({
+                'success': False,
+                'error': 'client_id is required for interim transcriptions'
+            }, status_code=400)
+        try:
+            if is_streaming:
+                interim_start = time.perf_counter()
+                result, interim_status = await interim_transcriptions.transcribe(client_id, bytes(audio_content), language)
+                stage_timings = {'interim': (time.perf_counter() - interim_start) * 1000}
+                result['interim'] = interim_status
+            else:
+                if client_id:
+                    interim_transcriptions.forget(client_id)
+                speech_service = await load_async(get_speech_service)
+                result, queue_seconds, recognize_seconds = await transcribe_executor.run(
+                    speech_service.transcribe_audio_blob, bytes(audio_content), language, False)
+                stage_timings = {'queue': queue_seconds * 1000, 'recognize': recognize_seconds * 1000}
+        except ExecutorBusy:
+            logger.warning(f"Transcription shed, executor at capacity: {transcribe_executor.snapshot()}")
+            return JSONResponse({
+                'success': False,
+                'error': 'Too many transcriptions in progress, please retry'
+            }, status_code=429, headers={'Retry-After': str(config.TRANSCRIBE_RETRY_AFTER_SECONDS)})
+        except RateLimited as e:
+            logger.warning(f"Transcription shed: {e}")
+            return JSONResponse({
+                'success': False,
+                'error': 'Too many transcriptions in progress, please retry'
+            }, status_code=429, headers={'Retry-After': e.retry_after_header()})
+        
+        timings = {
+            'upload': upload_seconds * 1000,
+            **stage_timings,
+            'total': (time.perf_counter() - start_time) * 1000,
+        }
+        logger.info(f"Transcription result: {result}, timings_ms={timings}")
+        return JSONResponse(dict(result, timings_ms={stage: round(ms, 1) for stage, ms in timings.items()}),
+                            headers={'Server-Timing': ', '.join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())})
     except Exception as e:
         logger.error(f"Transcription error: {str(e)}")
         return JSONResponse({
@@ -98,15 +248,17 @@ async def send_message(request: Request):
         
         chat_history = data.get('chat_history', [])
         language_code = data.get('language', 'en-US')
-        config.exam_name = data.get('exam_type', 'investor_awareness')
-        config.user_language = LANGUAGE_MAPPING.get(language_code, 'English')
+        # per request: the streamed answer and its crews and tools read them from the request context
+        request_context.set_request(data.get('exam_type', 'investor_awareness'),
+                                    LANGUAGE_MAPPING.get(language_code, 'English'))
 
         if not chat_history or not isinstance(chat_history, list):
             raise HTTPException(status_code=400, detail="Chat history required")
         
         # Stream response from orchestrator agent
+        orchestrator = await load_async(get_orchestrator)
         return StreamingResponse(
-            orchestrator_agent(chat_history),
+            orchestrator.orchestrator_agent(chat_history),
             media_type="text/plain",
             headers={
                 "Cache-Control": "no-cache",
@@ -120,6 +272,11 @@ async def send_message(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket, language: str = 'en-US'):
+    """Real-time transcription of audio streamed frame by frame, with interim and final results pushed back"""
+    await run_websocket_session(websocket, await load_async(get_speech_service), language)
+
 @app.post("/mock_exam")
 async def mock_exam(request: Request):
     """Handle mock exam requests and return next question"""
@@ -140,10 +297,15 @@ async def mock_exam(request: Request):
         if not exam_type or exam_type not in EXAM_TYPES:
             raise HTTPException(status_code=400, detail="Valid exam_type is required")
         
-        question = question_generator(messages, exam_type, is_initial)
+        orchestrator = await load_async(get_orchestrator)
+        question = await orchestrator.question_generator(messages, exam_type, is_initial)
 
         return JSONResponse(json.loads(question))
-        
+
+    except RateLimited as e:
+        logger.warning(f"Mock exam question shed: {e}")
+        return JSONResponse({'error': 'Too many requests, please retry', 'retry_after': e.retry_after},
+                            status_code=429, headers={'Retry-After': e.retry_after_header()})
     except Exception as e:
         logger.error(f"Mock exam error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -166,13 +328,13 @@ async def generate_explanation(request: Request):
         if exam_type not in EXAM_TYPES:
             raise HTTPException(status_code=400, detail="Valid exam_type is required")
         
-        # Set configuration for the explanation generation
-        config.exam_name = exam_type
-        config.user_language = LANGUAGE_MAPPING.get(language_code, 'English')
+        # Set the exam and language of this request for the explanation generation
+        request_context.set_request(exam_type, LANGUAGE_MAPPING.get(language_code, 'English'))
         
         # Stream response using the new explanation streaming function
+        orchestrator = await load_async(get_orchestrator)
         return StreamingResponse(
-            explain_question_stream(question),
+            orchestrator.explain_question_stream(question),
             media_type="text/plain",
             headers={
                 "Cache-Control": "no-cache",
@@ -183,4 +345,70 @@ async def generate_explanation(request: Request):
         
     except Exception as e:
         logger.error(f"Explanation generation error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is serving requests"""
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 503 until the startup warm-up finished (or ran longer than WARMUP_TIMEOUT_SECONDS),
+    and while the LLM clients, crews or templates failed to load
+    """
+    ready = not config.WARMUP_ON_STARTUP or warmup.ready()
+    return JSONResponse({"ready": ready, **warmup.snapshot()}, status_code=200 if ready else 503)
+
+
+@app.get("/search_stats")
+async def get_search_stats():
+    """How often knowledge base searches took the lexical fast path, and the latency of each path"""
+    return JSONResponse(search_stats.snapshot())
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latencies, LLM time to first token and token rate, tool durations and cache hit rates for Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def check_admin_token(request: Request):
+    """Admin endpoints need the X-Admin-Token header to match ADMIN_TOKEN, and are disabled when it is not set"""
+    if not config.ADMIN_TOKEN or request.headers.get("X-Admin-Token") != config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin access denied")
+
+
+@app.get("/admin/index")
+async def get_index_status(request: Request):
+    """Active and served knowledge base index versions, and the state of the last background build"""
+    check_admin_token(request)
+    return JSONResponse(index_versions.status())
+
+
+@app.post("/admin/index/rebuild")
+async def rebuild_index(request: Request):
+    """Build, validate and activate a new knowledge base index version in the background"""
+    check_admin_token(request)
+    data = await request.json() if await request.body() else {}
+    options = {key: data[key] for key in ("exams", "backend", "granularity", "dimensions", "dtype", "activate")
+               if key in data}
+    if not index_versions.start_background_build(**options):
+        raise HTTPException(status_code=409, detail="An index build is already running")
+    return JSONResponse({"status": "building"}, status_code=202)
+
+
+@app.post("/admin/index/activate")
+async def activate_index(request: Request):
+    """Switch every worker to an existing index version, e.g. to roll back"""
+    check_admin_token(request)
+    data = await request.json()
+    try:
+        # the switch warms the new version up in this worker, keep it off the event loop
+        await asyncio.to_thread(index_versions.activate_version, data.get("version", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return JSONResponse(index_versions.status())
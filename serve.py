@@ -0,0 +1,149 @@
+"""
+Production server: one listening socket shared by N pre-forked uvicorn worker processes.
+
+`python app.py` is the development server (auto-reload, one process). This entry point instead:
+  1. imports the app and preloads what every worker needs read-only: the orchestrator and agent
+     modules, compiled templates, question banks and exam overviews, and the in-memory knowledge
+     base indexes (vector matrices are memory-mapped artifacts, BM25 indexes are built once)
+  2. freezes the garbage collector so those objects are never written to again, which keeps
+     their pages shared copy-on-write with the workers
+  3. binds the socket and forks the workers, each one runs its own event loop and warm-up
+     (network connections and Chroma clients are opened after the fork, never shared)
+  4. restarts workers that die and shuts all of them down gracefully on SIGTERM / SIGINT
+
+Results that must be coherent across workers (query embeddings, web results, explanations,
+translations) live in the sqlite backed shared caches. Metrics are per worker process.
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8080]
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from configs import config
+
+logger = logging.getLogger("serve")
+
+# A worker that dies sooner than this after starting is restarted after a pause instead of right away
+MIN_WORKER_LIFETIME_SECONDS = 5
+
+
+def preload():
+    """Load the read-only state the workers share before forking them"""
+    import app
+    import routes
+    import index_versions
+    from lexical_index import get_lexical_index
+
+    start = time.perf_counter()
+    orchestrator = routes.get_orchestrator()
+    routes.compile_templates()
+    import agents
+    for exam_type in routes.EXAM_TYPES:
+        # a file that cannot be read fails the requests that need it, not the server
+        for load in (orchestrator.sample_questions_text, agents.read_exam_overview):
+            try:
+                load(exam_type)
+            except (OSError, ValueError) as e:
+                logger.warning(f"{load.__name__}({exam_type}) not preloaded: {e}")
+
+    if index_versions.preload():
+        logger.info("Preloaded the active in-memory index version")
+    elif index_versions.read_active() is None and config.VECTOR_BACKEND == "memory":
+        from vector_index import get_vector_index
+        for exam_type in routes.EXAM_TYPES:
+            index = get_vector_index(exam_type)
+            if config.HYBRID_SEARCH:
+                get_lexical_index(index)
+        logger.info("Preloaded the in-memory indexes")
+    else:
+        logger.info("Chroma indexes are opened by each worker after the fork")
+    logger.info(f"Preloaded in {time.perf_counter() - start:.1f}s")
+    return app.app
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(application, sock):
+    """Serve on the inherited socket until the master asks to stop, then exit the process"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(application, log_level="info", timeout_graceful_shutdown=30))
+    try:
+        server.run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def spawn(application, sock):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(application, sock)
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS or os.cpu_count())
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    args = parser.parse_args()
+
+    application = preload()
+    gc.collect()
+    gc.freeze()
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    workers = {}
+    stopping = []
+
+    def stop(signum, frame):
+        # waitpid is retried after a signal, so the workers are told to stop right here and the loop
+        # below sees them exit
+        stopping.append(signum)
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        workers[spawn(application, sock)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        started_at = workers.pop(pid, None)
+        if started_at is None or stopping:
+            continue
+        logger.error(f"Worker {pid} exited with status {status}, restarting it")
+        if time.monotonic() - started_at < MIN_WORKER_LIFETIME_SECONDS:
+            time.sleep(MIN_WORKER_LIFETIME_SECONDS)
+        if not stopping:
+            workers[spawn(application, sock)] = time.monotonic()
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
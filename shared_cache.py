@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from configs import config
+from metrics import register_cache
+
+
+class SharedCache:
+    """
+    Two level cache of JSON values that all worker processes of a host share.
+
+    Recent entries live in an in-process LRU; every entry is also written to one sqlite file (WAL,
+    so readers never block the writer) that all workers read, so a result computed by one worker is
+    reused by the others and survives restarts. Entries older than ttl_seconds are ignored, and
+    every prune_every writes the namespace's expired rows and all but its max_rows newest are
+    deleted from the file. The connection is opened lazily in the process that uses it, never
+    before a fork.
+
+    get and put may wait on the sqlite file, async code uses get_async and put_async.
+    """
+
+    def __init__(self, namespace, max_size=config.SHARED_CACHE_MEMORY_ITEMS, ttl_seconds=None,
+                 path=config.SHARED_CACHE_PATH, max_rows=config.SHARED_CACHE_MAX_ROWS,
+                 prune_every=config.SHARED_CACHE_PRUNE_EVERY):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # the sqlite file has its own lock, so lookups in memory never wait on it
+        self._db_lock = threading.Lock()
+        self._puts = 0
+        self._db = None
+        self._db_pid = None
+        register_cache(namespace, lambda: (self.hits, self.misses))
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        if not self.path:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value TEXT, "
+                             "created_at REAL, PRIMARY KEY (namespace, key))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (namespace, created_at)")
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _fresh(self, created_at):
+        return self.ttl_seconds is None or time.time() - created_at < self.ttl_seconds
+
+    def get(self, key):
+        """Return the cached value of a key (see SharedCache.key), or None"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute("SELECT value, created_at FROM entries WHERE namespace=? AND key=?",
+                             (self.namespace, key)).fetchone() if db else None
+        with self._lock:
+            if row is None or not self._fresh(row[1]):
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self.hits += 1
+            self._remember(key, value, row[1])
+            return value
+
+    def put(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+        with self._db_lock:
+            db = self._connection()
+            if db:
+                db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                           (self.namespace, key, json.dumps(value, ensure_ascii=False), created_at))
+                if self._puts % self.prune_every == 0:
+                    self._prune(db)
+                self._puts += 1
+                db.commit()
+
+    async def get_async(self, key):
+        """get on a thread, for async callers"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key, value):
+        """put on a thread, for async callers"""
+        await asyncio.to_thread(self.put, key, value)
+
+    def _prune(self, db):
+        """Delete the namespace's expired rows and all but its max_rows newest ones"""
+        if self.ttl_seconds is not None:
+            db.execute("DELETE FROM entries WHERE namespace=? AND created_at < ?",
+                       (self.namespace, time.time() - self.ttl_seconds))
+        db.execute("DELETE FROM entries WHERE namespace=? AND key IN (SELECT key FROM entries WHERE namespace=? "
+                   "ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.namespace, self.namespace, self.max_rows))
+
+    def _remember(self, key, value, created_at):
+        self._items[key] = (value, created_at)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
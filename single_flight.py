@@ -0,0 +1,151 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+
+from metrics import register_callback
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Case and whitespace folded text, so trivially different copies of a question share a key"""
+    return _WHITESPACE.sub(' ', str(text)).strip().lower()
+
+
+class _Broadcast:
+    """Events of one in-progress stream, replayed to late subscribers and pushed live to the others"""
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._wakeup = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._wakeup.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent work: the first caller of a key runs it, callers arriving
+    while it runs share its result instead of repeating the upstream calls.
+
+    Nothing is kept once the run finished (the caches do that), so only truly concurrent callers
+    are coalesced. A failure is shared with every caller of that run. `do` is for blocking
+    callers in threads, `do_async` and `stream` for the event loop of one worker.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        register_callback("sebi_single_flight_total", "Calls that ran the work (leader) or shared a run (follower)",
+                          lambda: {(name, "leader"): self.leaders, (name, "follower"): self.followers},
+                          ["flight", "role"], kind="counter")
+        register_callback("sebi_single_flight_in_progress", "Distinct runs in progress",
+                          lambda: {(name,): len(self._flights)}, ["flight"])
+
+    def do(self, key, fn, *args):
+        """fn(*args), or the result of the run of fn for the same key already in progress"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            return flight.result()
+        try:
+            result = fn(*args)
+            flight.set_result(result)
+            return result
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def do_async(self, key, coroutine_fn, *args):
+        """await coroutine_fn(*args), shared with the callers of the same key; a caller that goes
+        away does not cancel the run the others wait for"""
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = self._flights[key] = asyncio.ensure_future(coroutine_fn(*args))
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    async def stream(self, key, generator_fn, *args):
+        """
+        Async generator of the items generator_fn(*args) yields, one run shared by every caller of
+        the same key: later callers first receive the items already produced, then each new item as
+        it is produced. The run goes on while any caller is still reading and is cancelled once
+        none is left.
+        """
+        broadcast = self._flights.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = self._flights[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._produce(key, broadcast, generator_fn(*args)))
+        else:
+            self.followers += 1
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers and not broadcast.done:
+                # a caller arriving from now on starts a new run
+                self._forget(key, broadcast)
+                broadcast.task.cancel()
+
+    async def _produce(self, key, broadcast, generator):
+        try:
+            async for item in generator:
+                broadcast.publish(item)
+            broadcast.finish()
+        except asyncio.CancelledError:
+            broadcast.finish()
+            raise
+        except Exception as e:
+            broadcast.finish(e)
+        finally:
+            self._forget(key, broadcast)
+            await generator.aclose()
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -2,9 +2,12 @@ import os
 import json
 import base64
 import logging
+import time
 from google.cloud import speech
 from google.oauth2 import service_account
 from configs import config
+from metrics import span, STAGE_SECONDS
+from rate_limiter import RateLimited, speech_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +26,11 @@ class SpeechService:
                 with open(creds_path, 'r') as f:
                     credentials_info = json.load(f)
                 credentials = service_account.Credentials.from_service_account_info(credentials_info)
-                self.client = speech.SpeechClient(credentials=credentials)
+                if config.SPEECH_API_ENDPOINT:
+                    self.client = speech.SpeechClient(credentials=credentials, transport="rest",
+                                                      client_options={"api_endpoint": config.SPEECH_API_ENDPOINT})
+                else:
+                    self.client = speech.SpeechClient(credentials=credentials)
                 logger.info("Google Cloud Speech client initialized with service account from file")
             else:
                 logger.warning(f"Credentials file not found at {creds_path}")
@@ -62,8 +69,9 @@ class SpeechService:
                 model='latest_long',
             )
             
-            # Perform recognition
-            response = self.client.recognize(config=config, audio=audio)
+            # Perform recognition once the Speech-to-Text limiter admits it
+            with speech_limiter.acquire(), span("speech_recognize"):
+                response = self.client.recognize(config=config, audio=audio)
             
             if response.results:
                 result = response.results[0]
@@ -118,8 +126,9 @@ class SpeechService:
             
             logger.info(f"Using speech config: encoding=WEBM_OPUS, sample_rate=48000, language={language_code}")
             
-            # Perform recognition
-            response = self.client.recognize(config=config, audio=audio)
+            # Perform recognition once the Speech-to-Text limiter admits it
+            with speech_limiter.acquire(), span("speech_recognize"):
+                response = self.client.recognize(config=config, audio=audio)
             logger.info(f"Speech API response: {len(response.results)} results")
             
             if response.results:
@@ -143,6 +152,9 @@ class SpeechService:
                     'is_final': not is_streaming
                 }
                 
+        except RateLimited:
+            # shed by the caller with a retry hint instead of an empty transcript
+            raise
         except Exception as e:
             logger.error(f"Audio blob transcription error: {str(e)}")
             return {
@@ -153,16 +165,21 @@ class SpeechService:
                 'is_final': not is_streaming
             }
     
-    def transcribe_streaming(self, audio_stream, language_code='en-US'):
+    def transcribe_streaming(self, audio_stream, language_code='en-US', encoding='WEBM_OPUS', sample_rate_hertz=48000):
         """
         Perform streaming speech recognition
         
         Args:
-            audio_stream: Stream of audio data
+            audio_stream: Iterable of raw audio byte chunks, consumed as they arrive
             language_code: Language code for transcription
+            encoding: RecognitionConfig.AudioEncoding name of the audio (MediaRecorder sends WEBM_OPUS)
+            sample_rate_hertz: Sample rate of the audio
             
         Yields:
-            dict: Streaming transcription results
+            dict: Streaming transcription results (interim and final)
+
+        Raises:
+            Exception: Errors of the streaming call, after logging them
         """
         if not self.client:
             logger.error("Speech client not initialized")
@@ -170,8 +187,8 @@ class SpeechService:
         
         try:
             config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
+                encoding=getattr(speech.RecognitionConfig.AudioEncoding, encoding),
+                sample_rate_hertz=sample_rate_hertz,
                 language_code=language_code,
                 enable_automatic_punctuation=True,
             )
@@ -181,19 +198,26 @@ class SpeechService:
                 interim_results=True,
             )
             
-            responses = self.client.streaming_recognize(streaming_config, audio_stream)
+            requests = (speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in audio_stream)
+            stream_start = time.perf_counter()
+            responses = self.client.streaming_recognize(streaming_config, requests)
             
             for response in responses:
+                if stream_start is not None:
+                    STAGE_SECONDS.observe(time.perf_counter() - stream_start, "speech_stream_first_result")
+                    stream_start = None
                 for result in response.results:
                     alternative = result.alternatives[0]
                     yield {
                         'transcript': alternative.transcript,
                         'confidence': alternative.confidence if hasattr(alternative, 'confidence') else 0.0,
+                        'stability': result.stability,
                         'is_final': result.is_final
                     }
                     
         except Exception as e:
             logger.error(f"Streaming transcription error: {str(e)}")
+            raise
     
     def get_supported_languages(self):
         """Get list of supported languages for speech recognition"""
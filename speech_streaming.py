@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from configs import config
+from rate_limiter import RateLimited, speech_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingRecognition:
+    """
+    One streaming recognize session fed incrementally with audio frames.
+
+    The blocking gRPC stream runs in a background thread that pulls frames from a queue as
+    they arrive; every interim and final result is handed back to the event loop through
+    `results`, and a None marks the end of the session.
+    """
+
+    def __init__(self, speech_service, language_code, loop=None):
+        self.speech_service = speech_service
+        self.language_code = language_code
+        self.loop = loop or asyncio.get_running_loop()
+        self.results = asyncio.Queue()
+        self.final_transcript = ""
+        self.bytes_received = 0
+        self.frames = 0
+        self._audio = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="speech-stream", daemon=True)
+
+    def start(self):
+        self.started_at = self.last_frame_at = time.perf_counter()
+        self._thread.start()
+
+    def feed(self, chunk):
+        """Queue the next audio frame; returns False once the session exceeded SPEECH_STREAM_MAX_BYTES"""
+        self.bytes_received += len(chunk)
+        self.frames += 1
+        self.last_frame_at = time.perf_counter()
+        if self.bytes_received > config.SPEECH_STREAM_MAX_BYTES:
+            return False
+        self._audio.put(chunk)
+        return True
+
+    def close(self):
+        """No more audio: the recognizer finalizes what it has and the session ends"""
+        self._audio.put(None)
+
+    def _frames(self):
+        while True:
+            chunk = self._audio.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _emit(self, message):
+        self.loop.call_soon_threadsafe(self.results.put_nowait, message)
+
+    def _run(self):
+        try:
+            for result in self.speech_service.transcribe_streaming(self._frames(), self.language_code):
+                if result['is_final']:
+                    self.final_transcript = f"{self.final_transcript} {result['transcript']}".strip()
+                # time from the newest audio frame to its transcript
+                self._emit({'type': 'transcript', **result,
+                            'latency_ms': round((time.perf_counter() - self.last_frame_at) * 1000)})
+        except Exception as e:
+            self._emit({'type': 'error', 'error': str(e)})
+        finally:
+            self._emit(None)
+
+
+async def run_websocket_session(websocket: WebSocket, speech_service, language_code='en-US'):
+    """
+    Transcribe the audio a browser streams over a WebSocket.
+
+    Protocol:
+        client -> server: binary frames of a MediaRecorder webm/opus stream, then {"type": "stop"}
+        server -> client: {"type": "transcript", "transcript", "is_final", ...} as results arrive,
+                          {"type": "error", "error"} on failure, and {"type": "end", "transcript"}
+                          with the full final transcript before closing
+
+    A session holds one of the Speech limiter's calls in flight until it ends. When none is
+    available in time, the client gets {"type": "error", "error", "retry_after"} and the socket
+    is closed with code 1013 (try again later).
+    """
+    await websocket.accept()
+    if not speech_service.client:
+        await websocket.send_json({'type': 'error', 'error': 'Speech recognition not configured - check credentials'})
+        await websocket.close()
+        return
+
+    try:
+        lease = await speech_limiter.acquire_async()
+    except RateLimited as e:
+        await websocket.send_json({'type': 'error', 'retry_after': e.retry_after,
+                                   'error': f'Too many transcriptions in progress, please retry in '
+                                            f'{e.retry_after_header()} seconds'})
+        await websocket.close(code=1013)
+        return
+    with lease:
+        await _stream_session(websocket, speech_service, language_code)
+
+
+async def _stream_session(websocket, speech_service, language_code):
+    session = StreamingRecognition(speech_service, language_code)
+    session.start()
+
+    async def forward_results():
+        while (message := await session.results.get()) is not None:
+            await websocket.send_json(message)
+        await websocket.send_json({'type': 'end', 'transcript': session.final_transcript})
+
+    sender = asyncio.create_task(forward_results())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message.get('bytes'):
+                if not session.feed(message['bytes']):
+                    await websocket.send_json({'type': 'error', 'error': 'Audio stream too long'})
+                    break
+            elif message.get('text'):
+                try:
+                    control = json.loads(message['text'])
+                except ValueError:
+                    logger.warning("Speech stream: ignored a malformed text frame")
+                    continue
+                if isinstance(control, dict) and control.get('type') == 'stop':
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+
+    try:
+        await asyncio.wait_for(sender, timeout=config.SPEECH_STREAM_FINAL_TIMEOUT)
+        await websocket.close()
+    except Exception as e:
+        sender.cancel()
+        logger.info(f"Speech stream ended without final result: {e}")
+    logger.info(f"Speech stream: {session.frames} frames, {session.bytes_received} bytes, language={language_code}, "
+                f"{time.perf_counter() - session.started_at:.1f}s")
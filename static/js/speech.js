@@ -304,6 +304,106 @@ class SpeechManager {
     }
 }
 
+// Real-time transcription over the /ws/transcribe WebSocket: MediaRecorder frames are sent as
+// they are recorded and the server pushes interim and final transcripts back
+class StreamingTranscriber {
+    constructor(languageCode = 'en-US') {
+        this.languageCode = languageCode;
+        this.socket = null;
+        this.finalTranscript = '';
+        this.interimTranscript = '';
+        this.pendingStop = null;
+    }
+    
+    // Resolves to true once connected, false if the endpoint is unavailable
+    open(timeoutMs = 3000) {
+        return new Promise((resolve) => {
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            const url = `${protocol}//${window.location.host}/ws/transcribe?language=${encodeURIComponent(this.languageCode)}`;
+            const timer = setTimeout(() => resolve(false), timeoutMs);
+            
+            try {
+                this.socket = new WebSocket(url);
+            } catch (error) {
+                clearTimeout(timer);
+                resolve(false);
+                return;
+            }
+            
+            this.socket.onopen = () => {
+                clearTimeout(timer);
+                resolve(true);
+            };
+            this.socket.onerror = () => {
+                clearTimeout(timer);
+                resolve(false);
+            };
+            this.socket.onmessage = (event) => this.handleMessage(JSON.parse(event.data));
+            this.socket.onclose = () => this.finish();
+        });
+    }
+    
+    isOpen() {
+        return this.socket && this.socket.readyState === WebSocket.OPEN;
+    }
+    
+    sendAudio(blob) {
+        if (this.isOpen()) {
+            this.socket.send(blob);
+        }
+    }
+    
+    // Ends the audio stream; resolves with the full final transcript
+    stop(timeoutMs = 10000) {
+        return new Promise((resolve) => {
+            this.pendingStop = resolve;
+            if (!this.isOpen()) {
+                this.finish();
+                return;
+            }
+            this.socket.send(JSON.stringify({ type: 'stop' }));
+            setTimeout(() => this.finish(), timeoutMs);
+        });
+    }
+    
+    handleMessage(message) {
+        if (message.type === 'transcript') {
+            if (message.is_final) {
+                this.finalTranscript = `${this.finalTranscript} ${message.transcript}`.trim();
+                this.interimTranscript = '';
+            } else {
+                this.interimTranscript = message.transcript;
+            }
+            this.onUpdate(`${this.finalTranscript} ${this.interimTranscript}`.trim(), message.is_final);
+        } else if (message.type === 'end') {
+            this.finalTranscript = message.transcript || this.finalTranscript;
+            this.finish();
+        } else if (message.type === 'error') {
+            this.onError(message.error);
+        }
+    }
+    
+    finish() {
+        if (this.pendingStop) {
+            const resolve = this.pendingStop;
+            this.pendingStop = null;
+            resolve(this.finalTranscript);
+        }
+        if (this.socket && this.socket.readyState <= WebSocket.OPEN) {
+            this.socket.close();
+        }
+    }
+    
+    // Event handlers (to be overridden)
+    onUpdate(transcript, isFinal) {
+        console.log('Streaming transcript:', transcript, isFinal);
+    }
+    
+    onError(error) {
+        console.error('Streaming transcription error:', error);
+    }
+}
+
 // Text-to-Speech functionality
 class TextToSpeechManager {
     constructor() {
@@ -414,6 +514,7 @@ class TextToSpeechManager {
 // Export for global use
 window.SpeechManager = SpeechManager;
 window.TextToSpeechManager = TextToSpeechManager;
+window.StreamingTranscriber = StreamingTranscriber;
 
 // Create global instances
 window.speechManager = new SpeechManager();
@@ -0,0 +1,111 @@
+// SEBI Vidyalaya incremental markdown rendering of streamed answers
+//
+// Re-parsing the whole answer and replacing innerHTML for every streamed chunk costs O(n^2) parse
+// and DOM work over an answer. This renderer keeps the markdown blocks that can no longer change
+// (those followed by a block that cannot continue them) as they are, parses and inserts each of
+// them once, and only re-parses the trailing open block. DOM writes are batched to one per animation frame. The
+// resulting HTML is the same as marked.parse() of the whole answer.
+
+// Link reference definitions can change how earlier blocks render, answers using them are re-rendered whole
+const REFERENCE_DEFINITION = /^ {0,3}\[[^\]]+\]:/m;
+// Lists and indented code continue across blank lines: such a block is complete only once the next
+// block starts with something that cannot be another item or indented line
+const CONTINUABLE_BLOCKS = new Set(['list', 'code']);
+const MAY_CONTINUE = /^(\s|[-*+]|\d)/;
+
+class StreamingMarkdownRenderer {
+    constructor(container, options = {}) {
+        this.container = container;
+        // Applied to the whole content before parsing, must only ever append to its earlier output
+        this.preprocess = options.preprocess || (text => text);
+        // Called after each DOM update, e.g. to keep the chat scrolled to the bottom
+        this.onRender = options.onRender || null;
+        this.frame = null;
+        this.pending = null;
+        this.reset();
+    }
+
+    reset() {
+        this.frozenSource = '';
+        this.frozenNodeCount = 0;
+        this.container.innerHTML = '';
+    }
+
+    // Render the content (the whole answer so far) on the next animation frame
+    update(content) {
+        this.pending = content;
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.flush();
+            });
+        }
+    }
+
+    // Render the pending content right away
+    flush() {
+        if (this.frame !== null) {
+            cancelAnimationFrame(this.frame);
+            this.frame = null;
+        }
+        if (this.pending === null) {
+            return;
+        }
+        const source = this.preprocess(this.pending.replace(/\r\n?/g, '\n'));
+        this.pending = null;
+        this.render(source);
+        if (this.onRender) {
+            this.onRender();
+        }
+    }
+
+    render(source) {
+        if (!source.startsWith(this.frozenSource) || REFERENCE_DEFINITION.test(source)) {
+            // not a continuation of what was rendered: start over
+            this.reset();
+            this.container.innerHTML = marked.parse(source);
+            return;
+        }
+
+        const tail = source.slice(this.frozenSource.length);
+        const tokens = marked.lexer(tail);
+        // the last block that is not blank space may still grow, the blocks before it are complete
+        const previousBlock = index => {
+            do {
+                index--;
+            } while (index > 0 && tokens[index].type === 'space');
+            return index;
+        };
+        let open = previousBlock(tokens.length);
+        while (open > 0) {
+            const previous = previousBlock(open);
+            if (!CONTINUABLE_BLOCKS.has(tokens[previous].type) || !MAY_CONTINUE.test(tokens[open].raw)) {
+                break;
+            }
+            open = previous;
+        }
+        let closed = open > 0 ? tokens.slice(0, open) : [];
+        const closedSource = closed.map(token => token.raw).join('');
+        if (!tail.startsWith(closedSource)) {
+            // token boundaries do not line up with the source, keep everything open
+            closed = [];
+        }
+        const openTokens = tokens.slice(closed.length);
+        closed.links = openTokens.links = tokens.links;
+
+        // drop the nodes of the previously open block, append the newly completed blocks, then the open one
+        while (this.container.childNodes.length > this.frozenNodeCount) {
+            this.container.lastChild.remove();
+        }
+        if (closed.length) {
+            this.container.insertAdjacentHTML('beforeend', marked.parser(closed));
+            this.frozenNodeCount = this.container.childNodes.length;
+            this.frozenSource += closedSource;
+        }
+        if (openTokens.length) {
+            this.container.insertAdjacentHTML('beforeend', marked.parser(openTokens));
+        }
+    }
+}
+
+window.StreamingMarkdownRenderer = StreamingMarkdownRenderer;
@@ -1,9 +1,21 @@
 import requests
 import json
 import os
+import sys
+import asyncio
+import hashlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
 from configs import config
+from metrics import span, register_cache, register_callback
 
 # Global constant for Indian language mapping
 INDIAN_LANGUAGE_CODES = {
@@ -21,31 +33,285 @@ INDIAN_LANGUAGE_CODES = {
     'urdu': 'ur'
 }
 
-def get_access_token_from_service_account(service_account_path):
+# Every language the app answers in, by the names used in routes.LANGUAGE_MAPPING
+LANGUAGE_CODES = {'english': 'en', **INDIAN_LANGUAGE_CODES}
+
+
+def language_code(language):
+    """Return the Translation API code of a language name ("Hindi") or code ("hi")"""
+    return LANGUAGE_CODES.get(language.lower(), language)
+
+
+class TranslationCache:
     """
-    Get access token using service account JSON file.
-    
+    Two level translation cache keyed by (source language, target language, text hash).
+
+    Recent translations live in an in-process LRU; every translation is also written to a
+    sqlite file shared by all worker processes and kept across restarts.
+    """
+
+    def __init__(self, max_size=config.TRANSLATION_CACHE_SIZE, path=config.TRANSLATION_DISK_CACHE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS translations (source TEXT, target TEXT, hash TEXT, "
+                             "translation TEXT, PRIMARY KEY (source, target, hash))")
+
+    @staticmethod
+    def key(text, target_language_code, source_language_code=None):
+        return source_language_code or "auto", target_language_code, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, text, target_language_code, source_language_code=None):
+        key = self.key(text, target_language_code, source_language_code)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            row = self._db.execute("SELECT translation FROM translations WHERE source=? AND target=? AND hash=?",
+                                   key).fetchone() if self._db else None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def peek(self, text, target_language_code, source_language_code=None):
+        """The translation if it is in the in-process LRU, without touching the sqlite file"""
+        key = self.key(text, target_language_code, source_language_code)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        return None
+
+    def put_many(self, entries, target_language_code, source_language_code=None):
+        """Store {text: translation} entries"""
+        rows = [self.key(text, target_language_code, source_language_code) + (translation,)
+                for text, translation in entries.items()]
+        with self._lock:
+            for row in rows:
+                self._remember(row[:3], row[3])
+            if self._db:
+                self._db.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", rows)
+                self._db.commit()
+
+    def _remember(self, key, translation):
+        self._items[key] = translation
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+class TranslationClient:
+    """
+    Google Translation v3 client that batches, pools and caches requests.
+
+    Texts submitted by concurrent callers within TRANSLATION_BATCH_WINDOW_MS are grouped per
+    language pair into one `contents` array (up to MAX_BATCH_ITEMS texts / MAX_BATCH_CHARS
+    characters per request) and sent over a keep-alive connection pool. The access token is
+    reused until it expires, identical texts in flight are translated once, and results are
+    served from the TranslationCache afterwards.
+    """
+
+    MAX_BATCH_ITEMS = 128
+    # the API recommends keeping a request below 30k code points
+    MAX_BATCH_CHARS = 25000
+
+    def __init__(self, project_id=config.GOOGLE_PROJECT_ID, service_account_path=config.GOOGLE_CREDS_JSON,
+                 cache=None, batch_window_ms=config.TRANSLATION_BATCH_WINDOW_MS, pool_size=config.TRANSLATION_POOL_SIZE):
+        self.project_id = project_id
+        self.service_account_path = service_account_path
+        self.url = f"{config.TRANSLATION_API_BASE}/v3/projects/{project_id}:translateText"
+        self.cache = cache if cache is not None else TranslationCache()
+        self.batch_window = batch_window_ms / 1000
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.requests_sent = 0
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="translate")
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        # a token refresh is a network round trip, it must not hold up submit()
+        self._credentials_lock = threading.Lock()
+        self._credentials = None
+        self._dispatcher = None
+
+    def access_token(self):
+        """Return a valid access token, refreshing the cached credentials only when they expired"""
+        with self._credentials_lock:
+            if self._credentials is None:
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.service_account_path, scopes=['https://www.googleapis.com/auth/cloud-platform'])
+            if not self._credentials.valid:
+                self._credentials.refresh(Request())
+            return self._credentials.token
+
+    def submit(self, text, target_language_code, source_language_code=None):
+        """
+        Queue one text for translation. It never blocks on I/O, so async code may call it: only the
+        in-process cache is checked here, the sqlite file on the pool's threads.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the translation, or None if the request failed
+        """
+        target_language_code = language_code(target_language_code)
+        source_language_code = language_code(source_language_code) if source_language_code else None
+        future = Future()
+        if not text.strip():
+            future.set_result(text)
+            return future
+        cached = self.cache.peek(text, target_language_code, source_language_code)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        key = (source_language_code, target_language_code, text)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            self._pending[key] = future
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="translate-batcher", daemon=True)
+                self._dispatcher.start()
+        self._queue.put(key)
+        return future
+
+    def translate(self, texts, target_language_code, source_language_code=None):
+        """Translate texts, blocking until every one is done; failed texts come back as None"""
+        futures = [self.submit(text, target_language_code, source_language_code) for text in texts]
+        return [future.result() for future in futures]
+
+    async def translate_async(self, texts, target_language_code, source_language_code=None):
+        """Async version of `translate` that does not block the event loop"""
+        futures = [asyncio.wrap_future(self.submit(text, target_language_code, source_language_code))
+                   for text in texts]
+        return list(await asyncio.gather(*futures))
+
+    def _dispatch(self):
+        while True:
+            keys = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    keys.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            groups = {}
+            for source_language_code, target_language_code, text in keys:
+                groups.setdefault((source_language_code, target_language_code), []).append(text)
+            for (source_language_code, target_language_code), texts in groups.items():
+                batch, chars = [], 0
+                for text in texts:
+                    if batch and (len(batch) >= self.MAX_BATCH_ITEMS or chars + len(text) > self.MAX_BATCH_CHARS):
+                        self._executor.submit(self._send, batch, target_language_code, source_language_code)
+                        batch, chars = [], 0
+                    batch.append(text)
+                    chars += len(text)
+                self._executor.submit(self._send, batch, target_language_code, source_language_code)
+
+    def _send(self, texts, target_language_code, source_language_code):
+        translations = {}
+        try:
+            for text in texts:
+                cached = self.cache.get(text, target_language_code, source_language_code)
+                if cached is not None:
+                    translations[text] = cached
+            missing = [text for text in texts if text not in translations]
+            if missing:
+                headers = {
+                    'Authorization': f'Bearer {self.access_token()}',
+                    'Content-Type': 'application/json',
+                    'x-goog-user-project': self.project_id
+                }
+                data = {
+                    "targetLanguageCode": target_language_code,
+                    "contents": missing,
+                    "mimeType": "text/plain"
+                }
+                if source_language_code:
+                    data["sourceLanguageCode"] = source_language_code
+                with self._lock:
+                    self.requests_sent += 1
+                with span("translation_request"):
+                    response = self.session.post(self.url, headers=headers, json=data, timeout=30)
+                response.raise_for_status()
+                fetched = {text: translation['translatedText']
+                           for text, translation in zip(missing, response.json()['translations'])}
+                self.cache.put_many(fetched, target_language_code, source_language_code)
+                translations.update(fetched)
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {e}")
+            if hasattr(e, 'response') and e.response is not None:
+                print(f"Response status: {e.response.status_code}")
+                print(f"Response body: {e.response.text}")
+        except Exception as e:
+            print(f"Translation error: {e}")
+        finally:
+            with self._lock:
+                futures = [self._pending.pop((source_language_code, target_language_code, text))
+                           for text in texts]
+            for text, future in zip(texts, futures):
+                future.set_result(translations.get(text))
+
+
+_client = None
+_client_lock = threading.Lock()
+# Clients of other projects or service accounts, sharing the default client's cache
+_other_clients = {}
+
+
+def get_translation_client(project_id=None, service_account_path=None):
+    """
+    Return the process wide TranslationClient.
+
     Args:
-        service_account_path (str): Path to the service account JSON file
-        
+        project_id (str | None): Google Cloud Project ID, config.GOOGLE_PROJECT_ID by default
+        service_account_path (str | None): Service account JSON file, config.GOOGLE_CREDS_JSON by default
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TranslationClient()
+                register_cache("translation", lambda: (_client.cache.hits, _client.cache.misses))
+                register_callback("sebi_translation_requests_total", "Translation API requests sent",
+                                  lambda: _client.requests_sent, kind="counter")
+    key = (project_id or _client.project_id, service_account_path or _client.service_account_path)
+    if key == (_client.project_id, _client.service_account_path):
+        return _client
+    with _client_lock:
+        if key not in _other_clients:
+            _other_clients[key] = TranslationClient(*key, cache=_client.cache)
+        return _other_clients[key]
+
+
+def translate_texts(texts, target_language_code, source_language_code=None):
+    """
+    Translate many texts through the shared batching client, reusing cached translations.
+
+    Args:
+        texts (list[str]): Texts to translate
+        target_language_code (str): Target language code or name (e.g., 'hi' or 'Hindi')
+        source_language_code (str | None): Source language code or name, detected by the API when None
+
     Returns:
-        str: Access token
+        list[str | None]: Translations in the order of `texts`, None where the request failed
     """
-    try:
-        # Load service account credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_path,
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh the credentials to get an access token
-        credentials.refresh(Request())
-        
-        return credentials.token
-        
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+    return get_translation_client().translate(texts, target_language_code, source_language_code)
+
 
 def translate_indian_language_to_english(text, source_language_code, project_id=config.GOOGLE_PROJECT_ID,
                                        service_account_path=config.GOOGLE_CREDS_JSON):
@@ -61,59 +327,143 @@ def translate_indian_language_to_english(text, source_language_code, project_id=
     Returns:
         str: Translated text in English
     """
-    
-    # Convert language name to code if necessary
-    if source_language_code.lower() in INDIAN_LANGUAGE_CODES:
-        source_language_code = INDIAN_LANGUAGE_CODES[source_language_code.lower()]
-    
-    # Get access token from service account
-    access_token = get_access_token_from_service_account(service_account_path)
-    if not access_token:
-        print("Failed to get access token")
-        return None
-    
-    # API endpoint
-    url = f"https://translation.googleapis.com/v3/projects/{project_id}:translateText"
-    
-    # Request headers
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json',
-        'x-goog-user-project': project_id
-    }
-    
-    # Request body
-    data = {
-        "sourceLanguageCode": source_language_code,
-        "targetLanguageCode": "en",
-        "contents": [text],
-        "mimeType": "text/plain"
-    }
-    
-    try:
-        # Make the API request
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        
-        # Parse response
-        result = response.json()
-        translated_text = result['translations'][0]['translatedText']
-        
-        return translated_text
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response status: {e.response.status_code}")
-            print(f"Response body: {e.response.text}")
-        return None
-    except KeyError as e:
-        print(f"Error parsing response: {e}")
-        print(f"Full response: {response.text}")
-        return None
+    client = get_translation_client(project_id, service_account_path)
+    return client.translate([text], "en", source_language_code)[0]
+
+
+def translate_question_banks(languages=None, out_dir=os.path.join("data", "translations")):
+    """
+    Translate every exam's question bank into the UI languages.
+
+    All questions and options of a bank are submitted at once, so each bank and language takes
+    a handful of batched requests. Banks are written to {out_dir}/{exam}_{code}.json.
+    """
+    from corpus import QUESTION_FILES, load_questions
+    languages = languages or ['Hindi', 'Bengali', 'Marathi', 'Kannada', 'Gujarati']
+    client = get_translation_client()
+    os.makedirs(out_dir, exist_ok=True)
+    for exam_name in QUESTION_FILES:
+        questions = load_questions(exam_name)
+        texts = []
+        for question in questions:
+            texts.append(question["question"])
+            texts.extend(question["options"].values())
+        for language in languages:
+            code = language_code(language)
+            sent = client.requests_sent
+            translated = iter(client.translate(texts, code, "en"))
+            banks = []
+            for question in questions:
+                banks.append(dict(question, question=next(translated) or question["question"],
+                                  options={letter: next(translated) or text
+                                           for letter, text in question["options"].items()}))
+            with open(os.path.join(out_dir, f"{exam_name}_{code}.json"), "w", encoding="utf-8") as file:
+                json.dump(banks, file, ensure_ascii=False, indent=2)
+            print(f"{exam_name} -> {language}: {len(texts)} texts in {client.requests_sent - sent} requests")
+
+
+# Sentence ends (not after a bare list number like "1.") and line breaks
+_SEGMENT_BOUNDARY = re.compile(r"((?<=[^\d\s][.!?।])[ \t]+|\n+)")
+# Markdown line prefixes (headings, bullets, numbered items, quotes) kept out of the translation
+_MARKDOWN_PREFIX = re.compile(r"^(\s*(?:#{1,6}\s+|[-*+]\s+|\d+[.)]\s+|>\s*)*)")
+
+
+class StreamingTranslator:
+    """
+    Translate streamed English text sentence by sentence.
+
+    `feed` takes the next chunk of generated text and returns the translation of every
+    sentence completed so far, sent together in one request; `flush` translates the rest.
+    `feed_async` and `flush_async` do the same without blocking the event loop. Line breaks
+    and markdown line prefixes are kept as they are, and a sentence whose translation fails
+    is returned in English.
+    """
+
+    def __init__(self, target_language_code):
+        self.target_language_code = language_code(target_language_code)
+        self.buffer = ""
+
+    def _take_complete(self, text):
+        """Add text to the buffer and take out the sentences it completed"""
+        self.buffer += text
+        boundaries = list(_SEGMENT_BOUNDARY.finditer(self.buffer))
+        if not boundaries:
+            return ""
+        end = boundaries[-1].end()
+        complete, self.buffer = self.buffer[:end], self.buffer[end:]
+        return complete
+
+    def _take_rest(self):
+        rest, self.buffer = self.buffer, ""
+        return rest
+
+    def feed(self, text):
+        complete = self._take_complete(text)
+        return self._translate(complete) if complete else ""
+
+    def flush(self):
+        rest = self._take_rest()
+        return self._translate(rest) if rest else ""
+
+    async def feed_async(self, text):
+        complete = self._take_complete(text)
+        return await self._translate_async(complete) if complete else ""
+
+    async def flush_async(self):
+        rest = self._take_rest()
+        return await self._translate_async(rest) if rest else ""
+
+    @staticmethod
+    def _split(text):
+        """Split text into its parts, and the markdown prefixes and sentences of its even parts"""
+        parts = _SEGMENT_BOUNDARY.split(text)
+        # even indices are sentences, odd ones the whitespace between them
+        prefixes, sentences = [], []
+        for part in parts[::2]:
+            prefix = _MARKDOWN_PREFIX.match(part).group(1)
+            prefixes.append(prefix)
+            sentences.append(part[len(prefix):])
+        return parts, prefixes, sentences
+
+    @staticmethod
+    def _join(parts, prefixes, sentences, translations):
+        output = []
+        for index, part in enumerate(parts):
+            if index % 2:
+                output.append(part)
+            else:
+                sentence = sentences[index // 2]
+                output.append(prefixes[index // 2] + (translations[index // 2] or sentence))
+        return "".join(output)
+
+    def _translate(self, text):
+        parts, prefixes, sentences = self._split(text)
+        translations = translate_texts(sentences, self.target_language_code, "en")
+        return self._join(parts, prefixes, sentences, translations)
+
+    async def _translate_async(self, text):
+        parts, prefixes, sentences = self._split(text)
+        translations = await get_translation_client().translate_async(sentences, self.target_language_code, "en")
+        return self._join(parts, prefixes, sentences, translations)
+
+
+def translate_markdown(text, target_language_code):
+    """Translate a whole English markdown answer with one request, keeping its line structure"""
+    translator = StreamingTranslator(target_language_code)
+    return translator.feed(text) + translator.flush()
+
+
+async def translate_markdown_async(text, target_language_code):
+    """Async version of `translate_markdown` that does not block the event loop"""
+    translator = StreamingTranslator(target_language_code)
+    return await translator.feed_async(text) + await translator.flush_async()
 
 
 if __name__ == "__main__":
+    if "--question-banks" in sys.argv:
+        translate_question_banks()
+        sys.exit()
+
     # Test with different Indian languages
     test_cases = [
         ("आज मौसम बहुत अच्छा है।", "hi", "Hindi"),
@@ -0,0 +1,71 @@
+import json
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body size of selected paths.
+
+    Requests announcing a larger Content-Length are rejected before any byte is read, and
+    chunked uploads are cut off with 413 as soon as the streamed body crosses the limit, so
+    an oversized upload is never buffered or spooled in full.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        # {path: max body bytes}
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _UploadTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            # the framework may turn the aborted body read into its own error response, answer 413 instead
+            if exceeded:
+                if not response_started:
+                    response_started = True
+                    await self._reject(send, limit)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _UploadTooLarge:
+            if not response_started:
+                await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit):
+        body = json.dumps({"success": False, "error": f"Upload larger than {limit} bytes"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from configs import config
+from corpus_store import Artifact, TextStore, write_artifact
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# Rows are scored in blocks so float16/int8 matrices never get upcast as a whole
+BLOCK_ROWS = 4096
+
+
+def truncate_embedding(vector, dimensions):
+    """
+    Keep the first `dimensions` values of a Matryoshka embedding and re-normalize it to unit length.
+
+    Args:
+        vector (list[float] | np.ndarray): Full embedding
+        dimensions (int | None): Target size, None or a size >= len(vector) keeps every value
+
+    Returns:
+        np.ndarray: float32 unit vector
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    if dimensions and dimensions < vector.shape[-1]:
+        vector = vector[..., :dimensions]
+    norm = np.linalg.norm(vector, axis=-1, keepdims=True)
+    return vector / np.maximum(norm, 1e-12)
+
+
+def quantize(matrix, dtype):
+    """
+    Store unit-normalized rows as float32, float16 or symmetric per-row int8.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray | None]: Stored matrix and per-row scales (int8 only)
+    """
+    if dtype == "float32":
+        return matrix.astype(np.float32), None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+
+
+class VectorIndex:
+    """
+    In-memory cosine similarity index over one knowledge base collection.
+
+    It answers `query` and `get` with the same arguments and result layout as a Chroma
+    collection, so search_knowledge_base can use either backend.
+    """
+
+    def __init__(self, name, ids, documents, metadatas, vectors, scales=None):
+        self.name = name
+        self.ids = list(ids)
+        # a list, or a memory-mapped corpus_store.TextStore
+        self.documents = documents if isinstance(documents, TextStore) else list(documents)
+        self.metadatas = list(metadatas)
+        self.vectors = vectors
+        self.scales = scales
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.id = hashlib.sha1(("\n".join(self.ids) + str(vectors.shape) + str(vectors.dtype))
+                               .encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_records(cls, name, records, dimensions=None, dtype="float32"):
+        """Build an index from build_index records, reducing and quantizing their embeddings"""
+        matrix = truncate_embedding([record["embedding"] for record in records], dimensions)
+        vectors, scales = quantize(matrix, dtype)
+        return cls(name, [r["id"] for r in records], [r["document"] for r in records],
+                   [r["metadata"] for r in records], vectors, scales)
+
+    @property
+    def dimensions(self):
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def count(self):
+        return len(self.ids)
+
+    def scores(self, query_vector):
+        """
+        Cosine similarity of every stored vector to the query (truncated to the index size).
+
+        Raises:
+            ValueError: When the query has fewer dimensions than the index
+        """
+        query = truncate_embedding(query_vector, self.dimensions)
+        if query.shape[-1] != self.dimensions:
+            raise ValueError(f"Query embedding has {query.shape[-1]} dimensions, "
+                             f"the {self.name} index has {self.dimensions}")
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            scores[start:start + BLOCK_ROWS] = block.astype(np.float32, copy=False) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def query(self, query_embeddings, n_results=5):
+        """Chroma compatible query; distances are cosine distances (1 - similarity)"""
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_vector in query_embeddings:
+            scores = self.scores(query_vector)
+            n = min(n_results, len(scores))
+            top = np.argpartition(-scores, n - 1)[:n] if n else np.array([], dtype=int)
+            top = top[np.argsort(-scores[top])]
+            results["ids"].append([self.ids[i] for i in top])
+            results["documents"].append([self.documents[int(i)] for i in top])
+            results["metadatas"].append([self.metadatas[i] for i in top])
+            results["distances"].append([float(1.0 - scores[i]) for i in top])
+        return results
+
+    def embeddings(self, rows):
+        """float32 embeddings of the given rows, with int8 rows scaled back"""
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def get(self, ids=None, include=None):
+        """Chroma compatible get of the given records, or of every stored record"""
+        include = include or ["documents", "metadatas"]
+        if ids is None:
+            rows = np.arange(len(self.ids))
+            result = {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}
+        else:
+            rows = np.array([self._rows[doc_id] for doc_id in ids if doc_id in self._rows], dtype=int)
+            result = {"ids": [self.ids[row] for row in rows],
+                      "documents": [self.documents[int(row)] for row in rows],
+                      "metadatas": [self.metadatas[row] for row in rows]}
+        result = {key: value for key, value in result.items() if key == "ids" or key in include}
+        if "embeddings" in include:
+            result["embeddings"] = self.embeddings(rows)
+        return result
+
+    def save(self, path):
+        """Write the index as a corpus_store artifact directory"""
+        write_artifact(path, {"name": self.name, "ids": self.ids, "metadatas": self.metadatas},
+                       self.documents, self.vectors, self.scales)
+
+    @classmethod
+    def load(cls, path):
+        """Open an index saved with `save`; vectors and texts stay memory-mapped"""
+        artifact = Artifact(path)
+        index = cls(artifact.header["name"], artifact.header["ids"], artifact.texts,
+                    artifact.header["metadatas"], artifact.vectors, artifact.scales)
+        # a rebuild with the same record ids must not reuse caches (BM25) of the previous one
+        written = os.stat(os.path.join(path, "header.json")).st_mtime_ns
+        index.id = hashlib.sha1(f"{os.path.abspath(path)}:{written}".encode("utf-8")).hexdigest()
+        return index
+
+
+def index_path(collection_name, index_dir=None):
+    return os.path.join(index_dir or config.VECTOR_INDEX_PATH, collection_name)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(collection_name):
+    """Load (once per process) the in-memory index of a collection"""
+    index = _indexes.get(collection_name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(collection_name)
+            if index is None:
+                index = VectorIndex.load(index_path(collection_name))
+                _indexes[collection_name] = index
+    return index